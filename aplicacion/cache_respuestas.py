@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+### Caché de respuestas de la API
+# Los datos cambian una vez al día (cron de EventBridge a las 10:00), así que las
+# respuestas ya serializadas se guardan en memoria con un TTL y un tamaño máximo
+# (LRU). Cuando aparece una nueva Fecha_scrap se vacía la caché entera.
+
+
+def calcular_etag(cuerpo):
+    """ETag fuerte a partir del contenido de la respuesta."""
+    return '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+
+
+def etag_coincide(if_none_match, etag):
+    """Comprueba la cabecera If-None-Match (comparación débil, como indica la RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etiquetas = [x.strip() for x in if_none_match.split(',')]
+    return etag in [x[2:] if x.startswith('W/') else x for x in etiquetas]
+
+
+class EntradaCache:
+    def __init__(self, cuerpo, cabeceras, caduca):
+        self.cuerpo = cuerpo
+        self.cabeceras = cabeceras
+        self.etag = calcular_etag(cuerpo)
+        self.caduca = caduca
+
+
+class CacheRespuestas:
+    """
+    Caché LRU con TTL para respuestas serializadas.
+    Args:
+    - max_entradas (int): Número máximo de respuestas guardadas.
+    - ttl (float): Segundos que una respuesta se considera válida.
+    """
+
+    def __init__(self, max_entradas=256, ttl=3600, reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.reloj = reloj
+        self.version = None
+        self._entradas = OrderedDict()
+        # Reentrante: comprobar_version invalida la caché sin soltar el cerrojo
+        self._lock = threading.RLock()
+        self.contadores = {'aciertos': 0, 'fallos': 0, 'expulsiones': 0, 'caducadas': 0,
+                           'invalidaciones': 0, 'respuestas_304': 0}
+
+    def obtener(self, clave):
+        """Devuelve la entrada guardada para la clave o None si no existe o ha caducado."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada.caduca <= self.reloj():
+                del self._entradas[clave]
+                self.contadores['caducadas'] += 1
+                entrada = None
+            if entrada is None:
+                self.contadores['fallos'] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.contadores['aciertos'] += 1
+            return entrada
+
+    def guardar(self, clave, cuerpo, cabeceras=None):
+        """Guarda una respuesta serializada y expulsa la menos usada si se supera el tamaño."""
+        entrada = EntradaCache(cuerpo, cabeceras or {}, self.reloj() + self.ttl)
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.contadores['expulsiones'] += 1
+        return entrada
+
+    def segundos_restantes(self, entrada):
+        return max(0, int(entrada.caduca - self.reloj()))
+
+    def comprobar_version(self, version):
+        """
+        Vacía la caché si los datos han cambiado de versión (nueva Fecha_scrap).
+        Devuelve True si la versión ha cambiado (también la primera vez que se conoce).
+        """
+        if version is None:
+            return False
+        with self._lock:
+            if version == self.version:
+                return False
+            if self.version is not None:
+                self.invalidar()
+            self.version = version
+            return True
+
+    def invalidar(self):
+        """Vacía la caché. La API lo hace a través de comprobar_version cuando cambia el manifiesto."""
+        with self._lock:
+            self._entradas.clear()
+            self.contadores['invalidaciones'] += 1
+
+    def contar_304(self):
+        with self._lock:
+            self.contadores['respuestas_304'] += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {**self.contadores, 'entradas': len(self._entradas), 'max_entradas': self.max_entradas,
+                    'ttl': self.ttl, 'version': self.version}
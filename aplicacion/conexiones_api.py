@@ -1,20 +1,23 @@
 import requests
 import pandas as pd
-from decimal import Decimal
+import pyarrow as pa
 import numpy as np  # Usado en la máscara de valores NaN
 
 
+# Se pide Arrow IPC para construir el DataFrame directamente en columnas;
+# si el servidor no lo admite responde en JSON.
+ACCEPT_VOLATILIDADES = 'application/vnd.apache.arrow.stream, application/json;q=0.5'
+
+
 def datos_dynamodb(url):
-    """Obtiene datos desde una API REST y retorna un DataFrame."""
+    """Obtiene datos desde una API REST (Arrow IPC o JSON) y retorna un DataFrame."""
     try:
-        response = requests.get(url)
+        response = requests.get(url, headers={'Accept': ACCEPT_VOLATILIDADES})
         response.raise_for_status()  # Asegura que la respuesta es exitosa
-        data = response.json()       # Parsea la respuesta JSON a un diccionario
-        df = pd.DataFrame(data)      # Convierte el diccionario a DataFrame
-
-        # Convertir todas las columnas que contienen decimales a flotantes
-        for column in ['Vol_call', 'Strike', 'Vol_put']:
-            df[column] = df[column].apply(lambda x: float(x) if isinstance(x, Decimal) else x)
+        if response.headers.get('content-type', '').startswith('application/vnd.apache.arrow.stream'):
+            df = pa.ipc.open_stream(response.content).read_pandas()
+        else:
+            df = pd.DataFrame(response.json())
 
         # Filtrar y ordenar el DataFrame
         df = df.loc[:, ['Fecha_scrap', 'Fecha', 'Strike', 'Vol_call', 'Vol_put']]
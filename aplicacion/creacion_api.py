@@ -1,14 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 import boto3
-from pydantic import BaseModel, Field
+import asyncio
+import base64
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from botocore.config import Config
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import List, Optional
 from decimal import Decimal
 from fastapi import HTTPException
 from boto3.exceptions import Boto3Error
 from boto3.dynamodb.conditions import Key
 import json
+from io import BytesIO
+import pandas as pd
+import pyarrow.parquet as pq
+from scipy.spatial import QhullError
 
-app = FastAPI()
+from cache_respuestas import CacheRespuestas, etag_coincide
+import formatos
+from superficie import (RESOLUCION, RESOLUCION_MIN, RESOLUCION_MAX, TIPOS, calcular_superficie,
+                        codificar_array)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Se crean los clientes al arrancar para que la primera petición no pague su coste
+    get_s3_client()
+    await ejecutar_aws(get_dynamodb_table)
+    # Lee la versión de los datos y lanza el precálculo de las superficies
+    await comprobar_version_datos()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Modelo de Pydantic para estructurar los datos de la respuesta
 class VolatilityItem(BaseModel):
@@ -18,6 +48,17 @@ class VolatilityItem(BaseModel):
     Strike: float
     Vol_call: Optional[float] = None
     Vol_put: Optional[float] = None
+    # Griegas calculadas por la lambda de volatilidad (black_scholes.GRIEGAS, ver formatos.py)
+    Delta_call: Optional[float] = None
+    Gamma_call: Optional[float] = None
+    Vega_call: Optional[float] = None
+    Theta_call: Optional[float] = None
+    Vanna_call: Optional[float] = None
+    Delta_put: Optional[float] = None
+    Gamma_put: Optional[float] = None
+    Vega_put: Optional[float] = None
+    Theta_put: Optional[float] = None
+    Vanna_put: Optional[float] = None
 
 
 
@@ -41,45 +82,429 @@ def convert_decimal(item):
     return item
 
 
+### Clientes de AWS
+# boto3 es bloqueante: las llamadas se ejecutan en un pool de hilos acotado para no
+# parar el bucle de eventos. Los clientes se crean una vez y se reutilizan, con un
+# pool de conexiones del mismo tamaño que el de hilos.
+MAX_HILOS_AWS = 16
+CONFIG_BOTO = Config(max_pool_connections=MAX_HILOS_AWS, retries={'mode': 'adaptive'})
+ejecutor_aws = ThreadPoolExecutor(max_workers=MAX_HILOS_AWS, thread_name_prefix='aws')
+_local = threading.local()
+_lock_sesion = threading.Lock()
+# Backend de almacenamiento: 'aws' o 'local:<directorio>' (pipeline/almacenamiento.py,
+# solo en desarrollo, p. ej. con ejecutar_local.py)
+ALMACENAMIENTO = os.environ.get('ALMACENAMIENTO', 'aws')
+
+
+def _almacenamiento_local():
+    from almacenamiento import crear_almacenamiento
+    return crear_almacenamiento(ALMACENAMIENTO)
+
+
+async def ejecutar_aws(funcion, *args):
+    """Ejecuta una función bloqueante de boto3 en el pool de hilos de AWS."""
+    return await asyncio.get_running_loop().run_in_executor(ejecutor_aws, funcion, *args)
+
+
 # Configuración de DynamoDB
 def get_dynamodb_table():
-    dynamodb = boto3.resource('dynamodb', region_name='eu-west-3')
-    return dynamodb.Table('volatiliy_table')
+    if ALMACENAMIENTO != 'aws':
+        return _almacenamiento_local().tabla
+    # Los recursos de boto3 no son thread-safe: cada hilo del pool mantiene el suyo
+    table = getattr(_local, 'table', None)
+    if table is None:
+        with _lock_sesion:
+            dynamodb = boto3.session.Session().resource('dynamodb', region_name='eu-west-3', config=CONFIG_BOTO)
+        table = _local.table = dynamodb.Table('volatiliy_table')
+    return table
 
 
+# Configuración de S3
+BUCKET = 'miax-12-scrap-meff'
+MANIFIESTO = 'historico/latest.json'
 
-# También puedes agregar otros endpoints si es necesario, por ejemplo para buscar por ID
-@app.get("/volatilities/", response_model=List[VolatilityItem])
-async def read_volatilities():
-    table = get_dynamodb_table()
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    if ALMACENAMIENTO != 'aws':
+        return _almacenamiento_local().s3
+    # Los clientes de boto3 sí son thread-safe: uno compartido por todos los hilos
+    return boto3.client('s3', region_name='eu-west-3', config=CONFIG_BOTO)
+
+
+### Caché de respuestas
+# Las respuestas serializadas se guardan en memoria con TTL. Como mucho una vez
+# por INTERVALO_VERSION segundos se lee el manifiesto del scraper: si trae una
+# Fecha_scrap nueva, o la lambda de volatilidad ha escrito las de un snapshot,
+# se vacía la caché y se precalculan las superficies del nuevo snapshot.
+cache = CacheRespuestas(max_entradas=256, ttl=3600)
+INTERVALO_VERSION = 60
+_ultima_comprobacion = {'instante': None}
+
+
+def leer_manifiesto():
+    """Manifiesto del histórico que mantiene el scraper."""
+    respuesta = get_s3_client().get_object(Bucket=BUCKET, Key=MANIFIESTO)
+    return json.loads(respuesta['Body'].read())
+
+
+def obtener_version_datos():
+    """
+    Devuelve la versión de los datos según el manifiesto, o None si no se puede leer.
+    La versión es la tupla (Fecha_scrap del último snapshot, Fecha_scrap de las últimas volatilidades escritas).
+    """
     try:
-        response = table.scan()
-        items = response['Items']
-        # Convertir Decimals de DynamoDB a float para Pydantic
-        for item in items:
-            if 'vol_call' in item:
-                item['vol_call'] = float(item['vol_call'])
-            if 'vol_put' in item:
-                item['vol_put'] = float(item['vol_put'])
-            if 'strike' in item:
-                item['strike'] = float(item['strike'])
-        return items
+        manifiesto = leer_manifiesto()
+        return manifiesto.get('Fecha_scrap'), manifiesto.get('volatilidades', {}).get('Fecha_scrap')
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"No se pudo leer el manifiesto de datos: {e}")
+        return None
+
+
+async def comprobar_version_datos():
+    ahora = time.monotonic()
+    instante = _ultima_comprobacion['instante']
+    if instante is None or ahora - instante >= INTERVALO_VERSION:
+        _ultima_comprobacion['instante'] = ahora
+        version = await ejecutar_aws(obtener_version_datos)
+        if cache.comprobar_version(version):
+            calcular_superficie_snapshot.cache_clear()
+            lanzar_precalculo(version[1])
+
+
+# Peticiones en curso por clave: las peticiones simultáneas de la misma clave
+# esperan a la primera en lugar de repetir la lectura de AWS
+_en_curso = {}
+
+
+async def _generar_una_vez(clave, generar):
+    futuro = _en_curso.get(clave)
+    if futuro is None:
+        futuro = asyncio.ensure_future(ejecutar_aws(generar))
+        _en_curso[clave] = futuro
+        futuro.add_done_callback(lambda _: _en_curso.pop(clave, None))
+    return await asyncio.shield(futuro)
+
+
+def clave_cache(request, formato=formatos.JSON):
+    """La ruta, los parámetros y el formato de la respuesta forman la clave de la caché."""
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())), formato)
+
+
+def cabeceras_cache(entrada):
+    return {**entrada.cabeceras, 'ETag': entrada.etag, 'Vary': 'Accept',
+            'Cache-Control': f'public, max-age={cache.segundos_restantes(entrada)}'}
+
+
+def respuesta_cacheada(request, entrada, formato):
+    """Respuesta a partir de una entrada de la caché, o 304 si el cliente ya la tiene."""
+    cabeceras = cabeceras_cache(entrada)
+    if etag_coincide(request.headers.get('if-none-match'), entrada.etag):
+        cache.contar_304()
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=entrada.cuerpo, media_type=formato, headers=cabeceras)
+
+
+async def responder_con_cache(request, generar, formato=formatos.JSON):
+    """
+    Devuelve la respuesta cacheada para la petición o la genera y la guarda.
+    Añade ETag y Cache-Control y responde 304 si el cliente ya tiene la versión actual.
+    Args:
+    - request: Petición de FastAPI; la ruta y los parámetros forman la clave de la caché.
+    - generar: Función bloqueante sin argumentos que devuelve (elementos, cabeceras extra).
+      Se ejecuta, junto con la serialización, en el pool de hilos de AWS.
+    - formato (str): Tipo de contenido de la respuesta (ver formatos.FORMATOS).
+    """
+    await comprobar_version_datos()
+    clave = clave_cache(request, formato)
+    entrada = cache.obtener(clave)
+    if entrada is None:
+        def generar_y_serializar():
+            items, cabeceras = generar()
+            return formatos.serializar(items, formato), cabeceras
+
+        cuerpo, cabeceras = await _generar_una_vez(clave, generar_y_serializar)
+        entrada = cache.guardar(clave, cuerpo, cabeceras)
+    return respuesta_cacheada(request, entrada, formato)
+
+
+@app.get("/cache/estadisticas/")
+async def cache_stats():
+    """Contadores de aciertos, fallos, expulsiones e invalidaciones de la caché."""
+    return cache.estadisticas()
+
+
+# Índice secundario global por fecha de scrap (hash) y vencimiento (range)
+INDICE_FECHA_SCRAP = 'fecha_scrap-index'
+MAX_LIMIT = 1000
+# Atributo de TTL de la tabla: es interno y no se devuelve a los clientes
+ATRIBUTO_TTL = 'expira'
+
+
+def codificar_cursor(clave):
+    """Convierte el LastEvaluatedKey de DynamoDB en un cursor opaco para el cliente."""
+    return base64.urlsafe_b64encode(json.dumps(convert_decimal(clave)).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Recupera el ExclusiveStartKey a partir del cursor."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor no válido")
+
+
+def leer_paginas(table, fecha_scrap=None, expiry=None, limit=None, cursor=None):
+    """
+    Recorre las páginas de DynamoDB con las volatilidades pedidas.
+    Con fecha_scrap se consulta el índice por fecha de scrap (y vencimiento si se indica);
+    sin filtros se recorre la tabla completa. El cursor se valida al llamar a la función y
+    no al recorrer las páginas, así que un cursor no válido da un 400 antes de empezar a
+    transmitir una respuesta.
+    Args:
+    - table: Tabla de DynamoDB.
+    - fecha_scrap (str): Fecha de scrap (YYYY-MM-DD).
+    - expiry (str): Fecha de vencimiento (YYYY-MM-DD).
+    - limit (int): Máximo de elementos a devolver; None para leer todas las páginas.
+    - cursor (str): Cursor devuelto por una llamada anterior.
+    Returns:
+    - Generador de tuplas (elementos de la página, cursor de la siguiente página o None).
+    """
+    if fecha_scrap:
+        condicion = Key('Fecha_scrap').eq(fecha_scrap)
+        if expiry:
+            condicion = condicion & Key('Fecha').eq(expiry)
+        parametros = {'IndexName': INDICE_FECHA_SCRAP, 'KeyConditionExpression': condicion}
+        leer = table.query
+    else:
+        parametros = {}
+        leer = table.scan
+    if cursor:
+        parametros['ExclusiveStartKey'] = decodificar_cursor(cursor)
+    return _recorrer_paginas(leer, parametros, limit)
+
+
+def _recorrer_paginas(leer, parametros, limit):
+    leidos = 0
+    while True:
+        if limit is not None:
+            parametros['Limit'] = limit - leidos
+        response = leer(**parametros)
+        leidos += len(response['Items'])
+        siguiente = response.get('LastEvaluatedKey')
+        items = [{k: v for k, v in item.items() if k != ATRIBUTO_TTL} for item in response['Items']]
+        yield convert_decimal(items), (codificar_cursor(siguiente) if siguiente else None)
+        if not siguiente or (limit is not None and leidos >= limit):
+            break
+        parametros['ExclusiveStartKey'] = siguiente
+
+
+def leer_volatilidades(table, fecha_scrap=None, expiry=None, limit=None, cursor=None):
+    """
+    Lee volatilidades siguiendo la paginación de DynamoDB (mismos argumentos que leer_paginas).
+    Returns:
+    - Tupla (elementos, cursor de la siguiente página o None).
+    """
+    items, siguiente = [], None
+    for pagina, siguiente in leer_paginas(table, fecha_scrap, expiry, limit, cursor):
+        items.extend(pagina)
+    return items, siguiente
+
+
+async def transmitir_ndjson(request, paginas):
+    """
+    Envía las volatilidades en NDJSON a medida que llegan las páginas de DynamoDB
+    y guarda la respuesta completa en la caché al terminar.
+    """
+    clave = clave_cache(request, formatos.NDJSON)
+    partes = []
+    while True:
+        pagina = await ejecutar_aws(next, paginas, None)
+        if pagina is None:
+            break
+        parte = formatos.a_ndjson(pagina[0])
+        partes.append(parte)
+        yield parte
+    cache.guardar(clave, b''.join(partes))
+
+
+FUTUROS_JSON = TypeAdapter(List[FutureData])
+
+
+@app.get("/volatilities/", response_model=List[VolatilityItem])
+async def read_volatilities(request: Request,
+                            fecha_scrap: Optional[str] = None,
+                            expiry: Optional[str] = None,
+                            limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+                            cursor: Optional[str] = None):
+    """
+    Devuelve las volatilidades de una fecha de scrap (y opcionalmente de un vencimiento).
+    Con limit se devuelve una sola página y el cursor de la siguiente en la cabecera X-Next-Cursor.
+    El formato se negocia con la cabecera Accept: JSON (por defecto), Arrow IPC
+    (application/vnd.apache.arrow.stream), Parquet (application/vnd.apache.parquet)
+    o NDJSON (application/x-ndjson).
+    """
+    if expiry and not fecha_scrap:
+        raise HTTPException(status_code=400, detail="El parámetro expiry requiere fecha_scrap")
+    formato = formatos.elegir_formato(request.headers.get('accept'))
+
+    # Las lecturas completas en NDJSON se transmiten página a página si no están en caché
+    if formato == formatos.NDJSON and limit is None:
+        await comprobar_version_datos()
+        entrada = cache.obtener(clave_cache(request, formato))
+        if entrada is not None:
+            return respuesta_cacheada(request, entrada, formato)
+        table = await ejecutar_aws(get_dynamodb_table)
+        paginas = leer_paginas(table, fecha_scrap, expiry, limit, cursor)
+        return StreamingResponse(transmitir_ndjson(request, paginas), media_type=formato,
+                                 headers={'Vary': 'Accept'})
+
+    def generar():
+        table = get_dynamodb_table()
+        try:
+            items, siguiente = leer_volatilidades(table, fecha_scrap, expiry, limit, cursor)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        cabeceras = {'X-Next-Cursor': siguiente} if siguiente else {}
+        return items, cabeceras
+
+    return await responder_con_cache(request, generar, formato)
     
     
 @app.get("/datos-futuros/", response_model=List[FutureData])
-async def read_futures_data():
-    s3 = boto3.client('s3', region_name='eu-west-3')
-    bucket_name = 'miax-12-scrap-meff'
-    key = 'datos_futuros.json'
-    
+async def read_futures_data(request: Request):
+    def generar():
+        s3 = get_s3_client()
+        key = 'datos_futuros.json'
+
+        try:
+            response = s3.get_object(Bucket=BUCKET, Key=key)
+            data = response['Body'].read().decode('utf-8')
+            json_data = json.loads(data)
+            return FUTUROS_JSON.dump_python([FutureData(**item) for item in json_data]), {}
+        except Boto3Error as e:
+            raise HTTPException(status_code=500, detail=f"Error accessing S3: {e}")
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=500, detail=f"Error decoding JSON: {e}")
+
+    return await responder_con_cache(request, generar)
+
+
+### Superficie de volatilidad
+# Las mallas se calculan una vez por (snapshot, tipo, resolución) y se guardan en
+# memoria. Las de la resolución por defecto se precalculan en segundo plano en
+# cuanto la lambda de volatilidad marca en el manifiesto un snapshot nuevo.
+PREFIJO_HISTORICO = 'historico'
+SUBYACENTE = 'MiniIbex_35'
+_precalculos = set()
+
+
+def leer_precio_subyacente(fecha_scrap):
+    """
+    Precio del futuro más próximo en la fecha de scrap, del histórico Parquet.
+    Si no está su partición solo se usa el último datos_futuros.json, y solo cuando la
+    fecha es la del último snapshot del subyacente en el manifiesto: con cualquier otra
+    el precio sería el de otro día, así que se responde 404.
+    """
+    s3 = get_s3_client()
+    clave = f'{PREFIJO_HISTORICO}/futuros/subyacente={SUBYACENTE}/Fecha_scrap={fecha_scrap}/datos.parquet'
+    try:
+        cuerpo = s3.get_object(Bucket=BUCKET, Key=clave)['Body'].read()
+        return float(pq.read_table(BytesIO(cuerpo), columns=['Ant']).column('Ant')[0].as_py())
+    except s3.exceptions.NoSuchKey:
+        pass
     try:
-        response = s3.get_object(Bucket=bucket_name, Key=key)
-        data = response['Body'].read().decode('utf-8')
-        json_data = json.loads(data)
-        return [FutureData(**item) for item in json_data]
-    except Boto3Error as e:
-        raise HTTPException(status_code=500, detail=f"Error accessing S3: {e}")
-    except json.JSONDecodeError as e:
-        raise HTTPException(status_code=500, detail=f"Error decoding JSON: {e}")
\ No newline at end of file
+        ultimo = leer_manifiesto()['subyacentes'][SUBYACENTE]['Fecha_scrap']
+    except (s3.exceptions.NoSuchKey, KeyError):
+        ultimo = None
+    if fecha_scrap != ultimo:
+        raise HTTPException(status_code=404, detail=f"No hay precio del subyacente para {fecha_scrap}")
+    datos = json.loads(s3.get_object(Bucket=BUCKET, Key='datos_futuros.json')['Body'].read())
+    return float(datos[0]['Ant'])
+
+
+@lru_cache(maxsize=64)
+def calcular_superficie_snapshot(fecha_scrap, tipo, resolucion):
+    """
+    Lee las volatilidades de un snapshot e interpola su superficie.
+    Returns:
+    - Diccionario con los metadatos y las mallas 'maturity', 'moneyness' e 'iv' codificadas en float32.
+    """
+    items, _ = leer_volatilidades(get_dynamodb_table(), fecha_scrap)
+    if not items:
+        raise HTTPException(status_code=404, detail=f"No hay volatilidades para {fecha_scrap}")
+    precio_subyacente = leer_precio_subyacente(fecha_scrap)
+    try:
+        malla = calcular_superficie(pd.DataFrame(items), precio_subyacente, tipo, resolucion)
+    except (KeyError, IndexError, ValueError, QhullError) as e:
+        raise HTTPException(status_code=422, detail=f"No hay puntos suficientes para la superficie: {e}")
+    return {'Fecha_scrap': fecha_scrap, 'tipo': tipo, 'resolucion': resolucion,
+            'precio_subyacente': precio_subyacente,
+            **{nombre: codificar_array(valores) for nombre, valores in malla.items()}}
+
+
+async def precalcular_superficies(fecha_scrap):
+    for tipo in TIPOS:
+        try:
+            await ejecutar_aws(calcular_superficie_snapshot, fecha_scrap, tipo, RESOLUCION)
+        except Exception as e:
+            print(f"No se pudo precalcular la superficie {tipo} de {fecha_scrap}: {e}")
+
+
+def lanzar_precalculo(fecha_scrap):
+    if fecha_scrap:
+        tarea = asyncio.ensure_future(precalcular_superficies(fecha_scrap))
+        _precalculos.add(tarea)
+        tarea.add_done_callback(_precalculos.discard)
+
+
+@app.get("/surface/")
+async def read_surface(request: Request,
+                       fecha_scrap: str,
+                       tipo: str = Query('call', pattern='^(call|put)$'),
+                       resolucion: int = Query(RESOLUCION, ge=RESOLUCION_MIN, le=RESOLUCION_MAX)):
+    """
+    Devuelve la superficie de volatilidad implícita de un snapshot ya interpolada.
+    Los ejes 'maturity' (años desde la fecha de scrap) y 'moneyness' son 1-D y 'iv' es una
+    matriz con una fila por moneyness y una columna por madurez. Cada array se envía como
+    {'dtype': 'f4', 'shape': [...], 'bdata': <base64>}.
+    """
+    def generar():
+        return calcular_superficie_snapshot(fecha_scrap, tipo, resolucion), {}
+
+    return await responder_con_cache(request, generar)
+
+
+### Puntos ATM
+# La lambda de volatilidad guarda la volatilidad ATM de cada (Fecha_scrap, Fecha);
+# con una sola petición la interfaz tiene la estructura temporal y el histórico ATM.
+CLAVE_ATM = 'estado/puntos_atm.json'
+
+
+@app.get("/atm/")
+async def read_atm(request: Request,
+                   fecha_scrap: Optional[List[str]] = Query(None),
+                   expiry: Optional[str] = None):
+    """
+    Devuelve los puntos de volatilidad ATM (Fecha_scrap, Fecha, T, Vol_call, Vol_put),
+    opcionalmente solo de las fechas de scrap indicadas (se puede repetir el parámetro)
+    y de un vencimiento.
+    """
+    def generar():
+        s3 = get_s3_client()
+        try:
+            puntos = json.loads(s3.get_object(Bucket=BUCKET, Key=CLAVE_ATM)['Body'].read())
+        except s3.exceptions.NoSuchKey:
+            puntos = []
+        except Boto3Error as e:
+            raise HTTPException(status_code=500, detail=f"Error accessing S3: {e}")
+        if fecha_scrap:
+            fechas = set(fecha_scrap)
+            puntos = [p for p in puntos if p['Fecha_scrap'] in fechas]
+        if expiry:
+            puntos = [p for p in puntos if p['Fecha'] == expiry]
+        return puntos, {}
+
+    return await responder_con_cache(request, generar)
@@ -0,0 +1,83 @@
+import os
+import sys
+from io import BytesIO
+
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# La lista de griegas es la de volatility/black_scholes.py, el módulo con el que las calcula
+# la lambda de volatilidad. La API se ejecuta desde el repositorio (uvicorn en aplicacion/).
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'volatility'))
+from black_scholes import GRIEGAS  # noqa: E402
+
+
+### Formatos de respuesta de la API
+# Además de JSON, las volatilidades se pueden pedir en formatos columnares
+# (Arrow IPC y Parquet) para que los clientes construyan el DataFrame sin
+# trabajo por fila, o en NDJSON para leerlas a medida que llegan.
+
+ARROW = 'application/vnd.apache.arrow.stream'
+PARQUET = 'application/vnd.apache.parquet'
+NDJSON = 'application/x-ndjson'
+JSON = 'application/json'
+FORMATOS = [JSON, ARROW, PARQUET, NDJSON]
+
+ESQUEMA_VOLATILIDADES = pa.schema(
+    [('id', pa.string()), ('Fecha', pa.string()), ('Fecha_scrap', pa.string()), ('Strike', pa.float64()),
+     ('Vol_call', pa.float64()), ('Vol_put', pa.float64())]
+    + [(f'{griega}_{tipo}', pa.float64()) for tipo in ['call', 'put'] for griega in GRIEGAS])
+
+
+def elegir_formato(accept):
+    """
+    Elige el formato de respuesta a partir de la cabecera Accept (JSON por defecto).
+    Se respeta el orden de preferencia indicado con los parámetros q.
+    """
+    candidatos = []
+    for orden, parte in enumerate((accept or '').split(',')):
+        tipo, *parametros = [x.strip() for x in parte.split(';')]
+        q = 1.0
+        for parametro in parametros:
+            if parametro.startswith('q='):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        if tipo in FORMATOS and q > 0:
+            candidatos.append((-q, orden, tipo))
+    return min(candidatos)[2] if candidatos else JSON
+
+
+def tabla_arrow(items):
+    """Construye una tabla Arrow con el esquema fijo de volatilidades (null en los atributos ausentes)."""
+    return pa.Table.from_pylist(items, schema=ESQUEMA_VOLATILIDADES)
+
+
+def a_ndjson(items):
+    """Un objeto JSON por línea."""
+    return b''.join(orjson.dumps(item) + b'\n' for item in items)
+
+
+def serializar(items, formato):
+    """
+    Serializa los elementos en el formato pedido.
+    Args:
+    - items (list): Diccionarios con floats (sin Decimal).
+    - formato (str): Uno de FORMATOS.
+    Returns:
+    - Cuerpo de la respuesta en bytes.
+    """
+    if formato == ARROW:
+        tabla = tabla_arrow(items)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+        return sink.getvalue().to_pybytes()
+    if formato == PARQUET:
+        buffer = BytesIO()
+        pq.write_table(tabla_arrow(items), buffer)
+        return buffer.getvalue()
+    if formato == NDJSON:
+        return a_ndjson(items)
+    return orjson.dumps(items)
@@ -0,0 +1,75 @@
+import base64
+
+import numpy as np
+import pandas as pd
+
+
+### Superficie de volatilidad
+# La interpolación de la superficie (antes en preparar_datos de la interfaz) se
+# hace una vez por snapshot en la API. Las mallas se envían como arrays float32
+# codificados en base64: dos ejes 1-D (madurez y moneyness) y la matriz de
+# volatilidades, con una fila por moneyness y una columna por madurez.
+# La interfaz importa decodificar_array de este módulo y no tiene scipy, así que
+# griddata se importa en calcular_superficie.
+
+RESOLUCION = 100
+RESOLUCION_MIN = 10
+RESOLUCION_MAX = 400
+TIPOS = ['call', 'put']
+
+
+def tiempo_a_madurez(fechas, fecha_base):
+    """
+    Años desde fecha_base hasta cada fecha de vencimiento.
+    Args:
+    - fechas: Serie o lista de fechas de vencimiento.
+    - fecha_base: Fecha desde la que se mide (la fecha de scrap del snapshot).
+    """
+    return ((pd.to_datetime(pd.Series(fechas)) - pd.Timestamp(fecha_base)).dt.days / 365.25).to_numpy()
+
+
+def calcular_superficie(df, precio_subyacente, tipo_opcion, resolucion=RESOLUCION, fecha_base=None):
+    """
+    Interpola la superficie de volatilidad implícita en una malla regular. No modifica df.
+    Args:
+    - df (pd.DataFrame): Volatilidades de un snapshot con 'Fecha', 'Fecha_scrap', 'Strike', 'Vol_call' y 'Vol_put'.
+    - precio_subyacente (float): Precio del subyacente para calcular el Moneyness.
+    - tipo_opcion (str): 'call' o 'put'.
+    - resolucion (int): Número de puntos de cada eje de la malla.
+    - fecha_base: Fecha desde la que se mide la madurez; por defecto la Fecha_scrap del snapshot.
+    Returns:
+    - Diccionario con 'maturity' y 'moneyness' (ejes 1-D) e 'iv' (matriz resolucion x resolucion),
+      todos en float32. Los puntos fuera de la envolvente de los datos son NaN.
+    """
+    columna = f'Vol_{tipo_opcion}'
+    datos = df.loc[df[columna].notna(), ['Fecha', 'Fecha_scrap', 'Strike', columna]]
+    if fecha_base is None:
+        fecha_base = datos['Fecha_scrap'].iloc[0]
+
+    # Media de la volatilidad en cada punto (madurez, moneyness)
+    puntos = pd.DataFrame({'Maturity': tiempo_a_madurez(datos['Fecha'], fecha_base),
+                           'Moneyness': datos['Strike'].to_numpy(dtype=float) / precio_subyacente,
+                           'VolatilidadImplicita': datos[columna].to_numpy(dtype=float)})
+    agrupado = puntos.groupby(['Maturity', 'Moneyness'], as_index=False)['VolatilidadImplicita'].mean()
+
+    maturity = np.linspace(agrupado['Maturity'].min(), agrupado['Maturity'].max(), resolucion)
+    moneyness = np.linspace(agrupado['Moneyness'].min(), agrupado['Moneyness'].max(), resolucion)
+    T_grid, M_grid = np.meshgrid(maturity, moneyness)
+    from scipy.interpolate import griddata
+    iv = griddata((agrupado['Maturity'].to_numpy(), agrupado['Moneyness'].to_numpy()),
+                  agrupado['VolatilidadImplicita'].to_numpy(), (T_grid, M_grid), method='cubic')
+
+    return {'maturity': maturity.astype(np.float32), 'moneyness': moneyness.astype(np.float32),
+            'iv': iv.astype(np.float32)}
+
+
+def codificar_array(array):
+    """Array float32 como diccionario con el tipo, la forma y los datos en base64."""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {'dtype': 'f4', 'shape': list(array.shape), 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def decodificar_array(codificado):
+    """Inversa de codificar_array."""
+    datos = np.frombuffer(base64.b64decode(codificado['bdata']), dtype=codificado['dtype'])
+    return datos.reshape(codificado['shape'])
@@ -0,0 +1,174 @@
+"""
+Arranque en frío y en caliente de los handlers de las lambdas (scraper, volatilidad
+y pipeline unificado).
+
+Cada medición se hace en un proceso nuevo, como una instancia nueva de Lambda:
+- importacion: importar el módulo del handler (fase de inicialización).
+- primera: primera invocación (incluye las importaciones diferidas, p. ej. scipy.special).
+- caliente: segunda invocación en el mismo proceso.
+El arranque en frío es importacion + primera. S3, DynamoDB, SNS y MEFF se sustituyen
+por objetos en memoria con la página guardada en tests/fixtures, así que se mide el
+código de las lambdas y no la red.
+
+Además se comprueba con -X importtime que ningún handler importa al arrancar los
+módulos de PRESUPUESTOS['prohibidos'], y con --comprobar el script termina con error
+si la importación supera el presupuesto de presupuestos_arranque.json.
+
+Uso:
+    python benchmarks/benchmark_arranque.py [--repeticiones N] [--comprobar]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETAS = [os.path.join(RAIZ, c) for c in ['scrap', 'volatility', 'pipeline']]
+FIXTURE = os.path.join(RAIZ, 'tests', 'fixtures', 'meff_miniibex35.html')
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'presupuestos_arranque.json')) as f:
+    PRESUPUESTOS = json.load(f)
+
+# Módulo de cada handler
+HANDLERS = {'scraper': 'scrapping_s3_meff', 'volatilidad': 'lambda_vol_dynamo', 'pipeline': 'lambda_pipeline'}
+
+
+def entorno():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(CARPETAS), AWS_DEFAULT_REGION='eu-west-3')
+    # Sin credenciales reales: los clientes se crean pero nunca se usan
+    env.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    env.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    return env
+
+
+### Dobles en memoria (solo en el proceso hijo)
+class _Cuerpo:
+    def __init__(self, datos):
+        self.datos = datos
+
+    def read(self):
+        return self.datos.encode() if isinstance(self.datos, str) else self.datos
+
+
+class S3Memoria:
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objetos = {}
+
+    def put_object(self, Body, Bucket, Key):
+        self.objetos[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objetos:
+            raise self.exceptions.NoSuchKey(Key)
+        return {'Body': _Cuerpo(self.objetos[Key])}
+
+
+class TablaMemoria:
+    name = 'volatiliy_table'
+
+    def __init__(self):
+        self.meta, self.client = self, self
+
+    def batch_write_item(self, RequestItems):
+        return {'UnprocessedItems': {}}
+
+
+class SnsMemoria:
+    def publish(self, **kwargs):
+        return {}
+
+
+class SesionPagina:
+    def __init__(self, contenido):
+        self.contenido = contenido
+
+    def get(self, url, headers=None, timeout=None):
+        respuesta = type('Respuesta', (), {})()
+        respuesta.status_code, respuesta.content, respuesta.headers = 200, self.contenido, {}
+        return respuesta
+
+
+def _preparar(s3):
+    """Sustituye los clientes y la sesión de los módulos ya importados por los dobles en memoria."""
+    with open(FIXTURE, 'rb') as f:
+        html = f.read()
+    if 'scrapping_s3_meff' in sys.modules:
+        modulo = sys.modules['scrapping_s3_meff']
+        modulo.s3_client, modulo.sesion = s3, SesionPagina(html)
+    if 'lambda_vol_dynamo' in sys.modules:
+        modulo = sys.modules['lambda_vol_dynamo']
+        modulo.s3_client, modulo.table, modulo.sns_client = s3, TablaMemoria(), SnsMemoria()
+
+
+def medir_hijo(handler):
+    """Mide importación, primera invocación e invocación en caliente de un handler (proceso hijo)."""
+    inicio = time.perf_counter()
+    modulo = __import__(HANDLERS[handler])
+    importacion = time.perf_counter() - inicio
+
+    s3 = S3Memoria()
+    _preparar(s3)
+    evento = {'instrumentos': 'MiniIbex_35', 'forzar': True, 'incremental': False}
+    if handler == 'volatilidad':
+        # La lambda de volatilidad lee el snapshot que deja el scraper (no se mide)
+        import scrapping_s3_meff
+        _preparar(s3)
+        scrapping_s3_meff.lambda_handler({'instrumentos': 'MiniIbex_35'}, None)
+
+    tiempos = {'importacion': importacion}
+    for nombre in ['primera', 'caliente']:
+        inicio = time.perf_counter()
+        respuesta = modulo.lambda_handler(evento, None)
+        tiempos[nombre] = time.perf_counter() - inicio
+        assert respuesta['statusCode'] == 200, respuesta
+    print(json.dumps(tiempos))
+
+
+def modulos_importados(handler):
+    """Módulos que importa el handler al arrancar, según -X importtime."""
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {HANDLERS[handler]}'],
+                             env=entorno(), capture_output=True, text=True, check=True)
+    return {linea.split('|')[-1].strip() for linea in proceso.stderr.splitlines() if linea.startswith('import time:')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--comprobar', action='store_true', help='Error si se supera algún presupuesto')
+    parser.add_argument('--hijo', choices=list(HANDLERS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.hijo:
+        return medir_hijo(args.hijo)
+
+    fallos = []
+    print(f"{'handler':>12} {'importación (ms)':>17} {'frío (ms)':>10} {'caliente (ms)':>14} {'presupuesto (ms)':>17}")
+    for handler in HANDLERS:
+        medidas = []
+        for _ in range(args.repeticiones):
+            proceso = subprocess.run([sys.executable, os.path.abspath(__file__), '--hijo', handler],
+                                     env=entorno(), capture_output=True, text=True, check=True)
+            medidas.append(json.loads(proceso.stdout.strip().splitlines()[-1]))
+        mediana = {k: statistics.median(m[k] for m in medidas) * 1000 for k in medidas[0]}
+        presupuesto = PRESUPUESTOS['importacion_ms'][handler]
+        print(f"{handler:>12} {mediana['importacion']:>17.0f} {mediana['importacion'] + mediana['primera']:>10.0f} "
+              f"{mediana['caliente']:>14.0f} {presupuesto:>17}")
+        if mediana['importacion'] > presupuesto:
+            fallos.append(f'{handler}: importación {mediana["importacion"]:.0f} ms > {presupuesto} ms')
+        prohibidos = modulos_importados(handler) & set(PRESUPUESTOS['prohibidos'])
+        if prohibidos:
+            fallos.append(f'{handler}: importa al arrancar {sorted(prohibidos)}')
+
+    for fallo in fallos:
+        print('FUERA DE PRESUPUESTO:', fallo)
+    if args.comprobar and fallos:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Mide el throughput de /volatilities/ según el número de peticiones simultáneas.
+
+DynamoDB se sustituye por una tabla local que tarda LATENCIA segundos en
+responder (como la red hasta AWS) y la caché se desactiva para que cada
+petición llegue a la tabla. Se compara el modo actual (boto3 en el pool de
+hilos) con el anterior, que llamaba a boto3 dentro del bucle de eventos.
+
+Uso:
+    python benchmarks/benchmark_concurrencia_api.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'aplicacion'))
+
+import creacion_api  # noqa: E402
+from cache_respuestas import CacheRespuestas  # noqa: E402
+
+LATENCIA = 0.05
+PETICIONES = 64
+CONCURRENCIAS = [1, 2, 4, 8, 16, 32]
+
+
+class TablaLocal:
+    """Sustituto de la tabla de DynamoDB con latencia de red simulada."""
+
+    def query(self, **kwargs):
+        time.sleep(LATENCIA)
+        return {'Items': [{'id': f'2024-06-21_{k}', 'Fecha': '2024-06-21', 'Fecha_scrap': '2024-05-10',
+                           'Strike': k, 'Vol_call': 0.2, 'Vol_put': 0.21} for k in range(9000, 13000, 50)]}
+
+    scan = query
+
+
+async def ejecutar_en_bucle(funcion, *args):
+    # Modo anterior: la llamada bloqueante se hace en el propio bucle de eventos
+    return funcion(*args)
+
+
+async def medir(concurrencia):
+    transporte = httpx.ASGITransport(app=creacion_api.app)
+    semaforo = asyncio.Semaphore(concurrencia)
+    async with httpx.AsyncClient(transport=transporte, base_url='http://api') as cliente:
+        async def peticion(i):
+            async with semaforo:
+                # Parámetros distintos en cada petición para que no se agrupen ni se cacheen
+                r = await cliente.get('/volatilities/', params={'fecha_scrap': f'2024-05-{i:03d}'})
+                r.raise_for_status()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(peticion(i) for i in range(PETICIONES)))
+        return PETICIONES / (time.perf_counter() - inicio)
+
+
+def main():
+    creacion_api.get_dynamodb_table = lambda: TablaLocal()
+    creacion_api.obtener_version_datos = lambda: None
+    creacion_api.cache = CacheRespuestas(ttl=0)
+    ejecutar_aws = creacion_api.ejecutar_aws
+
+    print(f"{'concurrencia':>12} {'bloqueante (req/s)':>19} {'pool de hilos (req/s)':>22}")
+    for concurrencia in CONCURRENCIAS:
+        creacion_api.ejecutar_aws = ejecutar_en_bucle
+        bloqueante = asyncio.run(medir(concurrencia))
+        creacion_api.ejecutar_aws = ejecutar_aws
+        no_bloqueante = asyncio.run(medir(concurrencia))
+        print(f'{concurrencia:>12} {bloqueante:>19.1f} {no_bloqueante:>22.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Bytes por figura que recibe el navegador, antes y después de la capa de
+codificación de interfaz/figuras.py, y tiempo estimado de descarga en un enlace
+lento.
+
+- antes: superficie con las mallas X e Y completas y listas JSON de float64
+  (como la construía preparar_datos con plotly < 6) y skew con px.line.
+- plotly por defecto: las mismas figuras con la codificación base64 float64 de plotly >= 6.
+- ahora: ejes 1-D y arrays tipados float32 (figuras.aligerar).
+
+Uso:
+    python benchmarks/benchmark_figuras.py
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'interfaz'))
+
+from figuras import aligerar, bytes_figura  # noqa: E402
+
+RESOLUCIONES = [50, 100, 200]
+ENLACE_LENTO = 1_000_000 / 8  # 1 Mbit/s en bytes por segundo
+
+
+def superficie(resolucion):
+    maturity = np.linspace(0.05, 2.0, resolucion)
+    moneyness = np.linspace(0.8, 1.2, resolucion)
+    T, M = np.meshgrid(maturity, moneyness)
+    iv = 0.2 + 0.3 * (M - 1) ** 2 + 0.02 * np.sqrt(T)
+    iv[:resolucion // 10, :resolucion // 10] = np.nan
+    return maturity, moneyness, T, M, iv
+
+
+def como_listas(figura):
+    """JSON de la figura con los arrays como listas, como lo enviaba plotly < 6."""
+    def a_lista(valor):
+        if isinstance(valor, np.ndarray):
+            return np.where(np.isnan(valor), None, valor).tolist() if valor.dtype.kind == 'f' else valor.tolist()
+        return valor
+    datos = [{k: a_lista(v) for k, v in traza.to_plotly_json().items()} for traza in figura.data]
+    return len(json.dumps({'data': datos, 'layout': figura.layout.to_plotly_json()}, default=str).encode())
+
+
+def fila(nombre, antes, por_defecto, ahora):
+    print(f'{nombre:>22} {antes:>12} {por_defecto:>16} {ahora:>10} {antes / ahora:>8.1f}x '
+          f'{antes / ENLACE_LENTO:>9.2f} s {ahora / ENLACE_LENTO:>9.2f} s')
+
+
+def main():
+    print(f"{'figura':>22} {'antes (B)':>12} {'plotly f8 (B)':>16} {'ahora (B)':>10} {'ratio':>9} "
+          f"{'antes 1Mb/s':>11} {'ahora 1Mb/s':>11}")
+    for resolucion in RESOLUCIONES:
+        maturity, moneyness, T, M, iv = superficie(resolucion)
+        antes = go.Figure(go.Surface(x=T, y=M, z=iv))
+        ahora = aligerar(go.Figure(go.Surface(x=maturity.astype(np.float32), y=moneyness.astype(np.float32),
+                                              z=iv.astype(np.float32))))
+        fila(f'superficie {resolucion}x{resolucion}', como_listas(antes), bytes_figura(antes), bytes_figura(ahora))
+
+    strikes = np.arange(8000.0, 13000.0, 50.0)
+    skew = pd.DataFrame({'Strike': strikes, 'Vol_call': 0.2 + ((strikes - 10500) / 10000) ** 2})
+    antes = px.line(skew, x='Strike', y='Vol_call', markers=True)
+    ahora = aligerar(go.Figure([go.Scatter(x=strikes, y=skew['Vol_call'].to_numpy(), name=tipo) for tipo in ['call', 'put']]))
+    fila('skew (calls y puts)', como_listas(antes), bytes_figura(antes), bytes_figura(ahora))
+
+
+if __name__ == '__main__':
+    main()
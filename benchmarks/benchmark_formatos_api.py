@@ -0,0 +1,78 @@
+"""
+Compara los formatos de respuesta de /volatilities/: tamaño del cuerpo, tiempo
+de serialización en la API y tiempo que tarda el cliente en tener el DataFrame.
+
+JSON se decodifica como hacía la interfaz (response.json() + pd.DataFrame) y
+Arrow/Parquet se leen directamente en columnas.
+
+Uso:
+    python benchmarks/benchmark_formatos_api.py
+"""
+import gzip
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'aplicacion'))
+
+import formatos  # noqa: E402
+
+FILAS = [500, 5000, 50000]
+REPETICIONES = 5
+
+
+def generar_items(n):
+    """Volatilidades sintéticas con griegas, como las devuelve DynamoDB tras convertir los Decimal."""
+    rng = np.random.default_rng(0)
+    items = []
+    for i in range(n):
+        item = {'id': f'2024-06-{i % 28 + 1:02d}_{9000 + i}', 'Fecha': f'2024-06-{i % 28 + 1:02d}',
+                'Fecha_scrap': '2024-05-10', 'Strike': float(9000 + i),
+                'Vol_call': float(rng.uniform(0.1, 0.4)), 'Vol_put': float(rng.uniform(0.1, 0.4))}
+        for griega in formatos.GRIEGAS:
+            for tipo in ['call', 'put']:
+                item[f'{griega}_{tipo}'] = float(rng.normal())
+        items.append(item)
+    return items
+
+
+def decodificar(cuerpo, formato):
+    if formato == formatos.ARROW:
+        return pa.ipc.open_stream(cuerpo).read_pandas()
+    if formato == formatos.PARQUET:
+        return pd.read_parquet(io.BytesIO(cuerpo))
+    if formato == formatos.NDJSON:
+        return pd.DataFrame([json.loads(linea) for linea in cuerpo.splitlines()])
+    return pd.DataFrame(json.loads(cuerpo))
+
+
+def medir(funcion):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, min(tiempos) * 1000
+
+
+def main():
+    print(f"{'filas':>6} {'formato':>38} {'bytes':>10} {'gzip':>10} {'serializar (ms)':>16} {'decodificar (ms)':>17}")
+    for n in FILAS:
+        items = generar_items(n)
+        for formato in formatos.FORMATOS:
+            cuerpo, t_serializar = medir(lambda: formatos.serializar(items, formato))
+            df, t_decodificar = medir(lambda: decodificar(cuerpo, formato))
+            assert len(df) == n
+            print(f'{n:>6} {formato:>38} {len(cuerpo):>10} {len(gzip.compress(cuerpo)):>10} '
+                  f'{t_serializar:>16.1f} {t_decodificar:>17.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compara el coste de obtener la cadena de un (Fecha_scrap, Fecha) en los callbacks
+de la interfaz: filtro con máscaras booleanas sobre todo el histórico (antes) frente
+al índice que se construye una vez por carga de datos (gestor_datos.DatosCargados).
+
+Uso:
+    python benchmarks/benchmark_indice_cadenas.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'interfaz'))
+
+from gestor_datos import DatosCargados  # noqa: E402
+
+DIAS = [10, 100, 1000]
+VENCIMIENTOS = 12
+STRIKES = 60
+CONSULTAS = 200
+
+
+def generar_historico(dias):
+    fechas_scrap = pd.date_range('2021-01-01', periods=dias).strftime('%Y-%m-%d')
+    vencimientos = pd.date_range('2025-01-17', periods=VENCIMIENTOS, freq='MS').strftime('%Y-%m-%d')
+    indice = pd.MultiIndex.from_product([fechas_scrap, vencimientos, np.arange(9000.0, 9000.0 + 50 * STRIKES, 50)],
+                                        names=['Fecha_scrap', 'Fecha', 'Strike'])
+    df = indice.to_frame(index=False)
+    rng = np.random.default_rng(0)
+    df['Vol_call'] = rng.uniform(0.1, 0.4, len(df))
+    df['Vol_put'] = rng.uniform(0.1, 0.4, len(df))
+    return df.sort_values(['Fecha', 'Strike']).reset_index(drop=True)
+
+
+def main():
+    print(f"{'días':>6} {'filas':>9} {'máscaras (ms)':>14} {'índice (ms)':>12} {'construir índice (ms)':>22}")
+    for dias in DIAS:
+        df = generar_historico(dias)
+        inicio = time.perf_counter()
+        datos = DatosCargados(df, 1)
+        t_indice = (time.perf_counter() - inicio) * 1000
+
+        claves = list(datos.cadenas)[:CONSULTAS]
+        inicio = time.perf_counter()
+        for fecha_scrap, fecha in claves:
+            filtrado = df[(df['Fecha_scrap'] == fecha_scrap) & (df['Fecha'] == fecha)]
+            filtrado['Strike'].to_numpy(), filtrado['Vol_call'].to_numpy()
+        t_mascaras = (time.perf_counter() - inicio) * 1000 / len(claves)
+
+        inicio = time.perf_counter()
+        for fecha_scrap, fecha in claves:
+            cadena = datos.cadena(fecha_scrap, fecha)
+            cadena.strike, cadena.vol_call
+        t_consulta = (time.perf_counter() - inicio) * 1000 / len(claves)
+
+        print(f'{dias:>6} {len(df):>9} {t_mascaras:>14.3f} {t_consulta:>12.5f} {t_indice:>22.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compara el parseo de la página de MEFF antes y después de extraer las dos tablas en una sola pasada.
+
+Uso:
+    python benchmarks/benchmark_parser_meff.py [fichero.html ...]
+
+Sin argumentos se usan las páginas guardadas en tests/fixtures.
+"""
+import glob
+import os
+import sys
+import timeit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'scrap'))
+
+from scrapping_s3_meff import obtener_dataframe, obtener_tablas  # noqa: E402
+
+
+class RespuestaGuardada:
+    """Imita la respuesta de requests a partir de un HTML guardado."""
+    status_code = 200
+
+    def __init__(self, contenido):
+        self.content = contenido
+
+
+def ruta_anterior(response):
+    # Dos árboles BeautifulSoup con html.parser sobre la misma página
+    return {'opciones': obtener_dataframe(response, 'opciones'),
+            'futuros': obtener_dataframe(response, 'futuros')}
+
+
+def ruta_nueva(response):
+    return obtener_tablas(response)
+
+
+def medir(funcion, response, repeticiones):
+    tiempos = timeit.repeat(lambda: funcion(response), number=1, repeat=repeticiones)
+    return min(tiempos) * 1000
+
+
+def main(ficheros, repeticiones=5):
+    print(f"{'fichero':<30} {'KB':>7} {'anterior (ms)':>14} {'nuevo (ms)':>11} {'mejora':>7}")
+    for fichero in ficheros:
+        with open(fichero, 'rb') as f:
+            response = RespuestaGuardada(f.read())
+
+        anterior, nuevo = ruta_anterior(response), ruta_nueva(response)
+        for tipo in anterior:
+            assert anterior[tipo].equals(nuevo[tipo]), f'La tabla {tipo} no coincide en {fichero}'
+
+        t_anterior = medir(ruta_anterior, response, repeticiones)
+        t_nuevo = medir(ruta_nueva, response, repeticiones)
+        print(f'{os.path.basename(fichero):<30} {len(response.content) / 1024:>7.0f} '
+              f'{t_anterior:>14.1f} {t_nuevo:>11.1f} {t_anterior / t_nuevo:>6.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob.glob(os.path.join(RAIZ, 'tests', 'fixtures', '*.html'))))
@@ -5,21 +5,24 @@ import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
 from dash import no_update
 
+import os
+import sys
 import numpy as np
-import pandas as pd
 from datetime import datetime
-from scipy.interpolate import griddata
 from datetime import date
 import requests
+import json
 
-import plotly.express as px
 import plotly.graph_objects as go
 
-#Librerias para obtener datos
-import boto3
-import pandas as pd
-from decimal import Decimal
-from io import BytesIO
+from gestor_datos import GRIEGAS, TIMEOUT, GestorDatos
+from cache_figuras import crear_cache
+from figuras import CAMPOS_NUMERICOS, aligerar, trazo_lineas
+
+# En la imagen superficie.py se copia junto a este módulo (interfaz/dockerfile);
+# al ejecutar la aplicación desde el repositorio se importa de aplicacion/.
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'aplicacion'))
+from superficie import decodificar_array  # noqa: E402
 
 
 ### Estilos 
@@ -171,70 +174,35 @@ chatbot_modal_style = {
 
 
 # Funciones Volatilidad
-def calcular_tiempo_a_madurez(df):
+def datos_superficie(url, fecha_scrap, tipo_opcion, resolucion=None):
     """
-    Calcula el tiempo hasta la madurez desde la fecha actual hasta las fechas en la columna 'Fecha' del DataFrame dado.
-    La función retorna una columna con los tiempos calculados.
+    Obtiene de la API la superficie de volatilidad ya interpolada.
 
     Args:
-        df (pd.DataFrame): DataFrame que contiene una columna 'Fecha' con las fechas de expiración.
-
-    Returns:
-        pd.Series: Serie con los tiempos hasta la madurez en años.
-    """
-    df_temp = df.copy()  # Trabajar con una copia para evitar efectos secundarios en el DataFrame original
-    df_temp['Fecha'] = pd.to_datetime(df_temp['Fecha'])
-    fecha_base = pd.Timestamp(datetime.now().date())
-    return (df_temp['Fecha'] - fecha_base).dt.days / 365.25
-
-def preparar_datos(df, precio_subyacente, tipo_opcion):
-    """
-    Prepara los datos para la interpolación necesaria para crear una superficie de volatilidad.
-
-    Args:
-        df (pd.DataFrame): DataFrame con las columnas 'Fecha', 'Strike', 'Vol_call', y 'Vol_put'.
-        precio_subyacente (float): Precio actual del activo subyacente para calcular el Moneyness.
+        url (str): URL del endpoint /surface/ de la API.
+        fecha_scrap (str): Día de scrap del snapshot.
         tipo_opcion (str): Tipo de opción, 'call' o 'put'.
+        resolucion (int): Puntos de cada eje de la malla; None para la resolución por defecto de la API.
 
     Returns:
-        tuple: Contiene tres arrays numpy que representan la malla de Tiempo a Madurez (T),
-               Moneyness (M) y los valores interpolados de Volatilidad Implícita (IV).
+        tuple: Ejes 1-D de Tiempo a Madurez (T) y Moneyness (M) y la malla de Volatilidad Implícita (IV),
+               con una fila por moneyness y una columna por madurez. None si la API no la devuelve.
     """
-    # Calcula la madurez y asigna a la columna 'Maturity'
-    df['Maturity'] = calcular_tiempo_a_madurez(df)
-    
-    # Calcula el Moneyness
-    df['Moneyness'] = df['Strike'] / precio_subyacente
-    
-    # Selecciona la volatilidad según el tipo de opción y asegura no trabajar en copias
-    if tipo_opcion == 'call':
-        df = df.dropna(subset=['Vol_call']).copy()
-        df.loc[:, 'VolatilidadImplicita'] = df['Vol_call']
-    elif tipo_opcion == 'put':
-        df = df.dropna(subset=['Vol_put']).copy()
-        df.loc[:, 'VolatilidadImplicita'] = df['Vol_put']
-    
-    # Agrupa por 'Maturity' y 'Moneyness' y calcula la media de la volatilidad implícita
-    df_agrupado = df.groupby(['Maturity', 'Moneyness'], as_index=False)['VolatilidadImplicita'].mean()
-
-    # Prepara los datos para la interpolación
-    Maturity = np.linspace(df_agrupado['Maturity'].min(), df_agrupado['Maturity'].max(), 100)
-    Moneyness = np.linspace(df_agrupado['Moneyness'].min(), df_agrupado['Moneyness'].max(), 100)
-    T_grid, M_grid = np.meshgrid(Maturity, Moneyness)
-
-    # Interpolación para crear la superficie de volatilidad
-    IV_grid = griddata(
-        (df_agrupado['Maturity'].values, df_agrupado['Moneyness'].values),
-        df_agrupado['VolatilidadImplicita'].values,
-        (T_grid, M_grid),
-        method='cubic'
-    )
-
-    return T_grid, M_grid, IV_grid
+    try:
+        params = {'fecha_scrap': fecha_scrap, 'tipo': tipo_opcion}
+        if resolucion is not None:
+            params['resolucion'] = resolucion
+        response = requests.get(url, params=params, timeout=TIMEOUT)
+        response.raise_for_status()
+        datos = response.json()
+        return decodificar_array(datos['maturity']), decodificar_array(datos['moneyness']), decodificar_array(datos['iv'])
+    except requests.RequestException as e:
+        print(f"Error al obtener la superficie de la API: {e}")
+        return None
 
 def plot_surface(X, Y, Z):
     # Crear el objeto figura y añadir la superficie
-    fig = go.Figure(data=[go.Surface(z=Z, x=X, y=Y, colorscale='RdBu', cmin=Z.min(), cmax=Z.max())])
+    fig = go.Figure(data=[go.Surface(z=Z, x=X, y=Y, colorscale='RdBu', cmin=np.nanmin(Z), cmax=np.nanmax(Z))])
     
     # Personalizar la apariencia del gráfico
     fig.update_layout(
@@ -279,73 +247,54 @@ def plot_surface(X, Y, Z):
     
     return fig
     
-def crear_grafico(df, subyacente, tipo_opcion):
-    T_type, M_type, IV_type = preparar_datos(df, subyacente, tipo_opcion)
-    return plot_surface(T_type, M_type, IV_type)
+def figura_cargando(texto='Cargando datos...'):
+    """Figura vacía con un aviso, para mientras no hay datos."""
+    fig = go.Figure()
+    fig.update_layout(xaxis={'visible': False}, yaxis={'visible': False}, plot_bgcolor='white',
+                      annotations=[dict(text=texto, showarrow=False, font=dict(size=16))])
+    return fig
+
+# Mallas y figuras ya construidas por (día de scrap, tipo, resolución, versión de los datos)
+RESOLUCION_SUPERFICIE = 100
+RESOLUCIONES_SUPERFICIE = [50, 100, 200]
+cache_superficies = crear_cache(max_entradas=32)
+
+def crear_grafico(fecha_scrap, tipo_opcion, resolucion=RESOLUCION_SUPERFICIE, version=None):
+    """
+    Figura de la superficie de volatilidad, servida desde la caché si ya se ha construido
+    con la misma versión de los datos. El precio del subyacente lo fija la API para cada
+    día de scrap, así que no hace falta en la clave.
+    """
+    cache_superficies.comprobar_version(version)
+    clave = (fecha_scrap, tipo_opcion, resolucion, version)
+    entrada = cache_superficies.obtener(clave)
+    if entrada is None:
+        superficie = datos_superficie(api_superficie, fecha_scrap, tipo_opcion, resolucion)
+        if superficie is None:
+            return go.Figure()
+        entrada = cache_superficies.guardar(clave, {'superficie': superficie,
+                                                    'figura': aligerar(plot_surface(*superficie))})
+    return entrada['figura']
 
 
 # Obtenemos datos
 # Establecer estilos de la aplicación y componentes externos
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
 
-# Obtenemos datos API dynamodb
-
-def datos_dynamodb(url):
-    """Obtiene datos desde una API REST y retorna un DataFrame."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Asegura que la respuesta es exitosa
-        data = response.json()       # Parsea la respuesta JSON a un diccionario
-        df = pd.DataFrame(data)      # Convierte el diccionario a DataFrame
-
-        # Convertir todas las columnas que contienen decimales a flotantes
-        for column in ['Vol_call', 'Strike', 'Vol_put']:
-            df[column] = df[column].apply(lambda x: float(x) if isinstance(x, Decimal) else x)
-
-        # Filtrar y ordenar el DataFrame
-        df = df.loc[:, ['Fecha_scrap', 'Fecha', 'Strike', 'Vol_call', 'Vol_put']]
-        df = df.sort_values(by=['Fecha', 'Strike'])
-        df = df.reset_index(drop=True)
-
-        # Reemplazar valores menores que 0.001 en 'Vol_call' y 'Vol_put' por NaN
-        df['Vol_call'] = df['Vol_call'].mask(df['Vol_call'] < 0.001, np.nan)
-        df['Vol_put'] = df['Vol_put'].mask(df['Vol_put'] < 0.001, np.nan)
-
-        return df
-
-    except requests.RequestException as e:
-        print(f"Error al hacer la solicitud HTTP: {e}")
-        return pd.DataFrame()  # Retorna un DataFrame vacío en caso de error
-    
-
-def datos_s3(url):
-    """Función para obtener datos JSON desde la API y retornarlos como un DataFrame."""
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # Lanzará un error si la respuesta de la API no es exitosa
-        data = response.json()
-        return pd.DataFrame(data)
-    except requests.RequestException as e:
-        print(f"Error al hacer la solicitud a la API: {e}")
-        return pd.DataFrame()  # Retorna un DataFrame vacío en caso de error
-
 # URL de la API
 api_url = "http://172.31.46.128:8000/volatilities/"
-api_futuros = "http://172.31.46.128:8000/datos-futuros"
+api_superficie = "http://172.31.46.128:8000/surface/"
+api_atm = "http://172.31.46.128:8000/atm/"
 
-# Obtener los datos de la API 
-df = datos_dynamodb(api_url)
-df_futuro = datos_s3(api_futuros)
+# Los datos se cargan en segundo plano: el servidor arranca sin esperar a la API
+# y los callbacks muestran "Cargando datos..." hasta que llega la primera carga
+gestor = GestorDatos(api_url, url_atm=api_atm)
+gestor.iniciar()
 
-# Obtenemos datos necesarios para representar las volatilidades
-unique_dates = df['Fecha'].unique()
-dates_scrap = df['Fecha_scrap'].unique()
-precio_subyacente = df_futuro.loc[0, 'Ant']
+# Servidor WSGI de Flask, para gunicorn (ver wsgi.py)
+server = app.server
 
 
-# Asumiendo que 'messages' es una variable global o de sesión que almacena los mensajes
-messages = []
-
 # Dash app
 app.layout = html.Div([
     html.Div([
@@ -357,6 +306,9 @@ app.layout = html.Div([
         html.Hr(),
         html.P('Superficie de volatilidad', style={'font-weight': 'bold'}),
         html.Button('Visualizar Volatilidad', id='btn-visualize', n_clicks=0, style=button_style),
+        html.Hr(),
+        html.P('Comparativa', style={'font-weight': 'bold'}),
+        html.Button('Comparar días de scrap', id='btn-comparar', n_clicks=0, style=button_style),
     ], style=sidebar_style),
     
 html.Div([
@@ -366,8 +318,8 @@ html.Div([
             html.Label('Escoge día de scrap:', style={'margin-right': '10px', 'color': 'black'}),
             dcc.Dropdown(
                 id='scrap-date-picker',
-                options=[{'label': date, 'value': date} for date in dates_scrap],
-                value=dates_scrap[0],
+                options=[],
+                value=None,
                 style={'width': '300px', 'border-radius': '10px'}
             )
         ], style={'display': 'flex', 'align-items': 'center', 'margin-bottom': '20px', 'margin-right': '10px'}),  # Reduce margin-right here
@@ -376,8 +328,8 @@ html.Div([
             html.Label('Escoge la fecha a visualizar:', style={'margin-right': '10px', 'color': 'black'}),
             dcc.Dropdown(
                 id='date-picker',
-                options=[{'label': date, 'value': date} for date in unique_dates],
-                value=unique_dates[0],
+                options=[],
+                value=None,
                 style={'width': '300px', 'border-radius': '10px'}
             )
         ], style={'display': 'flex', 'align-items': 'center', 'margin-bottom': '20px', 'margin-left': '10px'}),  # Adjust margin-left here
@@ -387,6 +339,17 @@ html.Div([
 ], style=content_style),
     
     html.Div(id='dynamic-content', style=content_style),   
+
+    html.Div(id='comparar-content', style=content_style),
+
+    # Comprobación periódica de si el gestor tiene una carga nueva de datos
+    dcc.Interval(id='intervalo-datos', interval=2000),
+    dcc.Store(id='version-datos'),
+
+    # Estado de cada sesión del navegador
+    dcc.Store(id='menu-seleccionado', storage_type='session', data='btn-call'),
+    dcc.Store(id='skew-figura'),
+    dcc.Store(id='mensajes-chat', data=[]),
     
     # Elementos del Chatbot
     dbc.Button("Chatbot", id="chatbot-toggle-button", n_clicks=0, style=chat_button_style),
@@ -407,90 +370,133 @@ html.Div([
     ], id="chatbot-container", is_open=False, style=chatbot_modal_style)
 ])
 
-### Volatilidad implícita
-selected_menu = "btn-call"
+### Datos
+@app.callback(
+    Output('version-datos', 'data'),
+    [Input('intervalo-datos', 'n_intervals')],
+    [State('version-datos', 'data')]
+)
+def check_data_version(n_intervals, version):
+    datos = gestor.datos
+    if datos is None or datos.id_datos == version:
+        raise PreventUpdate
+    return datos.id_datos
 
 @app.callback(
-    [Output('btn-call', 'style'),
-     Output('btn-put', 'style'),
-     Output('volatility-graph', 'figure')],
-    [Input('btn-call', 'n_clicks'),
-     Input('btn-put', 'n_clicks'),
-     Input('date-picker', 'value'),
-     Input('scrap-date-picker', 'value')],
-    [State('btn-call', 'style'),
-     State('btn-put', 'style')]
+    [Output('scrap-date-picker', 'options'),
+     Output('scrap-date-picker', 'value')],
+    [Input('version-datos', 'data')],
+    [State('scrap-date-picker', 'value')]
 )
-def update_content(call_clicks, put_clicks, selected_date, scrap_date, call_style, put_style):
-    global selected_menu
+def update_scrap_options(version, selected_scrap_date):
+    datos = gestor.datos
+    if datos is None:
+        raise PreventUpdate
+    options = [{'label': date, 'value': date} for date in datos.fechas_scrap]
+    # Se conserva el día elegido si sigue existiendo tras la recarga
+    if selected_scrap_date not in datos.fechas_scrap:
+        selected_scrap_date = datos.fechas_scrap[0] if datos.fechas_scrap else None
+    return options, selected_scrap_date
 
-    # Obtener el contexto para saber qué botón fue presionado
-    ctx = dash.callback_context
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else None
-
-    # Filtrar el dataframe por scrap_date y luego por la fecha seleccionada
-    filtered_df = df[(df['Fecha_scrap'] == scrap_date) & (df['Fecha'] == selected_date)]
-    fig = None
-
-    if triggered_id in ['btn-call', 'btn-put']:
-        # Ajustar la lógica de selección basada en qué botón fue presionado
-        if triggered_id == 'btn-call':
-            filtered_df = filtered_df.dropna(subset=['Vol_call'])
-            fig = px.line(filtered_df, x='Strike', y='Vol_call', title='Volatilidad de Call en función del Strike',
-                          markers=True)
-            call_style = active_button_style
-            put_style = button_style
-            selected_menu = triggered_id
-            
-        elif triggered_id == 'btn-put':
-            filtered_df = filtered_df.dropna(subset=['Vol_put'])
-            fig = px.line(filtered_df, x='Strike', y='Vol_put', title='Volatilidad de Put en función del Strike',
-                          markers=True)
-            call_style = button_style
-            put_style = active_button_style
-            selected_menu = triggered_id
-            
-    else:
-        # Usar el estado actual del menú para determinar el gráfico y estilos
-        if selected_menu == 'btn-call':
-            filtered_df = filtered_df.dropna(subset=['Vol_call'])
-            fig = px.line(filtered_df, x='Strike', y='Vol_call', title='Volatilidad de Call en función del Strike',
-                          markers=True)
-            call_style = active_button_style
-            put_style = button_style
-            
-        elif selected_menu == 'btn-put':
-            filtered_df = filtered_df.dropna(subset=['Vol_put'])
-            fig = px.line(filtered_df, x='Strike', y='Vol_put', title='Volatilidad de Put en función del Strike',
-                          markers=True)
-            call_style = button_style
-            put_style = active_button_style
+
+### Volatilidad implícita
+# El servidor envía una sola figura con las series de calls y puts de la cadena
+# elegida. Cambiar entre "Opciones Call" y "Opciones Put" solo cambia qué serie
+# es visible y el estilo de los botones, así que se hace en el navegador con un
+# callback clientside, sin ir al servidor. El botón elegido se guarda en un
+# dcc.Store de la sesión.
+TITULOS_SKEW = {tipo: f'Volatilidad de {tipo.capitalize()} en función del Strike' for tipo in ['call', 'put']}
+# Al pasar el ratón por un strike se muestran las griegas que guarda la lambda de volatilidad
+HOVER_SKEW = ('Strike: %{x}<br>Volatilidad: %{y:.2%}<br>'
+              + '<br>'.join(f'{griega}: %{{customdata[{i}]:.4f}}' for i, griega in enumerate(GRIEGAS))
+              + '<extra></extra>')
+
+def grafico_skew(cadena):
+    """Figura con la volatilidad de calls y puts en función del strike (sin los strikes sin volatilidad)."""
+    fig = go.Figure()
+    for tipo, vol, griegas in [('call', cadena.vol_call, cadena.griegas_call),
+                               ('put', cadena.vol_put, cadena.griegas_put)]:
+        con_vol = ~np.isnan(vol)
+        fig.add_trace(trazo_lineas(cadena.strike[con_vol], vol[con_vol], name=tipo, mode='lines+markers',
+                                   visible=tipo == 'call', showlegend=False,
+                                   customdata=griegas[con_vol], hovertemplate=HOVER_SKEW))
 
     # Configuración común del gráfico
-    if fig:
-        fig.update_layout(
-            xaxis=dict(
-                showline=True,
-                linecolor='black',
-                linewidth=1,
-                showgrid=True,
-                showticklabels=True,
-                ticks='outside',
-                gridcolor='lightgrey'
-            ),
-            yaxis=dict(
-                showline=True,
-                linecolor='black',
-                linewidth=1,
-                showgrid=True,
-                showticklabels=True,
-                ticks='outside',
-                gridcolor='lightgrey'
-            ),
-            plot_bgcolor='white'
-        )
-
-    return [call_style, put_style, fig]
+    fig.update_layout(
+        title=TITULOS_SKEW['call'],
+        xaxis=dict(
+            title='Strike',
+            showline=True,
+            linecolor='black',
+            linewidth=1,
+            showgrid=True,
+            showticklabels=True,
+            ticks='outside',
+            gridcolor='lightgrey'
+        ),
+        yaxis=dict(
+            title='Vol_call',
+            showline=True,
+            linecolor='black',
+            linewidth=1,
+            showgrid=True,
+            showticklabels=True,
+            ticks='outside',
+            gridcolor='lightgrey'
+        ),
+        plot_bgcolor='white'
+    )
+    return fig
+
+
+@app.callback(
+    Output('skew-figura', 'data'),
+    [Input('date-picker', 'value'),
+     Input('scrap-date-picker', 'value')]
+)
+def update_content(selected_date, scrap_date):
+    datos = gestor.datos
+    if datos is None:
+        return figura_cargando().to_dict()
+
+    # Cadena del día de scrap y la fecha seleccionada, ya indexada en la carga de datos
+    return aligerar(grafico_skew(datos.cadena(scrap_date, selected_date)), CAMPOS_NUMERICOS + ('customdata',))
+
+
+app.clientside_callback(
+    """
+    function(figura, call_clicks, put_clicks, menu) {
+        const ctx = dash_clientside.callback_context;
+        const disparador = ctx.triggered.length ? ctx.triggered[0].prop_id.split('.')[0] : null;
+        if (disparador === 'btn-call' || disparador === 'btn-put') {
+            menu = disparador;
+        }
+        menu = menu || 'btn-call';
+        const tipo = menu === 'btn-put' ? 'put' : 'call';
+        const activo = %(activo)s, inactivo = %(inactivo)s, titulos = %(titulos)s;
+        const estilos = tipo === 'call' ? [activo, inactivo] : [inactivo, activo];
+        if (!figura) {
+            return [dash_clientside.no_update, estilos[0], estilos[1], menu];
+        }
+        const layout = Object.assign({}, figura.layout);
+        if ((figura.data || []).length) {
+            layout.title = {text: titulos[tipo]};
+            layout.yaxis = Object.assign({}, layout.yaxis, {title: {text: 'Vol_' + tipo}});
+        }
+        const data = (figura.data || []).map(t => Object.assign({}, t, {visible: t.name === tipo}));
+        return [Object.assign({}, figura, {data: data, layout: layout}), estilos[0], estilos[1], menu];
+    }
+    """ % {'activo': json.dumps(active_button_style), 'inactivo': json.dumps(button_style),
+           'titulos': json.dumps(TITULOS_SKEW)},
+    [Output('volatility-graph', 'figure'),
+     Output('btn-call', 'style'),
+     Output('btn-put', 'style'),
+     Output('menu-seleccionado', 'data')],
+    [Input('skew-figura', 'data'),
+     Input('btn-call', 'n_clicks'),
+     Input('btn-put', 'n_clicks')],
+    [State('menu-seleccionado', 'data')]
+)
 
 @app.callback(
     [Output('date-picker', 'options'),
@@ -499,11 +505,12 @@ def update_content(call_clicks, put_clicks, selected_date, scrap_date, call_styl
 )
 
 def update_date_options(selected_scrap_date):
-    # Filtrar el DataFrame para obtener solo los datos de la fecha de scrap seleccionada
-    filtered_df = df[df['Fecha_scrap'] == selected_scrap_date]
-    
-    # Obtener las fechas únicas del DataFrame filtrado
-    unique_dates = filtered_df['Fecha'].unique()
+    datos = gestor.datos
+    if datos is None:
+        return [], None
+
+    # Vencimientos del día de scrap seleccionado, precalculados en la carga de datos
+    unique_dates = datos.vencimientos.get(selected_scrap_date, [])
     
     # Crear opciones para el dropdown
     options = [{'label': date, 'value': date} for date in unique_dates]
@@ -528,13 +535,16 @@ def update_visualization_area(n_clicks, children):
     if children:
         return None, button_style
     else:
+        datos = gestor.datos
+        dates_scrap = datos.fechas_scrap if datos is not None else []
+
         # Dropdown para seleccionar el día de scrap (compartido con la sección de volatilidad implícita)
         scrap_date_selector = html.Div([
             html.Label('Escoge día de scrap:', style={'margin-right': '10px', 'color': 'black'}),
             dcc.Dropdown(
                 id='scrap-date-surface',  # Mismo ID que en volatilidad implícita
                 options=[{'label': date, 'value': date} for date in dates_scrap],
-                value=dates_scrap[0],
+                value=dates_scrap[0] if dates_scrap else None,
                 style={'width': '200px', 'display': 'inline-block', 'vertical-align': 'middle', 'border-radius': '10px'}
             )
         ], style={'display': 'flex', 'align-items': 'center', 'margin-right': '20px'})
@@ -588,6 +598,18 @@ def update_visualization_area(n_clicks, children):
             )
         ], style={'display': 'flex', 'align-items': 'center', 'justify-content': 'flex-start', 'flex-wrap': 'wrap', 'padding': '20px 0'})
 
+        # Dropdown para elegir los puntos de cada eje de la malla (menos puntos, figura más ligera)
+        resolution_selector = html.Div([
+            html.Label('Resolución de la malla:', style={'margin-right': '10px', 'color': 'black'}),
+            dcc.Dropdown(
+                id='resolution-dropdown',
+                options=[{'label': f'{n} x {n}', 'value': n} for n in RESOLUCIONES_SUPERFICIE],
+                value=RESOLUCION_SUPERFICIE,
+                clearable=False,
+                style={'width': '150px', 'display': 'inline-block', 'vertical-align': 'middle', 'border-radius': '10px'}
+            )
+        ], style={'display': 'flex', 'align-items': 'center', 'margin-left': '20px'})
+
         content = html.Div([
             html.H2("Superficie de Volatilidad", className="text-left mb-2", style={'border-bottom': '1px solid grey', 'padding-bottom': '25px'}),
             dbc.Row([
@@ -596,7 +618,8 @@ def update_visualization_area(n_clicks, children):
             ], className="g-2"),
             html.Div([
                 scrap_date_selector,
-                option_selector
+                option_selector,
+                resolution_selector
             ], style={'display': 'flex', 'align-items': 'center'}),
             dcc.Graph(id='surface-volatility-graph')  # El gráfico específico para la superficie de volatilidad
         ], style={'padding': '10px'})
@@ -606,84 +629,223 @@ def update_visualization_area(n_clicks, children):
 @app.callback(
     Output('surface-volatility-graph', 'figure'),  # Actualizar el gráfico en la interfaz
     [Input('option-dropdown', 'value'),  # Escuchar los cambios en el dropdown de tipo de opción
-     Input('scrap-date-surface', 'value')]  # Escuchar los cambios en el dropdown del día de scrap
+     Input('scrap-date-surface', 'value'),  # Escuchar los cambios en el dropdown del día de scrap
+     Input('resolution-dropdown', 'value')]  # Escuchar los cambios de resolución de la malla
 )
-def update_surface_graph(option_type, selected_scrap_date):
-    # Filtrar el dataframe por el día de scrap seleccionado
-    filtered_df = df[df['Fecha_scrap'] == selected_scrap_date]
+def update_surface_graph(option_type, selected_scrap_date, resolution=RESOLUCION_SUPERFICIE):
+    if selected_scrap_date is None:
+        return figura_cargando()
+    # La API devuelve la superficie del día de scrap ya interpolada: aquí solo se representa
+    datos = gestor.datos
+    return crear_grafico(selected_scrap_date, option_type, resolution or RESOLUCION_SUPERFICIE,
+                         version=datos.id_datos if datos is not None else None)
+
+
+
+### Comparativa de días de scrap
+# Vistas con varios días de scrap a la vez: el skew de un vencimiento en cada día,
+# la estructura temporal de la volatilidad ATM y su histórico. Cada vista hace una
+# sola consulta a los índices de la carga de datos (cadenas_vencimiento, atm_scrap,
+# atm_vencimiento) y los puntos ATM ya vienen calculados por la lambda de volatilidad,
+# así que dibujar 60 días de histórico no recorre ninguna cadena.
+DIAS_COMPARAR = 5
+
+EJE = dict(showline=True, linecolor='black', linewidth=1, showgrid=True, showticklabels=True,
+           ticks='outside', gridcolor='lightgrey')
+
+def figura_lineas(titulo, titulo_x, titulo_y):
+    """Figura vacía con el estilo de los gráficos de líneas de la aplicación."""
+    fig = go.Figure()
+    fig.update_layout(title=titulo, xaxis=dict(title=titulo_x, **EJE), yaxis=dict(title=titulo_y, **EJE),
+                      plot_bgcolor='white')
+    return fig
 
-    # Crear el gráfico basado en el tipo de opción seleccionada y el dataframe filtrado
-    return crear_grafico(filtered_df, precio_subyacente, option_type)
+def grafico_comparar_skew(cadenas, tipo_opcion):
+    """Skew de un vencimiento con una serie por día de scrap."""
+    fig = figura_lineas(f'Volatilidad de {tipo_opcion.capitalize()} en función del Strike', 'Strike', f'Vol_{tipo_opcion}')
+    for fecha_scrap, cadena in cadenas.items():
+        vol = cadena.vol_call if tipo_opcion == 'call' else cadena.vol_put
+        con_vol = ~np.isnan(vol)
+        fig.add_trace(trazo_lineas(cadena.strike[con_vol], vol[con_vol], name=fecha_scrap, mode='lines+markers'))
+    return fig
 
+def grafico_estructura_atm(puntos_por_scrap, tipo_opcion):
+    """Volatilidad ATM en función de la madurez, una serie por día de scrap."""
+    fig = figura_lineas('Estructura temporal de la volatilidad ATM', 'Maturity Time', f'Vol_{tipo_opcion} ATM')
+    for fecha_scrap, puntos in puntos_por_scrap.items():
+        columna = f'Vol_{tipo_opcion}'
+        con_vol = puntos[columna].notna()
+        fig.add_trace(trazo_lineas(puntos.loc[con_vol, 'T'].to_numpy(), puntos.loc[con_vol, columna].to_numpy(),
+                                   name=fecha_scrap, mode='lines+markers'))
+    return fig
+
+def grafico_historico_atm(puntos, fecha):
+    """Volatilidad ATM de calls y puts de un vencimiento en cada día de scrap."""
+    fig = figura_lineas(f'Histórico de la volatilidad ATM ({fecha})', 'Fecha de scrap', 'Volatilidad ATM')
+    for tipo in ['call', 'put']:
+        columna = f'Vol_{tipo}'
+        con_vol = puntos[columna].notna()
+        fig.add_trace(trazo_lineas(puntos.loc[con_vol, 'Fecha_scrap'].tolist(), puntos.loc[con_vol, columna].to_numpy(),
+                                   name=tipo, mode='lines+markers'))
+    return fig
+
+@app.callback(
+    [Output('comparar-content', 'children'),
+     Output('btn-comparar', 'style')],
+    [Input('btn-comparar', 'n_clicks')],
+    [State('comparar-content', 'children')]
+)
+def update_compare_area(n_clicks, children):
+    if n_clicks is None or n_clicks == 0:
+        return no_update, button_style
+
+    if children:
+        return None, button_style
+
+    datos = gestor.datos
+    vencimientos = sorted(datos.scraps_por_vencimiento) if datos is not None else []
+
+    def selector(etiqueta, componente):
+        return html.Div([html.Label(etiqueta, style={'margin-right': '10px', 'color': 'black'}), componente],
+                        style={'display': 'flex', 'align-items': 'center', 'margin-right': '20px', 'margin-bottom': '20px'})
+
+    content = html.Div([
+        html.H2("Comparativa de días de scrap", className="text-left mb-2",
+                style={'border-bottom': '1px solid grey', 'padding-bottom': '25px'}),
+        html.Div([
+            selector('Vencimiento:', dcc.Dropdown(
+                id='comparar-vencimiento',
+                options=[{'label': fecha, 'value': fecha} for fecha in vencimientos],
+                value=vencimientos[0] if vencimientos else None,
+                style={'width': '200px', 'border-radius': '10px'})),
+            selector('Tipo:', dcc.Dropdown(
+                id='comparar-tipo',
+                options=[{'label': 'Call Options', 'value': 'call'}, {'label': 'Put Options', 'value': 'put'}],
+                value='call', clearable=False,
+                style={'width': '150px', 'border-radius': '10px'})),
+            selector('Días de scrap:', dcc.Dropdown(
+                id='comparar-scraps', options=[], value=[], multi=True,
+                style={'min-width': '400px', 'border-radius': '10px'})),
+        ], style={'display': 'flex', 'align-items': 'center', 'flex-wrap': 'wrap', 'padding': '20px 0'}),
+        dcc.Graph(id='comparar-skew-graph'),
+        dcc.Graph(id='atm-estructura-graph'),
+        dcc.Graph(id='atm-historico-graph'),
+    ], style={'padding': '10px'})
+
+    return content, active_button_style
+
+@app.callback(
+    [Output('comparar-scraps', 'options'),
+     Output('comparar-scraps', 'value')],
+    [Input('comparar-vencimiento', 'value')]
+)
+def update_compare_scraps(fecha):
+    datos = gestor.datos
+    if datos is None:
+        return [], []
+    # Días en los que cotiza el vencimiento; se eligen los últimos DIAS_COMPARAR
+    fechas_scrap = datos.scraps_por_vencimiento.get(fecha, [])
+    return [{'label': f, 'value': f} for f in fechas_scrap], fechas_scrap[-DIAS_COMPARAR:]
+
+@app.callback(
+    [Output('comparar-skew-graph', 'figure'),
+     Output('atm-estructura-graph', 'figure')],
+    [Input('comparar-vencimiento', 'value'),
+     Input('comparar-scraps', 'value'),
+     Input('comparar-tipo', 'value')]
+)
+def update_compare_graphs(fecha, fechas_scrap, tipo_opcion):
+    datos = gestor.datos
+    if datos is None:
+        return figura_cargando(), figura_cargando()
+    tipo_opcion = tipo_opcion or 'call'
+    fechas_scrap = fechas_scrap or []
+    cadenas = datos.cadenas_vencimiento(fecha, fechas_scrap)
+    puntos_atm = {fecha_scrap: datos.atm_scrap(fecha_scrap) for fecha_scrap in sorted(fechas_scrap)}
+    return (aligerar(grafico_comparar_skew(cadenas, tipo_opcion)),
+            aligerar(grafico_estructura_atm(puntos_atm, tipo_opcion)))
+
+@app.callback(
+    Output('atm-historico-graph', 'figure'),
+    [Input('comparar-vencimiento', 'value')]
+)
+def update_atm_history(fecha):
+    datos = gestor.datos
+    if datos is None:
+        return figura_cargando()
+    return aligerar(grafico_historico_atm(datos.atm_vencimiento(fecha), fecha))
 
 
 ### Chatbot
+# Los mensajes de cada sesión se guardan como texto en el dcc.Store 'mensajes-chat'
+def mensaje(texto, usuario=False):
+    return {'texto': texto, 'usuario': usuario}
+
+def renderizar_mensajes(mensajes):
+    return [dbc.Card(dbc.CardBody(m['texto']), style=user_message_style if m['usuario'] else message_button_style)
+            for m in mensajes]
+
 @app.callback(
     [Output("chatbot-container", "is_open"),
      Output("messages-container", "children"),
      Output("options-container", "style"),
      Output("more-info-options", "style"),
-     Output("messages-container", "data-last-update")],
+     Output("messages-container", "data-last-update"),
+     Output("mensajes-chat", "data")],
     [Input("chatbot-toggle-button", "n_clicks"),
      Input("option-call", "n_clicks"),
      Input("option-put", "n_clicks"),
      Input("more-info-yes", "n_clicks"),
      Input("more-info-no", "n_clicks")],
-    [State("chatbot-container", "is_open")],
+    [State("chatbot-container", "is_open"),
+     State("mensajes-chat", "data")],
     prevent_initial_call=True
 )
 
-def manage_chatbot(chat_button_clicks, option_call_clicks, option_put_clicks, more_info_yes_clicks, more_info_no_clicks, is_open):
-    global messages
+def manage_chatbot(chat_button_clicks, option_call_clicks, option_put_clicks, more_info_yes_clicks, more_info_no_clicks, is_open, messages):
     ctx = dash.callback_context
 
     if not ctx.triggered:
         raise PreventUpdate
 
     button_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    messages = list(messages or [])
+
+    def respuesta(abierto, opciones, mas_info):
+        return (abierto, renderizar_mensajes(messages), {"display": opciones}, {"display": mas_info},
+                str(datetime.now().timestamp()), messages)
 
     if button_id == "chatbot-toggle-button":
         if is_open:
             messages = []  # Reiniciar mensajes
-            return False, [], {"display": "none"}, {"display": "none"}, str(datetime.now().timestamp())
+            return respuesta(False, "none", "none")
         else:
-            welcome_message = dbc.Card(dbc.CardBody("Bienvenidos a nuestro chat sobre volatilidad implícita"), style=message_button_style)
-            follow_up_message = dbc.Card(dbc.CardBody("¿En qué tema específico te gustaría profundizar?"), style=message_button_style)
-            messages = [welcome_message, follow_up_message]
-            return True, messages, {"display": "flex"}, {"display": "none"}, str(datetime.now().timestamp())
+            messages = [mensaje("Bienvenidos a nuestro chat sobre volatilidad implícita"),
+                        mensaje("¿En qué tema específico te gustaría profundizar?")]
+            return respuesta(True, "flex", "none")
 
     elif button_id == "option-call":
-        user_question_message = dbc.Card(dbc.CardBody("Explicar la sonrisa de volatilidad"), style=user_message_style)
-        messages.append(user_question_message)
-        bot_answer_message = dbc.Card(dbc.CardBody("La sonrisa de volatilidad es una curva en forma de U que muestra que las opciones ITM y OTM tienen mayor volatilidad implícita que las ATM."), style=message_button_style)
-        messages.append(bot_answer_message)
-        more_info_prompt = dbc.Card(dbc.CardBody("¿Deseas saber más sobre este tema o algún otro aspecto de la volatilidad implícita?"), style=message_button_style)
-        messages.append(more_info_prompt)
-        return True, messages, {"display": "none"}, {"display": "flex"}, str(datetime.now().timestamp())
+        messages.append(mensaje("Explicar la sonrisa de volatilidad", usuario=True))
+        messages.append(mensaje("La sonrisa de volatilidad es una curva en forma de U que muestra que las opciones ITM y OTM tienen mayor volatilidad implícita que las ATM."))
+        messages.append(mensaje("¿Deseas saber más sobre este tema o algún otro aspecto de la volatilidad implícita?"))
+        return respuesta(True, "none", "flex")
 
     elif button_id == "option-put":
-        user_question_message = dbc.Card(dbc.CardBody("Importancia de la volatilidad implícita"), style=user_message_style)
-        messages.append(user_question_message)
-        bot_answer_message = dbc.Card(dbc.CardBody("La volatilidad implícita es crucial porque afecta el precio de las opciones y proporciona estimaciones sobre futuras fluctuaciones del mercado."), style=message_button_style)
-        messages.append(bot_answer_message)
-        more_info_prompt = dbc.Card(dbc.CardBody("¿Deseas profundizar más en cómo se calcula o cómo utilizarla para trading?"), style=message_button_style)
-        messages.append(more_info_prompt)
-        return True, messages, {"display": "none"}, {"display": "flex"}, str(datetime.now().timestamp())
+        messages.append(mensaje("Importancia de la volatilidad implícita", usuario=True))
+        messages.append(mensaje("La volatilidad implícita es crucial porque afecta el precio de las opciones y proporciona estimaciones sobre futuras fluctuaciones del mercado."))
+        messages.append(mensaje("¿Deseas profundizar más en cómo se calcula o cómo utilizarla para trading?"))
+        return respuesta(True, "none", "flex")
 
     elif button_id == "more-info-yes":
-        yes_response = dbc.Card(dbc.CardBody("Sí"), style=user_message_style)
-        messages.append(yes_response)
-        info_request_message = dbc.Card(dbc.CardBody("De acuerdo, sobre qué tema desea informarse?"), style=message_button_style)
-        messages.append(info_request_message)
-        return True, messages, {"display": "flex"}, {"display": "none"}, str(datetime.now().timestamp())
+        messages.append(mensaje("Sí", usuario=True))
+        messages.append(mensaje("De acuerdo, sobre qué tema desea informarse?"))
+        return respuesta(True, "flex", "none")
 
     elif button_id == "more-info-no":
-        no_response = dbc.Card(dbc.CardBody("No"), style=user_message_style)
-        messages.append(no_response)
-        goodbye_message = dbc.Card(dbc.CardBody("Gracias por utilizar nuestro chat sobre volatilidad implícita. ¡Hasta pronto!"), style=message_button_style)
-        messages.append(goodbye_message)
-        return True, messages, {"display": "none"}, {"display": "none"}, str(datetime.now().timestamp())
+        messages.append(mensaje("No", usuario=True))
+        messages.append(mensaje("Gracias por utilizar nuestro chat sobre volatilidad implícita. ¡Hasta pronto!"))
+        return respuesta(True, "none", "none")
 
-# Ejecución del servidor
+# Ejecución del servidor de desarrollo; en producción se usa gunicorn (gunicorn.conf.py)
 if __name__ == "__main__":
     app.run_server(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from plotly.utils import PlotlyJSONEncoder
+
+
+### Caché de figuras
+# La superficie de un snapshot no cambia mientras no lleguen datos nuevos, así
+# que las mallas descargadas de la API y la figura ya serializada se guardan en
+# una caché LRU acotada. La versión de los datos forma parte de la clave y, al
+# cambiar, se vacía la caché entera para no guardar figuras que ya no se usan.
+#
+# Con varios workers de gunicorn cada proceso tendría su propia caché; si se
+# define CACHE_URL (redis://...) todos comparten una en Redis. Sin ella se usa
+# la caché en memoria del proceso, que sirve de sustituto local.
+
+
+class CacheLRU:
+    """
+    Caché LRU en memoria, segura entre hilos.
+    Args:
+    - max_entradas (int): Número máximo de entradas guardadas.
+    """
+
+    def __init__(self, max_entradas=32):
+        self.max_entradas = max_entradas
+        self.version = None
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores = {'aciertos': 0, 'fallos': 0, 'expulsiones': 0, 'invalidaciones': 0}
+
+    def obtener(self, clave):
+        """Devuelve el valor guardado para la clave o None si no existe."""
+        with self._lock:
+            if clave not in self._entradas:
+                self.contadores['fallos'] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.contadores['aciertos'] += 1
+            return self._entradas[clave]
+
+    def guardar(self, clave, valor):
+        """Guarda un valor y expulsa el menos usado si se supera el tamaño."""
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.contadores['expulsiones'] += 1
+        return valor
+
+    def comprobar_version(self, version):
+        """Vacía la caché si los datos han cambiado de versión."""
+        with self._lock:
+            if version != self.version:
+                if self._entradas:
+                    self._entradas.clear()
+                    self.contadores['invalidaciones'] += 1
+                self.version = version
+
+    def estadisticas(self):
+        with self._lock:
+            return {**self.contadores, 'entradas': len(self._entradas), 'max_entradas': self.max_entradas,
+                    'version': self.version}
+
+
+class CacheRedis:
+    """
+    Caché compartida entre procesos en Redis, con la misma interfaz que CacheLRU.
+    Los valores se guardan en JSON y caducan a los ttl segundos. La versión forma
+    parte de la clave, así que no hace falta vaciar nada al cambiar de versión.
+    Args:
+    - url (str): URL de Redis (redis://host:puerto/db).
+    - prefijo (str): Prefijo de las claves.
+    - ttl (int): Segundos que se conserva cada entrada.
+    """
+
+    def __init__(self, url, prefijo='interfaz:figuras:', ttl=86400, cliente=None):
+        if cliente is None:
+            import redis
+            cliente = redis.Redis.from_url(url)
+        self.cliente = cliente
+        self.prefijo = prefijo
+        self.ttl = ttl
+        self.version = None
+
+    def _clave(self, clave):
+        return self.prefijo + json.dumps(clave, default=str)
+
+    def obtener(self, clave):
+        valor = self.cliente.get(self._clave(clave))
+        return json.loads(valor) if valor is not None else None
+
+    def guardar(self, clave, valor):
+        self.cliente.set(self._clave(clave), json.dumps(valor, cls=PlotlyJSONEncoder), ex=self.ttl)
+        return valor
+
+    def comprobar_version(self, version):
+        self.version = version
+
+    def estadisticas(self):
+        return {'backend': 'redis', 'version': self.version}
+
+
+def crear_cache(max_entradas=32):
+    """Caché de figuras compartida en Redis si está definida CACHE_URL; si no, en memoria del proceso."""
+    url = os.environ.get('CACHE_URL')
+    if url:
+        return CacheRedis(url)
+    return CacheLRU(max_entradas=max_entradas)
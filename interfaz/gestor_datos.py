@@ -0,0 +1,244 @@
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import requests
+
+# En la imagen black_scholes.py se copia junto a este módulo (interfaz/dockerfile);
+# al ejecutar la aplicación desde el repositorio se importa de volatility/.
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'volatility'))
+from black_scholes import GRIEGAS  # noqa: E402
+
+
+### Datos de la interfaz
+# Las volatilidades se cargan en un hilo en segundo plano, así que el servidor de
+# Dash arranca sin esperar a la API. El hilo vuelve a pedir los datos cada
+# INTERVALO_REFRESCO segundos usando el ETag de la última respuesta: si la API
+# contesta 304 no se descarga nada. Con gunicorn cada worker tiene su gestor y
+# todos siguen el mismo ciclo; no hay avisos que despierten solo a uno de ellos.
+# Cada carga crea un objeto DatosCargados nuevo que sustituye al anterior de una
+# sola vez, de modo que un callback nunca ve datos a medio actualizar.
+
+# Se pide Arrow IPC para construir el DataFrame directamente en columnas;
+# si el servidor no lo admite responde en JSON.
+ACCEPT_VOLATILIDADES = 'application/vnd.apache.arrow.stream, application/json;q=0.5'
+# Puntos ATM precalculados por la lambda de volatilidad (uno por Fecha_scrap y Fecha)
+COLUMNAS_ATM = ['Fecha_scrap', 'Fecha', 'T', 'Vol_call', 'Vol_put']
+# Griegas que guarda la lambda de volatilidad (volatility/black_scholes.py) para calls y puts
+COLUMNAS_GRIEGAS = {tipo: [f'{griega}_{tipo}' for griega in GRIEGAS] for tipo in ['call', 'put']}
+INTERVALO_REFRESCO = 300
+ESPERA_REINTENTO = 10
+TIMEOUT = 30
+
+
+def preparar_volatilidades(response):
+    """Construye el DataFrame de volatilidades a partir de una respuesta de la API (Arrow IPC o JSON)."""
+    if response.headers.get('content-type', '').startswith('application/vnd.apache.arrow.stream'):
+        df = pa.ipc.open_stream(response.content).read_pandas()
+    else:
+        df = pd.DataFrame(response.json())
+
+    # Filtrar y ordenar el DataFrame (NaN en las griegas de los elementos que no las tienen)
+    df = df.reindex(columns=['Fecha_scrap', 'Fecha', 'Strike', 'Vol_call', 'Vol_put']
+                    + COLUMNAS_GRIEGAS['call'] + COLUMNAS_GRIEGAS['put'])
+    df = df.sort_values(by=['Fecha', 'Strike'])
+    df = df.reset_index(drop=True)
+
+    # Reemplazar valores menores que 0.001 en 'Vol_call' y 'Vol_put' por NaN
+    df['Vol_call'] = df['Vol_call'].mask(df['Vol_call'] < 0.001, np.nan)
+    df['Vol_put'] = df['Vol_put'].mask(df['Vol_put'] < 0.001, np.nan)
+    return df
+
+
+def preparar_atm(response):
+    """Construye el DataFrame de puntos ATM a partir de la respuesta JSON de /atm/ (NaN donde no hay dato)."""
+    df = pd.DataFrame(response.json(), columns=COLUMNAS_ATM)
+    df[['T', 'Vol_call', 'Vol_put']] = df[['T', 'Vol_call', 'Vol_put']].astype(float)
+    return df.sort_values(['Fecha_scrap', 'Fecha']).reset_index(drop=True)
+
+
+# Arrays de una cadena (Fecha_scrap, Fecha) ordenados por strike; las griegas con una columna por griega
+Cadena = namedtuple('Cadena', ['strike', 'vol_call', 'vol_put', 'griegas_call', 'griegas_put'])
+CADENA_VACIA = Cadena(np.empty(0), np.empty(0), np.empty(0),
+                      np.empty((0, len(GRIEGAS))), np.empty((0, len(GRIEGAS))))
+
+
+def indexar_cadenas(df):
+    """
+    Índice de (Fecha_scrap, Fecha) a los arrays de su cadena y lista de vencimientos de cada Fecha_scrap.
+    Los arrays son vistas contiguas de columnas ordenadas, así que el índice no copia los datos.
+    """
+    ordenado = df.sort_values(['Fecha_scrap', 'Fecha', 'Strike'], kind='stable')
+    strike = ordenado['Strike'].to_numpy(dtype=float)
+    vol_call = ordenado['Vol_call'].to_numpy(dtype=float)
+    vol_put = ordenado['Vol_put'].to_numpy(dtype=float)
+    griegas = {tipo: ordenado.reindex(columns=columnas).to_numpy(dtype=float)
+               for tipo, columnas in COLUMNAS_GRIEGAS.items()}
+
+    cadenas, vencimientos = {}, {}
+    for (fecha_scrap, fecha), posiciones in ordenado.groupby(['Fecha_scrap', 'Fecha'], sort=False).indices.items():
+        tramo = slice(posiciones[0], posiciones[-1] + 1)
+        cadenas[(fecha_scrap, fecha)] = Cadena(strike[tramo], vol_call[tramo], vol_put[tramo],
+                                               griegas['call'][tramo], griegas['put'][tramo])
+        vencimientos.setdefault(fecha_scrap, []).append(fecha)
+    return cadenas, vencimientos
+
+
+def indexar_atm(atm):
+    """
+    Índices de los puntos ATM por Fecha_scrap (ordenados por madurez, para la estructura temporal)
+    y por Fecha (ordenados por Fecha_scrap, para el histórico de un vencimiento).
+    """
+    por_scrap = {fecha_scrap: grupo.sort_values('T').reset_index(drop=True)
+                 for fecha_scrap, grupo in atm.groupby('Fecha_scrap', sort=False)}
+    por_vencimiento = {fecha: grupo.sort_values('Fecha_scrap').reset_index(drop=True)
+                       for fecha, grupo in atm.groupby('Fecha', sort=False)}
+    return por_scrap, por_vencimiento
+
+
+ATM_VACIO = pd.DataFrame(columns=COLUMNAS_ATM)
+
+
+class DatosCargados:
+    """
+    Foto de los datos de una carga. No se modifica después de crearla.
+    El índice de cadenas se construye una vez por carga para que el coste de los
+    callbacks no dependa del histórico que haya en memoria.
+    Args:
+    - df (pd.DataFrame): Volatilidades de todos los snapshots.
+    - version (int): Número de carga, empieza en 1.
+    - etag (str): ETag de la respuesta de la API.
+    - atm (pd.DataFrame): Puntos ATM de /atm/ (opcional).
+    - etag_atm (str): ETag de la respuesta de /atm/.
+    """
+
+    def __init__(self, df, version, etag=None, atm=None, etag_atm=None):
+        self.df = df
+        self.version = version
+        self.etag = etag
+        self.atm = atm if atm is not None else ATM_VACIO
+        self.etag_atm = etag_atm
+        # Identifica los datos igual en todos los procesos (el número de carga es de cada proceso)
+        self.id_datos = '|'.join(e for e in (etag, etag_atm) if e) or str(version)
+        # La tabla guarda varios días de scrap: el más reciente primero (el que se muestra por defecto)
+        self.fechas_scrap = sorted(df['Fecha_scrap'].unique(), reverse=True)
+        self.cadenas, self.vencimientos = indexar_cadenas(df)
+        # Días de scrap en los que cotiza cada vencimiento, en orden
+        self.scraps_por_vencimiento = {}
+        for fecha_scrap, fecha in self.cadenas:
+            self.scraps_por_vencimiento.setdefault(fecha, []).append(fecha_scrap)
+        self.atm_por_scrap, self.atm_por_vencimiento = indexar_atm(self.atm)
+        self.cargado_en = time.time()
+
+    def cadena(self, fecha_scrap, fecha):
+        """Strikes y volatilidades de un vencimiento en un día de scrap (arrays vacíos si no existe)."""
+        return self.cadenas.get((fecha_scrap, fecha), CADENA_VACIA)
+
+    def cadenas_vencimiento(self, fecha, fechas_scrap=None):
+        """
+        Cadenas de un vencimiento en varios días de scrap, en una sola consulta al índice.
+        Args:
+        - fecha (str): Vencimiento.
+        - fechas_scrap (list): Días de scrap; por defecto todos en los que cotiza el vencimiento.
+        Returns:
+        - Diccionario de Fecha_scrap a Cadena, en orden de Fecha_scrap y sin los días que no existen.
+        """
+        disponibles = self.scraps_por_vencimiento.get(fecha, [])
+        if fechas_scrap is not None:
+            pedidas = set(fechas_scrap)
+            disponibles = [f for f in disponibles if f in pedidas]
+        return {fecha_scrap: self.cadenas[(fecha_scrap, fecha)] for fecha_scrap in disponibles}
+
+    def atm_scrap(self, fecha_scrap):
+        """Puntos ATM de un día de scrap ordenados por madurez (estructura temporal)."""
+        return self.atm_por_scrap.get(fecha_scrap, ATM_VACIO)
+
+    def atm_vencimiento(self, fecha):
+        """Puntos ATM de un vencimiento ordenados por Fecha_scrap (histórico)."""
+        return self.atm_por_vencimiento.get(fecha, ATM_VACIO)
+
+
+class GestorDatos:
+    """
+    Mantiene en memoria las últimas volatilidades de la API y las refresca en segundo plano.
+    Args:
+    - url (str): URL del endpoint /volatilities/ de la API.
+    - intervalo (float): Segundos entre comprobaciones de datos nuevos.
+    - sesion: Sesión de requests (o un objeto con el mismo método get).
+    - url_atm (str): URL del endpoint /atm/ de la API (opcional).
+    """
+
+    def __init__(self, url, intervalo=INTERVALO_REFRESCO, sesion=None, url_atm=None):
+        self.url = url
+        self.url_atm = url_atm
+        self.intervalo = intervalo
+        self.sesion = sesion or requests.Session()
+        self.datos = None
+        self.error = None
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    @property
+    def listo(self):
+        return self.datos is not None
+
+    def iniciar(self):
+        """Arranca el hilo de carga (una sola vez por proceso; tras un fork se vuelve a arrancar)."""
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name='gestor-datos', daemon=True)
+                self._hilo.start()
+
+    def _descargar(self, url, accept, etag, preparar):
+        """Descarga y prepara una respuesta de la API; (None, etag) si no ha cambiado (304)."""
+        cabeceras = {'Accept': accept}
+        if etag:
+            cabeceras['If-None-Match'] = etag
+        response = self.sesion.get(url, headers=cabeceras, timeout=TIMEOUT)
+        if response.status_code == 304:
+            return None, etag
+        response.raise_for_status()
+        return preparar(response), response.headers.get('ETag')
+
+    def actualizar(self):
+        """
+        Descarga las volatilidades y los puntos ATM si han cambiado desde la última carga y los sustituye.
+        Returns:
+        - True si se han cargado datos nuevos; False si no han cambiado o la API ha fallado.
+        """
+        actuales = self.datos
+        try:
+            df, etag = self._descargar(self.url, ACCEPT_VOLATILIDADES,
+                                       actuales.etag if actuales is not None else None, preparar_volatilidades)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.error = str(e)
+            print(f"Error al cargar las volatilidades: {e}")
+            return False
+
+        # Los puntos ATM son opcionales: si fallan se conservan los anteriores
+        atm, etag_atm = None, actuales.etag_atm if actuales is not None else None
+        if self.url_atm:
+            try:
+                atm, etag_atm = self._descargar(self.url_atm, 'application/json', etag_atm, preparar_atm)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                print(f"Error al cargar los puntos ATM: {e}")
+
+        self.error = None
+        if df is None and atm is None:
+            return False
+        if actuales is not None:
+            df = df if df is not None else actuales.df
+            atm = atm if atm is not None else actuales.atm
+        version = actuales.version + 1 if actuales is not None else 1
+        self.datos = DatosCargados(df, version, etag, atm, etag_atm)
+        return True
+
+    def _bucle(self):
+        while True:
+            self.actualizar()
+            time.sleep(self.intervalo if self.listo else ESPERA_REINTENTO)
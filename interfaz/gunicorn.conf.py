@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+# Configuración de gunicorn para la interfaz de Dash.
+# El estado de cada usuario está en el navegador (dcc.Store), así que cualquier
+# worker puede atender cualquier petición. Cada worker carga los datos con su
+# propio GestorDatos; las figuras se comparten en Redis si se define CACHE_URL.
+
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 60
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    # Esta configuración no activa preload_app: cada worker importa app y arranca ahí su
+    # hilo de carga, así que esto no hace nada (iniciar solo arranca el hilo si no existe).
+    # Sirve si se lanza con --preload, porque el hilo del maestro no pasa a los workers.
+    from app import gestor
+    gestor.iniciar()
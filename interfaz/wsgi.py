@@ -0,0 +1,2 @@
+# Punto de entrada WSGI para gunicorn: gunicorn -c gunicorn.conf.py wsgi:server
+from app import server, gestor  # noqa: F401
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+
+from botocore.exceptions import ClientError
+
+
+### Almacenamiento intercambiable
+# Todo el código lee y escribe a través de un cliente de S3 (get_object/put_object y
+# exceptions.NoSuchKey) y de un recurso Table de DynamoDB (meta.client.batch_write_item
+# para escribir; query por el índice de fecha de scrap y scan para leer). Esa es la
+# interfaz de almacenamiento: además de los clientes de boto3 hay dos implementaciones
+# locales con las mismas llamadas. Cada módulo elige su backend al importarse según la
+# variable de entorno ALMACENAMIENTO: 'aws' (por defecto) crea los clientes de boto3 y
+# 'local:<directorio>' usa las implementaciones locales de crear_almacenamiento.
+# - S3Local: cada objeto es un fichero <raiz>/<bucket>/<clave>. El histórico sigue en
+#   Parquet con las mismas rutas particionadas que en S3.
+# - TablaSQLite: la tabla de volatilidades en un fichero SQLite con el id como clave
+#   primaria y un índice (Fecha_scrap, Fecha) equivalente al índice secundario global.
+# Se usan para ejecutar el flujo completo sin AWS (ejecutar_local.py) y perfilarlo. Este
+# módulo no va en las imágenes de las lambdas: solo se importa con ALMACENAMIENTO=local:...
+
+TABLA = 'volatiliy_table'
+REGION = 'eu-west-3'
+# Elementos por página de query/scan, en lugar del límite de 1 MB de DynamoDB
+TAM_PAGINA = 1000
+
+
+class _Cuerpo:
+    def __init__(self, datos):
+        self.datos = datos
+
+    def read(self):
+        return self.datos
+
+
+def etag(datos):
+    """ETag de un objeto subido de una vez (el MD5 entre comillas, como en S3)."""
+    return f'"{hashlib.md5(datos).hexdigest()}"'
+
+
+def respuesta_get(datos, if_none_match=None):
+    """Respuesta de get_object; con IfNoneMatch igual al ETag, el error 304 de boto3."""
+    etiqueta = etag(datos)
+    if if_none_match == etiqueta:
+        raise ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+    return {'Body': _Cuerpo(datos), 'ETag': etiqueta}
+
+
+class S3Local:
+    """Cliente de S3 sobre el sistema de ficheros (solo las llamadas que usa el proyecto)."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+
+    def _ruta(self, bucket, clave):
+        ruta = os.path.normpath(os.path.join(self.raiz, bucket, clave))
+        if not ruta.startswith(os.path.normpath(os.path.join(self.raiz, bucket)) + os.sep):
+            raise ValueError(f'Clave no válida: {clave}')
+        return ruta
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        ruta = self._ruta(Bucket, Key)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        datos = Body.encode() if isinstance(Body, str) else Body
+        # Se escribe en un temporal y se renombra para que un lector concurrente no vea el fichero a medias
+        temporal = f'{ruta}.{threading.get_ident()}.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, ruta)
+        return {'ETag': etag(datos)}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        try:
+            with open(self._ruta(Bucket, Key), 'rb') as f:
+                datos = f.read()
+        except FileNotFoundError:
+            raise self.exceptions.NoSuchKey(Key)
+        return respuesta_get(datos, IfNoneMatch)
+
+
+def _a_python(valor):
+    """Valor del formato de bajo nivel de DynamoDB ({'S'}, {'N'}, {'NULL'}) al del recurso Table."""
+    tipo, dato = next(iter(valor.items()))
+    if tipo == 'N':
+        return Decimal(dato)
+    if tipo == 'NULL':
+        return None
+    return dato
+
+
+def _condiciones(expresion):
+    """Atributo -> valor de una KeyConditionExpression de igualdades unidas con AND."""
+    valores = {}
+    pendientes = [expresion.get_expression()]
+    while pendientes:
+        actual = pendientes.pop()
+        if actual['operator'] == 'AND':
+            pendientes.extend(c.get_expression() for c in actual['values'])
+        elif actual['operator'] == '=':
+            clave, valor = actual['values']
+            valores[clave.name] = valor
+        else:
+            raise ValueError(f"Condición no soportada en la tabla local: {actual['operator']}")
+    return valores
+
+
+class TablaSQLite:
+    """
+    Tabla de volatilidades en SQLite con la interfaz del recurso Table de boto3.
+    Los elementos se guardan en JSON con el formato de bajo nivel (el de BatchWriteItem)
+    y se devuelven como el recurso, con los números en Decimal.
+    """
+
+    def __init__(self, ruta, nombre=TABLA, tam_pagina=TAM_PAGINA):
+        self.name = nombre
+        self.tam_pagina = tam_pagina
+        # escritura_dynamodb escribe los lotes desde varios hilos: una conexión compartida con lock
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conexion:
+            self._conexion.execute('CREATE TABLE IF NOT EXISTS items ('
+                                   'id TEXT PRIMARY KEY, fecha_scrap TEXT, fecha TEXT, item TEXT)')
+            self._conexion.execute('CREATE INDEX IF NOT EXISTS fecha_scrap_index ON items (fecha_scrap, fecha, id)')
+        # escribir_items usa table.meta.client.batch_write_item, como con boto3
+        self.meta = self.client = self
+
+    def batch_write_item(self, RequestItems):
+        filas = []
+        for peticion in RequestItems.get(self.name, []):
+            item = peticion['PutRequest']['Item']
+            filas.append((item['id']['S'], item.get('Fecha_scrap', {}).get('S'),
+                          item.get('Fecha', {}).get('S'), json.dumps(item)))
+        with self._lock, self._conexion:
+            self._conexion.executemany('INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?)', filas)
+        return {'UnprocessedItems': {}}
+
+    def _leer(self, consulta, parametros, Limit, clave):
+        limite = min(Limit or self.tam_pagina, self.tam_pagina)
+        with self._lock:
+            filas = self._conexion.execute(f'{consulta} LIMIT ?', (*parametros, limite + 1)).fetchall()
+        items = [{k: _a_python(v) for k, v in json.loads(fila[0]).items()} for fila in filas[:limite]]
+        respuesta = {'Items': items, 'Count': len(items)}
+        if len(filas) > limite:
+            respuesta['LastEvaluatedKey'] = {k: items[-1][k] for k in clave}
+        return respuesta
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, **kwargs):
+        inicio = (ExclusiveStartKey or {}).get('id', '')
+        return self._leer('SELECT item FROM items WHERE id > ? ORDER BY id', (inicio,), Limit, ['id'])
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, ExclusiveStartKey=None, **kwargs):
+        condiciones = _condiciones(KeyConditionExpression)
+        if set(condiciones) - {'Fecha_scrap', 'Fecha'} or 'Fecha_scrap' not in condiciones:
+            raise ValueError(f'La tabla local solo consulta por Fecha_scrap y Fecha: {sorted(condiciones)}')
+        consulta = 'SELECT item FROM items WHERE fecha_scrap = ?'
+        parametros = [condiciones['Fecha_scrap']]
+        if 'Fecha' in condiciones:
+            consulta += ' AND fecha = ?'
+            parametros.append(condiciones['Fecha'])
+        if ExclusiveStartKey:
+            consulta += ' AND (fecha, id) > (?, ?)'
+            parametros += [ExclusiveStartKey['Fecha'], ExclusiveStartKey['id']]
+        return self._leer(consulta + ' ORDER BY fecha, id', parametros, Limit, ['id', 'Fecha_scrap', 'Fecha'])
+
+    def cerrar(self):
+        self._conexion.close()
+
+
+class SnsLocal:
+    """Cliente de SNS que imprime los mensajes en lugar de enviar correos."""
+
+    def publish(self, Message, **kwargs):
+        print(f'[SNS] {Message}')
+        return {}
+
+
+Almacenamiento = namedtuple('Almacenamiento', ['s3', 'tabla', 'sns'])
+
+
+@lru_cache(maxsize=None)
+def crear_almacenamiento(destino):
+    """
+    Crea el almacenamiento local. Se crea una vez por destino, así que el scraper, la lambda
+    de volatilidad y la API de un mismo proceso comparten los mismos objetos.
+    Args:
+    - destino (str): 'local:<directorio>', el valor de ALMACENAMIENTO. Los objetos se guardan
+      en <directorio>/s3 y la tabla en <directorio>/volatilidades.sqlite.
+    Returns:
+    - Almacenamiento(s3, tabla, sns).
+    """
+    tipo, _, directorio = destino.partition(':')
+    if tipo != 'local' or not directorio:
+        raise ValueError(f"ALMACENAMIENTO no válido: {destino!r} (se espera 'aws' o 'local:<directorio>')")
+    os.makedirs(directorio, exist_ok=True)
+    return Almacenamiento(S3Local(os.path.join(directorio, 's3')),
+                          TablaSQLite(os.path.join(directorio, 'volatilidades.sqlite')),
+                          SnsLocal())
@@ -0,0 +1,219 @@
+"""
+Ejecuta sin AWS ni MEFF el flujo completo scraping → volatilidades → almacenamiento →
+API → superficie, para medir y perfilar las partes lentas en un portátil.
+
+- Las páginas de MEFF se sirven por HTTP en 127.0.0.1 a partir de ficheros HTML guardados
+  (por defecto la ficha del MiniIbex de tests/fixtures); el scraper las pide con su sesión
+  de siempre porque URL_FICHA_MEFF apunta a ese servidor.
+- ALMACENAMIENTO=local:<directorio>: S3 es un directorio y la tabla de volatilidades un
+  fichero SQLite (almacenamiento.py). Las lambdas y la API eligen el backend al importarse.
+- La API se llama en el mismo proceso con el TestClient de FastAPI.
+
+Modos:
+- unificado: el pipeline de una sola lambda (lambda_pipeline.ejecutar_pipeline).
+- lambdas: el handler del scraper y después el de la lambda de volatilidad.
+
+Con --perfil se guarda un perfil de cProfile (se puede abrir con snakeviz). cProfile solo
+ve el hilo principal: lo que se ejecuta en los pools de hilos (descargas, archivo en S3,
+lecturas de la API) aparece como espera en los futuros.
+
+Uso:
+    python pipeline/ejecutar_local.py [--directorio DIR] [--pagina SUBYACENTE=HTML ...]
+                                      [--modo unificado|lambdas] [--perfil FICHERO.prof]
+"""
+import argparse
+import cProfile
+import importlib
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for carpeta in ['scrap', 'volatility', 'pipeline', 'aplicacion']:
+    sys.path.insert(0, os.path.join(RAIZ, carpeta))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-3')
+
+# Lo que no depende de la configuración se importa al cargar el script para que el perfil
+# no incluya las importaciones; los módulos del flujo los importa configurar
+from fastapi.testclient import TestClient  # noqa: E402
+
+from superficie import decodificar_array  # noqa: E402
+
+FIXTURE = os.path.join(RAIZ, 'tests', 'fixtures', 'meff_miniibex35.html')
+MODOS = ['unificado', 'lambdas']
+# Módulos que leen la configuración del entorno al importarse
+MODULOS = ['cache_volatilidades', 'motor_scraping', 'scrapping_s3_meff', 'lambda_vol_dynamo', 'lambda_pipeline',
+           'creacion_api']
+
+
+class ServidorPaginas(ThreadingHTTPServer):
+    """Servidor HTTP en 127.0.0.1 que devuelve páginas guardadas según la ruta (404 si no hay ninguna)."""
+
+    daemon_threads = True
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        super().__init__(('127.0.0.1', 0), _Pagina)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url_ficha(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/{{}}'
+
+
+class _Pagina(BaseHTTPRequestHandler):
+    def do_GET(self):
+        contenido = self.server.paginas.get(self.path.lstrip('/'))
+        self.send_response(200 if contenido is not None else 404)
+        self.send_header('Content-Length', str(len(contenido or b'')))
+        self.end_headers()
+        self.wfile.write(contenido or b'')
+
+    def log_message(self, *args):
+        pass
+
+
+def _leer_paginas(paginas):
+    """{ficha: contenido} a partir de {'subyacente[:ficha]': ruta del HTML}."""
+    contenido = {}
+    for nombre, ruta in paginas.items():
+        subyacente, _, ficha = nombre.partition(':')
+        with open(ruta, 'rb') as f:
+            contenido[ficha or f'FIEM_{subyacente}'] = f.read()
+    return contenido
+
+
+def configurar(directorio, url_ficha):
+    """
+    Fija ALMACENAMIENTO, URL_FICHA_MEFF y RUTA_VOLATILIDADES_PREVIAS e importa los módulos del flujo con esa configuración.
+    Args:
+    - directorio (str): Directorio del almacenamiento local (se crea si no existe).
+    - url_ficha (str): Plantilla de la URL de las fichas de MEFF.
+    Returns:
+    - Diccionario {nombre: módulo}.
+    """
+    os.environ['ALMACENAMIENTO'] = f'local:{directorio}'
+    os.environ['URL_FICHA_MEFF'] = url_ficha
+    # La copia local de las volatilidades previas va con el resto del almacenamiento, no en /tmp
+    os.environ['RUTA_VOLATILIDADES_PREVIAS'] = os.path.join(directorio, 'volatilidades_previas.json')
+    for nombre in MODULOS:
+        modulo = sys.modules.get(nombre)
+        if modulo is not None and getattr(modulo, 'ALMACENAMIENTO', None) not in (None, os.environ['ALMACENAMIENTO']):
+            raise RuntimeError(f'{nombre} ya está importado con ALMACENAMIENTO={modulo.ALMACENAMIENTO}')
+    return {nombre: importlib.import_module(nombre) for nombre in MODULOS}
+
+
+def _medir(tiempos, etapa, funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    tiempos[etapa] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+
+def _comprobar(respuesta, etapa):
+    if respuesta.status_code != 200:
+        raise RuntimeError(f'{etapa}: HTTP {respuesta.status_code} {respuesta.text[:200]}')
+    return respuesta
+
+
+def ejecutar(directorio, paginas=None, modo='unificado', perfil=None):
+    """
+    Ejecuta el flujo completo contra el almacenamiento local de directorio.
+    Args:
+    - directorio (str): Directorio del almacenamiento local (se crea si no existe).
+    - paginas (dict): {'subyacente[:ficha]': ruta del HTML}; por defecto el MiniIbex de tests/fixtures.
+    - modo (str): 'unificado' o 'lambdas'.
+    - perfil (cProfile.Profile): Si se indica, se activa solo durante el flujo (sin las importaciones).
+    Returns:
+    - Diccionario con la Fecha_scrap, los tiempos de cada etapa en segundos y los tamaños de los resultados.
+    """
+    paginas = paginas or {'MiniIbex_35': FIXTURE}
+    servidor = ServidorPaginas(_leer_paginas(paginas))
+    try:
+        modulos = configurar(directorio, servidor.url_ficha)
+        if perfil:
+            perfil.enable()
+        try:
+            resultado = _ejecutar(modulos, list(paginas), modo)
+        finally:
+            if perfil:
+                perfil.disable()
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+    return resultado
+
+
+def _ejecutar(modulos, instrumentos, modo):
+    creacion_api = modulos['creacion_api']
+    evento = {'instrumentos': instrumentos, 'forzar': True, 'incremental': False}
+    tiempos = {}
+
+    # 1. Scraping, volatilidades y escritura
+    if modo == 'unificado':
+        informe = _medir(tiempos, 'pipeline', modulos['lambda_pipeline'].ejecutar_pipeline, evento)
+        if informe['estado'] == 'error':
+            raise RuntimeError(f"Pipeline con errores: {informe['errores']}")
+        fecha_scrap = informe['Fecha_scrap']
+    else:
+        cuerpos = {}
+        for etapa, handler in [('scraper', modulos['scrapping_s3_meff'].lambda_handler),
+                               ('volatilidades', modulos['lambda_vol_dynamo'].lambda_handler)]:
+            respuesta = _medir(tiempos, etapa, handler, evento, None)
+            if respuesta['statusCode'] != 200:
+                raise RuntimeError(f"{etapa}: {respuesta['body']}")
+            cuerpos[etapa] = json.loads(respuesta['body'])
+        fecha_scrap = cuerpos['scraper']['Fecha_scrap']
+
+    # 2. API (sin lifespan para que el precálculo en segundo plano no se mezcle con las medidas)
+    cliente = TestClient(creacion_api.app)
+    creacion_api.cache.invalidar()
+    creacion_api.calcular_superficie_snapshot.cache_clear()
+    volatilidades = _comprobar(_medir(tiempos, 'api_volatilidades', cliente.get, '/volatilities/',
+                                      params={'fecha_scrap': fecha_scrap}), 'api_volatilidades').json()
+    atm = _comprobar(_medir(tiempos, 'api_atm', cliente.get, '/atm/', params={'fecha_scrap': fecha_scrap}),
+                     'api_atm').json()
+    superficies = {}
+    for tipo in ['call', 'put']:
+        superficies[tipo] = _comprobar(_medir(tiempos, f'api_superficie_{tipo}', cliente.get, '/surface/',
+                                              params={'fecha_scrap': fecha_scrap, 'tipo': tipo}),
+                                       f'api_superficie_{tipo}').json()
+
+    # 3. Superficie en el cliente: decodificación de las mallas como en la interfaz
+    iv = _medir(tiempos, 'superficie', lambda: {tipo: decodificar_array(s['iv']) for tipo, s in superficies.items()})
+    return {'Fecha_scrap': fecha_scrap, 'modo': modo, 'tiempos': tiempos,
+            'volatilidades': len(volatilidades), 'puntos_atm': len(atm),
+            'malla': list(iv['call'].shape)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directorio', help='Almacenamiento local; por defecto un directorio temporal')
+    parser.add_argument('--pagina', action='append', metavar='SUBYACENTE=HTML',
+                        help="Página guardada de un instrumento ('subyacente[:ficha]=ruta'); se puede repetir")
+    parser.add_argument('--modo', choices=MODOS, default='unificado')
+    parser.add_argument('--perfil', metavar='FICHERO', help='Perfila con cProfile y guarda las estadísticas')
+    parser.add_argument('--top', type=int, default=25, help='Funciones a mostrar del perfil')
+    args = parser.parse_args()
+
+    paginas = dict(p.split('=', 1) for p in args.pagina) if args.pagina else None
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = args.directorio or temporal
+        perfil = cProfile.Profile() if args.perfil else None
+        resultado = ejecutar(directorio, paginas, args.modo, perfil)
+
+    for etapa, segundos in resultado['tiempos'].items():
+        print(f'{etapa:>22} {segundos * 1000:>9.1f} ms')
+    print(json.dumps({k: v for k, v in resultado.items() if k != 'tiempos'}))
+    if perfil:
+        perfil.dump_stats(args.perfil)
+        pstats.Stats(perfil).sort_stats('cumulative').print_stats(args.top)
+
+
+if __name__ == '__main__':
+    main()
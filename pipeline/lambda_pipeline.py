@@ -0,0 +1,120 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import scrapping_s3_meff as scraper
+import lambda_vol_dynamo as volatilidades
+from lectura_snapshots import registrar_volatilidades
+
+
+### Pipeline unificado scraping → volatilidades
+# Alternativa al modo de dos lambdas (scraper que sube JSON/Parquet a S3 y lambda de
+# volatilidad que los vuelve a leer): en un solo proceso se scrapea, se tratan las
+# tablas y se calculan y escriben las volatilidades pasando los DataFrames en memoria.
+# El snapshot se archiva en S3 en paralelo con el cálculo, fuera del camino crítico;
+# el manifiesto se actualiza al final, cuando el archivo y las volatilidades están
+# completos. No se suben los JSON con el último dato porque disparan la lambda de
+# volatilidad, que en este modo no hace falta. El modo de dos lambdas sigue igual.
+
+HILOS_ARCHIVO = 4
+
+
+def _archivar(inst, tratada, fecha_scrap):
+    return scraper.guardar_pagina(inst, tratada, scraper.BUCKET, fecha_scrap, json_ultimo=False)
+
+
+def ejecutar_pipeline(event):
+    """
+    Ejecuta scraping, tratamiento, volatilidades y escritura en DynamoDB en un solo proceso.
+    Args:
+    - event (dict): Como el de las dos lambdas: 'instrumentos', 'forzar' e 'incremental'.
+    Returns:
+    - Diccionario con el informe de cada etapa y la latencia de extremo a extremo.
+    """
+    inicio = time.perf_counter()
+    marca_inicio = datetime.now()
+    fecha_scrap = marca_inicio.date().isoformat()
+    instrumentos = scraper.leer_instrumentos(event.get('instrumentos', scraper.INSTRUMENTOS))
+    previos = {} if event.get('forzar') else scraper.cargar_manifiesto(scraper.BUCKET)['subyacentes']
+    cabeceras = {inst.subyacente: scraper.cabeceras_condicionales(previos.get(inst.subyacente))
+                 for inst in instrumentos}
+
+    # 1. Descarga y tratamiento en paralelo, sin subir nada
+    resultados = scraper.scrapear(instrumentos,
+                                  lambda inst, response: scraper.tratar_pagina(response, previos.get(inst.subyacente)),
+                                  sesion=scraper.sesion, cabeceras=cabeceras)
+    t_scraping = time.perf_counter() - inicio
+    nuevos = {r.instrumento.subyacente: r for r in resultados
+              if r.error is None and r.valor and not r.valor.get('sin_cambios')}
+
+    informe = {'Fecha_scrap': fecha_scrap, 'actualizados': [], 'errores': {}, 'volatilidades': None,
+               'sin_cambios': [r.instrumento.subyacente for r in resultados
+                               if r.estado_http == 304 or (r.valor or {}).get('sin_cambios')]}
+    for r in resultados:
+        if r.error is not None:
+            informe['errores'][r.instrumento.subyacente] = r.error
+
+    # 2. Archivo en S3 en segundo plano mientras se calculan las volatilidades
+    t_volatilidades = 0.0
+    with ThreadPoolExecutor(max_workers=HILOS_ARCHIVO) as executor:
+        archivos = {subyacente: executor.submit(_archivar, r.instrumento, r.valor, fecha_scrap)
+                    for subyacente, r in nuevos.items()}
+
+        principal = nuevos.get(volatilidades.SUBYACENTE)
+        if principal is not None:
+            t0 = time.perf_counter()
+            informe['volatilidades'] = volatilidades.calcular_volatilidades(
+                principal.valor['opciones'][volatilidades.COLUMNAS_OPCIONES],
+                principal.valor['futuros'][['Ant']],
+                volatilidades.s3_client, scraper.BUCKET, event.get('incremental', True))
+            t_volatilidades = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        entradas = {}
+        for subyacente, futuro in archivos.items():
+            try:
+                entradas[subyacente] = {**futuro.result()['entrada'], 'inicio_scrap': marca_inicio.isoformat()}
+            except Exception as e:
+                informe['errores'][subyacente] = f'{type(e).__name__}: {e}'
+        t_espera_archivo = time.perf_counter() - t0
+
+    # 3. Manifiesto: primero los snapshots y después la marca de volatilidades
+    if entradas:
+        scraper.registrar_snapshots(scraper.BUCKET, fecha_scrap, entradas)
+        informe['actualizados'] = list(entradas)
+    if informe['volatilidades'] is not None and volatilidades.SUBYACENTE in entradas:
+        registrar_volatilidades(volatilidades.s3_client, scraper.BUCKET, informe['volatilidades']['Fecha_scrap'],
+                                entradas[volatilidades.SUBYACENTE]['huella'])
+
+    informe['latencia'] = {'modo': 'unificado', 'scraping': round(t_scraping, 3),
+                           'volatilidades': round(t_volatilidades, 3),
+                           'espera_archivo': round(t_espera_archivo, 3),
+                           'extremo_a_extremo': round(time.perf_counter() - inicio, 3)}
+    informe['estado'] = ('actualizado' if informe['actualizados'] else
+                         'sin_cambios' if informe['sin_cambios'] and not informe['errores'] else 'error')
+    return informe
+
+
+def lambda_handler(event, context):
+    try:
+        informe = ejecutar_pipeline(event or {})
+    except Exception as e:
+        volatilidades.enviar_correo(f'Se ha producido un error en el pipeline: {str(e)}')
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Error al ejecutar el pipeline: {str(e)}')
+        }
+
+    print(json.dumps({'latencia': informe['latencia']}))
+    if informe['volatilidades'] is not None:
+        volatilidades.enviar_correo('Web scrapping y volatilidades actualizadas correctamente.')
+    estado = 200 if not informe['errores'] else (207 if informe['estado'] != 'error' else 502)
+    return {
+        'statusCode': estado,
+        'body': json.dumps(informe)
+    }
+
+
+if __name__ == "__main__":
+    print(lambda_handler({}, {}))
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+### Motor de scraping de varios instrumentos
+# Cada instrumento es una ficha de MEFF con su tabla de opciones y de futuros.
+# Las páginas se descargan en paralelo con una sola sesión HTTP (conexiones
+# reutilizadas) y cada hilo, en cuanto tiene su página, la procesa (parseo,
+# tratamiento y subida) sin esperar a las demás. Así el tiempo total es el de la
+# página más lenta y no la suma de todas. Para no saturar MEFF se limita el número
+# de peticiones simultáneas y el intervalo mínimo entre peticiones a cada host.
+# Se usan hilos y no procesos: en Lambda no hay /dev/shm para multiprocessing y
+# las descargas, lxml y la subida a S3 sueltan el GIL la mayor parte del tiempo.
+# Se pueden enviar cabeceras condicionales (If-None-Match / If-Modified-Since) por
+# instrumento: si el servidor contesta 304 la página no se descarga ni se procesa.
+
+# Se puede cambiar con URL_FICHA_MEFF (p. ej. ejecutar_local.py sirve páginas guardadas en local)
+URL_FICHA = os.environ.get('URL_FICHA_MEFF', 'https://www.meff.es/esp/Derivados-Financieros/Ficha/{}')
+HILOS = 8
+POR_HOST = 4
+INTERVALO_HOST = 0.1
+TIMEOUT = (5, 30)
+REINTENTOS = 3
+ESPERA_REINTENTO = 0.5
+ESTADOS_REINTENTO = (429, 500, 502, 503, 504)
+
+Instrumento = namedtuple('Instrumento', ['subyacente', 'url'])
+# Resultado de un instrumento: valor devuelto por el procesado o error, y tiempos en segundos.
+# Con estado_http 304 no hay ni valor ni error: la página no ha cambiado.
+Resultado = namedtuple('Resultado', ['instrumento', 'valor', 'error', 'estado_http', 't_descarga', 't_proceso'])
+
+
+def instrumento(subyacente, ficha=None):
+    """Instrumento de MEFF a partir del nombre de su ficha (por defecto 'FIEM_<subyacente>')."""
+    return Instrumento(subyacente, URL_FICHA.format(ficha or f'FIEM_{subyacente}'))
+
+
+def crear_sesion(conexiones=HILOS, reintentos=REINTENTOS, espera=ESPERA_REINTENTO):
+    """
+    Sesión de requests con un pool de conexiones por host y reintentos con espera exponencial.
+    Args:
+    - conexiones (int): Conexiones que se mantienen abiertas con cada host.
+    - reintentos (int): Reintentos de errores de conexión y de los estados de ESTADOS_REINTENTO.
+    - espera (float): Espera base entre reintentos en segundos.
+    """
+    retry = Retry(total=reintentos, backoff_factor=espera, status_forcelist=ESTADOS_REINTENTO,
+                  allowed_methods=frozenset(['GET']), raise_on_status=False)
+    adaptador = HTTPAdapter(pool_connections=conexiones, pool_maxsize=conexiones, max_retries=retry)
+    sesion = requests.Session()
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    return sesion
+
+
+class LimitadorHosts:
+    """Limita las peticiones simultáneas y el intervalo entre peticiones de cada host."""
+
+    def __init__(self, por_host=POR_HOST, intervalo=INTERVALO_HOST):
+        self.por_host = por_host
+        self.intervalo = intervalo
+        self._semaforos = {}
+        self._siguiente = {}
+        self._lock = threading.Lock()
+
+    def _semaforo(self, host):
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.por_host)
+                self._siguiente[host] = 0.0
+            return self._semaforos[host]
+
+    def _esperar_turno(self, host):
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente[host])
+            self._siguiente[host] = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+    def peticion(self, url, funcion):
+        """Ejecuta funcion() cuando el host de url tiene hueco."""
+        host = urlsplit(url).netloc
+        with self._semaforo(host):
+            self._esperar_turno(host)
+            return funcion()
+
+
+def _scrapear_uno(sesion, limitador, inst, procesar, timeout, cabeceras):
+    inicio = time.perf_counter()
+    try:
+        response = limitador.peticion(inst.url, lambda: sesion.get(inst.url, headers=cabeceras, timeout=timeout))
+    except requests.RequestException as e:
+        return Resultado(inst, None, str(e), None, time.perf_counter() - inicio, 0.0)
+    t_descarga = time.perf_counter() - inicio
+
+    if response.status_code == 304:
+        return Resultado(inst, None, None, 304, t_descarga, 0.0)
+    if response.status_code != 200:
+        return Resultado(inst, None, f'HTTP {response.status_code}', response.status_code, t_descarga, 0.0)
+    inicio = time.perf_counter()
+    try:
+        valor = procesar(inst, response)
+    except Exception as e:
+        # Un instrumento con la página cambiada o vacía no impide guardar los demás
+        return Resultado(inst, None, f'{type(e).__name__}: {e}', 200, t_descarga, time.perf_counter() - inicio)
+    return Resultado(inst, valor, None, 200, t_descarga, time.perf_counter() - inicio)
+
+
+def scrapear(instrumentos, procesar, sesion=None, hilos=HILOS, limitador=None, timeout=TIMEOUT, cabeceras=None):
+    """
+    Descarga y procesa en paralelo las páginas de varios instrumentos.
+    Args:
+    - instrumentos (list): Lista de Instrumento.
+    - procesar (callable): procesar(instrumento, response) con la respuesta HTTP 200; su
+      resultado se devuelve en Resultado.valor. Se ejecuta en el hilo de la descarga.
+    - sesion: Sesión de requests compartida; por defecto crear_sesion(hilos).
+    - hilos (int): Máximo de instrumentos en curso a la vez.
+    - limitador (LimitadorHosts): Límite de peticiones por host.
+    - timeout: Timeout de conexión y lectura de cada petición.
+    - cabeceras (dict): Cabeceras HTTP adicionales de cada subyacente (p. ej. las condicionales).
+    Returns:
+    - Lista de Resultado en el mismo orden que instrumentos.
+    """
+    if not instrumentos:
+        return []
+    sesion = sesion or crear_sesion(hilos)
+    limitador = limitador or LimitadorHosts()
+    with ThreadPoolExecutor(max_workers=min(hilos, len(instrumentos))) as executor:
+        futuros = [executor.submit(_scrapear_uno, sesion, limitador, inst, procesar, timeout,
+                                   (cabeceras or {}).get(inst.subyacente))
+                   for inst in instrumentos]
+        return [f.result() for f in futuros]
@@ -1,16 +1,28 @@
-import requests
-from bs4 import BeautifulSoup
+import hashlib
+import os
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import json
 import boto3
+from io import BytesIO
+from lxml import etree
 
+from motor_scraping import crear_sesion, instrumento, scrapear
 
-# URL de la página a hacer scraping
-url = 'https://www.meff.es/esp/Derivados-Financieros/Ficha/FIEM_MiniIbex_35'
 
-# Realizar la petición HTTP GET a la página
-response = requests.get(url)
+# Instrumentos de MEFF a scrapear: 'subyacente' o 'subyacente:ficha' separados por comas
+# (la ficha por defecto es FIEM_<subyacente>). Se puede cambiar con la variable de entorno
+# INSTRUMENTOS_MEFF o con la clave 'instrumentos' del evento, p. ej. para añadir las
+# fichas de opciones sobre acciones.
+INSTRUMENTOS = os.environ.get('INSTRUMENTOS_MEFF', 'MiniIbex_35,Ibex_35')
+BUCKET = 'miax-12-scrap-meff'
+
+# Id de cada tabla en la página de MEFF y si sus filas llevan el atributo data-tipo
+TABLAS_MEFF = {
+    'opciones': ('tblOpciones', True),
+    'futuros': ('Contenido_Contenido_tblFuturos', False),
+}
 
 def obtener_dataframe(response, tipo_tabla):
     """
@@ -34,6 +46,8 @@ def obtener_dataframe(response, tipo_tabla):
         return pd.DataFrame()
     
     if response.status_code == 200:
+        # BeautifulSoup solo se usa en esta ruta (la lambda usa obtener_tablas), así que no se importa al arrancar
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response.content, 'html.parser')
         table = soup.find('table', id=id_tabla)
         all_rows_data = []
@@ -60,6 +74,72 @@ def obtener_dataframe(response, tipo_tabla):
         return pd.DataFrame()
     
     
+def _filas_tabla(table, es_opcion):
+    """Extrae las filas 'text-right' de un elemento <table> de lxml como lo hace obtener_dataframe."""
+    all_rows_data = []
+    for row in table.iter('tr'):
+        if 'text-right' not in (row.get('class') or '').split():
+            continue
+        row_data = [''.join(cell.itertext()).strip() for cell in row.iter('td')]
+        if es_opcion:
+            row_data.insert(0, row.get('data-tipo', 'No especificado'))
+        all_rows_data.append(row_data)
+    return pd.DataFrame(all_rows_data)
+
+
+def extraer_tablas(contenido):
+    """
+    Extrae en una sola pasada las tablas de opciones y futuros del HTML de MEFF.
+    Se usa el parser incremental de lxml, que solo construye el árbol hasta
+    encontrar las dos tablas buscadas y deja de leer el resto del documento.
+    Args:
+    - contenido (bytes): Contenido HTML de la página.
+    Returns:
+    - Diccionario {'opciones': DataFrame, 'futuros': DataFrame} con las tablas sin tratar.
+    """
+    ids = {id_tabla: (tipo, es_opcion) for tipo, (id_tabla, es_opcion) in TABLAS_MEFF.items()}
+    tablas = {}
+    for _, table in etree.iterparse(BytesIO(contenido), events=('end',), tag='table', html=True):
+        tipo, es_opcion = ids.get(table.get('id'), (None, None))
+        if tipo is not None and tipo not in tablas:
+            tablas[tipo] = _filas_tabla(table, es_opcion)
+            if len(tablas) == len(TABLAS_MEFF):
+                break
+
+    for tipo in TABLAS_MEFF:
+        if tipo not in tablas:
+            print('No se encontró la tabla con el id especificado.')
+            tablas[tipo] = pd.DataFrame()
+    return tablas
+
+
+def obtener_tablas(response):
+    """
+    Devuelve las tablas de opciones y futuros de la respuesta HTTP parseando la página una sola vez.
+    Args:
+    - response: La respuesta HTTP obtenida.
+    Returns:
+    - Diccionario {'opciones': DataFrame, 'futuros': DataFrame}.
+    """
+    if response.status_code == 200:
+        return extraer_tablas(response.content)
+    print('Error al realizar la petición HTTP:', response.status_code)
+    return {tipo: pd.DataFrame() for tipo in TABLAS_MEFF}
+    
+    
+def decodificar_numeros(serie, errors='coerce'):
+    """
+    Convierte una columna de números con formato español ('10.250,50') a float de forma vectorizada.
+    Args:
+    - serie: Serie de strings con los números.
+    - errors: 'coerce' para devolver NaN en los valores no numéricos o 'raise' para lanzar error.
+    Returns:
+    - Serie numérica.
+    """
+    limpio = serie.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    return pd.to_numeric(limpio, errors=errors)
+
+
 def tratar_dataframe(df, tipo_tabla):
     """
     Transforma el dataframe según si es de opciones o de futuros.
@@ -79,10 +159,9 @@ def tratar_dataframe(df, tipo_tabla):
         df.drop(['Class'], axis=1, inplace=True)
         
         # Transformaciones adicionales para opciones
-        df['Strike'] = df['Strike'].apply(lambda x: float(x.replace('.', '').replace(',', '.')))
-        df['Ant'] = df['Ant'].apply(lambda x: pd.to_numeric(x.replace('.', '').replace(',', '.'), errors='coerce'))
-        df['Buy_price'] = df['Buy_price'].apply(lambda x: pd.to_numeric(x.replace('.', '').replace(',', '.'), errors='coerce'))
-        df['Sell_price'] = df['Sell_price'].apply(lambda x: pd.to_numeric(x.replace('.', '').replace(',', '.'), errors='coerce'))
+        df['Strike'] = decodificar_numeros(df['Strike'], errors='raise')
+        for columna in ['Buy_price', 'Sell_price', 'Ant']:
+            df[columna] = decodificar_numeros(df[columna])
 
         # Seleccionando solo las columnas deseadas para opciones
         df = df[['Tipo', 'Fecha', 'Strike', 'Buy_price', 'Sell_price', 'Ant']]
@@ -94,7 +173,7 @@ def tratar_dataframe(df, tipo_tabla):
         # Clean up the date string if necessary
         df['Vencimiento'] = df['Vencimiento'].str.replace('.', '')  # Remove periods if present
         df['Vencimiento'] = pd.to_datetime(df['Vencimiento'], format='%d %b %Y', errors='coerce')
-        df['Ant'] = pd.to_numeric(df['Ant'].str.replace('.', '').str.replace(',', '.'), errors='coerce')
+        df['Ant'] = decodificar_numeros(df['Ant'])
         
         # Seleccionando solo las columnas deseadas para futuros
         df = df.loc[:, ['Vencimiento', 'Ant']]
@@ -140,9 +219,34 @@ def calcular_precio_opcion(row, tipo):
     else:
         return None
 
+
+
+def calcular_precios_opciones(df, tipo):
+    """
+    Versión vectorizada de calcular_precio_opcion para todo el DataFrame: media
+    de compra y venta si existen ambas, la que exista si solo hay una, y 'Ant'
+    si no hay ninguna.
+    Args:
+    - df: DataFrame con las columnas de precios de calls y puts.
+    - tipo: Tipo de opción ('call' o 'put').
+    Returns:
+    - Serie con el precio calculado de cada opción.
+    """
+    if tipo not in ('call', 'put'):
+        raise ValueError("Tipo de opción no soportado. Use 'call' o 'put'.")
+
+    buy = df[f'Buy_price_{tipo}'].to_numpy(dtype=float)
+    sell = df[f'Sell_price_{tipo}'].to_numpy(dtype=float)
+    ant = df[f'Ant_{tipo}'].to_numpy(dtype=float)
+    hay_buy, hay_sell = ~np.isnan(buy), ~np.isnan(sell)
+
+    precio = np.where(hay_buy, buy, sell)
+    precio = np.where(hay_buy & hay_sell, (buy + sell) / 2, precio)
+    precio = np.where(~hay_buy & ~hay_sell, ant, precio)
+    return pd.Series(precio, index=df.index)
     
-def datos_opciones(tipo_tabla, response):
-    df = obtener_dataframe(response, tipo_tabla)
+def datos_opciones(tipo_tabla, response, df_bruto=None):
+    df = obtener_dataframe(response, tipo_tabla) if df_bruto is None else df_bruto
     df = tratar_dataframe(df, tipo_tabla)
     
     df_c = df[df['Tipo'] == 'OCE'].copy()
@@ -160,23 +264,29 @@ def datos_opciones(tipo_tabla, response):
     # Calcular la columna 'T' en el DataFrame
     df_final['T'] = (pd.to_datetime(df_final['Fecha']) - pd.Timestamp(datetime.now().date())).dt.days / 365.25
 
-    # Aplicar la función para calcular las columnas 'Precio_call' y 'Precio_put'
-    df_final['Precio_call'] = df_final.apply(lambda row: calcular_precio_opcion(row, 'call'), axis=1)
-    df_final['Precio_put'] = df_final.apply(lambda row: calcular_precio_opcion(row, 'put'), axis=1)
+    # Calcular las columnas 'Precio_call' y 'Precio_put'
+    df_final['Precio_call'] = calcular_precios_opciones(df_final, 'call')
+    df_final['Precio_put'] = calcular_precios_opciones(df_final, 'put')
 
     # Añadir la columna 'Fecha_scrap' con la fecha actual
     df_final['Fecha_scrap'] = datetime.now().date().isoformat()
 
     return df_final
 
-def datos_futuros(tipo_tabla, response):
-    df = obtener_dataframe(response, 'futuros')
+def datos_futuros(tipo_tabla, response, df_bruto=None):
+    df = obtener_dataframe(response, 'futuros') if df_bruto is None else df_bruto
     df = tratar_dataframe(df, 'futuros')
     return df
 
 
-# Cliente de S3
-s3_client = boto3.client('s3')
+# Cliente de S3. Con ALMACENAMIENTO=local:<directorio> se usa el almacenamiento local de
+# pipeline/almacenamiento.py, que solo existe en el repositorio (no va en la imagen)
+ALMACENAMIENTO = os.environ.get('ALMACENAMIENTO', 'aws')
+if ALMACENAMIENTO == 'aws':
+    s3_client = boto3.client('s3')
+else:
+    from almacenamiento import crear_almacenamiento
+    s3_client = crear_almacenamiento(ALMACENAMIENTO).s3
 
 def subir_a_s3(data, bucket_name, object_name):
     """
@@ -190,44 +300,276 @@ def subir_a_s3(data, bucket_name, object_name):
     try:
         s3_client.put_object(Body=data, Bucket=bucket_name, Key=object_name)
         print(f'Datos almacenados correctamente en {bucket_name}/{object_name}.')
+        return True
     except Exception as e:
         print(f'Se ha producido un error: {e}')
+        return False
+
+
+### Histórico de snapshots en Parquet
+# Además de los JSON con el último dato, cada ejecución guarda un snapshot en
+# Parquet particionado al estilo Hive por subyacente y fecha de scrap:
+#   historico/<tipo>/subyacente=<subyacente>/Fecha_scrap=<fecha>/datos.parquet
+# y un manifiesto historico/latest.json que apunta al último snapshot de cada subyacente.
+PREFIJO_HISTORICO = 'historico'
+MANIFIESTO = f'{PREFIJO_HISTORICO}/latest.json'
+SUBYACENTE = 'MiniIbex_35'
+
+
+def clave_snapshot(tipo, subyacente, fecha_scrap):
+    """Devuelve la clave S3 del snapshot Parquet de un tipo ('opciones' o 'futuros')."""
+    return f'{PREFIJO_HISTORICO}/{tipo}/subyacente={subyacente}/Fecha_scrap={fecha_scrap}/datos.parquet'
+
+
+def a_parquet(df):
+    """Serializa un DataFrame a Parquet. Las columnas de partición van en la ruta, no en el fichero."""
+    buffer = BytesIO()
+    df.drop(columns=['subyacente', 'Fecha_scrap'], errors='ignore').to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def cargar_manifiesto(bucket_name):
+    """Devuelve el manifiesto del histórico, o uno vacío si todavía no existe."""
+    try:
+        respuesta = s3_client.get_object(Bucket=bucket_name, Key=MANIFIESTO)
+    except s3_client.exceptions.NoSuchKey:
+        return {'subyacentes': {}}
+    return json.loads(respuesta['Body'].read())
+
+
+def registrar_snapshots(bucket_name, fecha_scrap, claves_por_subyacente):
+    """
+    Actualiza el manifiesto con el último snapshot de varios subyacentes en una sola escritura,
+    conservando el resto.
+    Args:
+    - bucket_name (str): Nombre del bucket de S3.
+    - fecha_scrap (str): Fecha de los snapshots (YYYY-MM-DD).
+    - claves_por_subyacente (dict): Claves S3 de cada tabla del snapshot de cada subyacente
+      (y, opcionalmente, la huella, el ETag y el Last-Modified de la página).
+    """
+    manifiesto = cargar_manifiesto(bucket_name)
+    for subyacente, claves in claves_por_subyacente.items():
+        manifiesto['subyacentes'][subyacente] = {'Fecha_scrap': fecha_scrap, **claves}
+    manifiesto['Fecha_scrap'] = max(x['Fecha_scrap'] for x in manifiesto['subyacentes'].values())
+    return subir_a_s3(json.dumps(manifiesto), bucket_name, MANIFIESTO)
+
+
+def actualizar_manifiesto(bucket_name, subyacente, fecha_scrap, claves):
+    """
+    Actualiza el manifiesto con el último snapshot del subyacente, conservando el resto.
+    Args:
+    - bucket_name (str): Nombre del bucket de S3.
+    - subyacente (str): Nombre del subyacente.
+    - fecha_scrap (str): Fecha del snapshot (YYYY-MM-DD).
+    - claves (dict): Claves S3 de cada tabla del snapshot.
+    """
+    return registrar_snapshots(bucket_name, fecha_scrap, {subyacente: claves})
+
+
+def subir_snapshot(df_opciones, df_futuros, bucket_name, subyacente, fecha_scrap):
+    """Sube los Parquet de opciones y futuros de un snapshot; devuelve sus claves o None si falla alguno."""
+    claves = {}
+    for tipo, df in [('opciones', df_opciones), ('futuros', df_futuros)]:
+        clave = clave_snapshot(tipo, subyacente, fecha_scrap)
+        if not subir_a_s3(a_parquet(df), bucket_name, clave):
+            return None
+        claves[tipo] = clave
+    return claves
+
+
+def guardar_snapshot(df_opciones, df_futuros, bucket_name, subyacente=SUBYACENTE, fecha_scrap=None):
+    """
+    Guarda en el histórico los snapshots Parquet de opciones y futuros y actualiza el manifiesto.
+    Args:
+    - df_opciones, df_futuros (DataFrame): Datos tratados del scraping.
+    - bucket_name (str): Nombre del bucket de S3.
+    - subyacente (str): Nombre del subyacente.
+    - fecha_scrap (str): Fecha del snapshot; por defecto la de hoy.
+    Returns:
+    - True si se guardaron los dos snapshots y el manifiesto.
+    """
+    fecha_scrap = fecha_scrap or datetime.now().date().isoformat()
+    claves = subir_snapshot(df_opciones, df_futuros, bucket_name, subyacente, fecha_scrap)
+    # El manifiesto solo se actualiza cuando los dos snapshots están completos
+    return claves is not None and actualizar_manifiesto(bucket_name, subyacente, fecha_scrap, claves)
+
+
+### Scraping de los instrumentos
+# Sesión HTTP del módulo: se reutiliza entre invocaciones de la lambda en caliente
+sesion = crear_sesion()
+
+
+def leer_instrumentos(texto):
+    """Lista de Instrumento a partir de 'subyacente[:ficha],...' (o de una lista ya separada)."""
+    partes = texto.split(',') if isinstance(texto, str) else texto
+    instrumentos = []
+    for parte in partes:
+        subyacente, _, ficha = parte.strip().partition(':')
+        if subyacente:
+            instrumentos.append(instrumento(subyacente, ficha or None))
+    return instrumentos
+
+
+### Detección de páginas sin cambios
+# En festivos o al repetir una ejecución MEFF devuelve los mismos datos. La entrada
+# del manifiesto de cada subyacente guarda el ETag y el Last-Modified de la página
+# (si MEFF los envía) para pedirla de forma condicional, y una huella SHA-256 de
+# las tablas extraídas. Si la página no ha cambiado (304) o la huella coincide no
+# se sube nada: ni el snapshot ni los JSON que disparan la lambda de volatilidad.
+
+def cabeceras_condicionales(entrada):
+    """Cabeceras If-None-Match / If-Modified-Since a partir de la entrada del manifiesto de un subyacente."""
+    cabeceras = {}
+    if entrada and entrada.get('etag'):
+        cabeceras['If-None-Match'] = entrada['etag']
+    if entrada and entrada.get('last_modified'):
+        cabeceras['If-Modified-Since'] = entrada['last_modified']
+    return cabeceras
+
+
+def huella_tablas(tablas):
+    """Huella SHA-256 de las tablas sin tratar (no depende de la fecha de ejecución)."""
+    huella = hashlib.sha256()
+    for tipo in sorted(tablas):
+        huella.update(tipo.encode())
+        huella.update(tablas[tipo].to_csv(index=False, header=False).encode())
+    return huella.hexdigest()
+
+
+def tratar_pagina(response, previo=None):
+    """
+    Parsea y trata la página de un instrumento sin subir nada.
+    Args:
+    - response: Respuesta HTTP con la página.
+    - previo (dict): Entrada del manifiesto con el último snapshot del subyacente.
+    Returns:
+    - Diccionario con los DataFrames 'opciones' y 'futuros', la huella de las tablas y las
+      cabeceras de caché de la página; {'sin_cambios': True} si las tablas no han cambiado.
+    """
+    # Se parsea la página una sola vez para obtener las dos tablas
+    tablas = obtener_tablas(response)
+    huella = huella_tablas(tablas)
+    if previo and previo.get('huella') == huella:
+        return {'sin_cambios': True}
+
+    cabeceras = getattr(response, 'headers', None) or {}
+    return {'opciones': datos_opciones('opciones', response, tablas['opciones']),
+            'futuros': datos_futuros('futuros', response, tablas['futuros']),
+            'huella': huella, 'etag': cabeceras.get('ETag'), 'last_modified': cabeceras.get('Last-Modified')}
+
+
+def guardar_pagina(inst, tratada, bucket_name, fecha_scrap, json_ultimo=True):
+    """
+    Sube el snapshot de una página tratada con tratar_pagina.
+    Args:
+    - json_ultimo (bool): Preparar también los JSON con el último dato del subyacente de la lambda
+      de volatilidad (en el pipeline unificado no se preparan, porque disparan esa lambda).
+    Returns:
+    - Diccionario con la entrada del manifiesto del snapshot (claves S3, huella y cabeceras de
+      caché de la página), el número de filas de opciones y futuros y, en 'json_ultimo', los JSON
+      que hay que subir con subir_json_ultimo una vez actualizado el manifiesto.
+    """
+    df_opciones, df_futuros = tratada['opciones'], tratada['futuros']
+    claves = subir_snapshot(df_opciones, df_futuros, bucket_name, inst.subyacente, fecha_scrap)
+    if claves is None:
+        raise RuntimeError(f'No se pudo guardar el snapshot de {inst.subyacente}')
+    entrada = {**claves, **{k: tratada[k] for k in ('huella', 'etag', 'last_modified')}}
+    guardado = {'entrada': entrada, 'filas_opciones': len(df_opciones), 'filas_futuros': len(df_futuros)}
+    if json_ultimo and inst.subyacente == SUBYACENTE:
+        # Se serializan aquí, en el hilo de la página, pero se suben después del manifiesto
+        guardado['json_ultimo'] = {'datos_futuros.json': json_registros(df_futuros),
+                                   'datos_opciones.json': json_registros(df_opciones)}
+    return guardado
+
+
+def json_registros(df):
+    """
+    JSON con una lista de registros. Las columnas de fecha se escriben como milisegundos desde
+    1970 (null si no hay fecha), el formato que leen la lambda de volatilidad y /futures/. Se
+    convierten aquí para no depender del date_format 'epoch' de pandas, que está obsoleto.
+    """
+    fechas = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+    df = df.assign(**{c: ((df[c] - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).astype('Int64')
+                      for c in fechas})
+    return df.to_json(orient='records', date_format='iso')
+
+
+def subir_json_ultimo(json_ultimo, bucket_name):
+    """
+    Sube los JSON con el último dato. La subida de datos_opciones.json dispara la lambda de
+    volatilidad, que lee el snapshot a través del manifiesto: por eso se sube el último y
+    solo después de registrar_snapshots.
+    """
+    for clave, datos in json_ultimo.items():
+        subir_a_s3(datos, bucket_name, clave)
+
+
+def procesar_pagina(inst, response, bucket_name, fecha_scrap, previo=None):
+    """
+    Parsea y trata la página de un instrumento y sube su snapshot (se ejecuta en un hilo del motor).
+    Returns:
+    - El resultado de guardar_pagina, o {'sin_cambios': True} si las tablas no han cambiado.
+    """
+    tratada = tratar_pagina(response, previo)
+    if tratada.get('sin_cambios'):
+        return tratada
+    return guardar_pagina(inst, tratada, bucket_name, fecha_scrap)
 
 
 def lambda_handler(event, context):
-    url = 'https://www.meff.es/esp/Derivados-Financieros/Ficha/FIEM_MiniIbex_35'
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        # Opciones
-        df_opciones = datos_opciones('opciones', response)
-        
-        # Futuros
-        df_futuros = datos_futuros('futuros', response)
-        
-        # Convertir DataFrames a JSON
-        opciones_json = df_opciones.to_json(orient='records')
-        futuros_json = df_futuros.to_json(orient='records')
-        
-        # Nombre del bucket y los objetos en S3
-        bucket_name = 'miax-12-scrap-meff'
-        opciones_object_name = 'datos_opciones.json'
-        futuros_object_name = 'datos_futuros.json'
-        
-        # Subir a S3
-        subir_a_s3(opciones_json, bucket_name, opciones_object_name)
-        subir_a_s3(futuros_json, bucket_name, futuros_object_name)
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Datos subidos a S3 correctamente.')
-        }
+    event = event or {}
+    instrumentos = leer_instrumentos(event.get('instrumentos', INSTRUMENTOS))
+    fecha_scrap = datetime.now().date().isoformat()
+
+    # Con {'forzar': True} se descarga y se guarda todo aunque no haya cambios
+    previos = {} if event.get('forzar') else cargar_manifiesto(BUCKET)['subyacentes']
+    cabeceras = {inst.subyacente: cabeceras_condicionales(previos.get(inst.subyacente)) for inst in instrumentos}
+
+    inicio = datetime.now()
+    resultados = scrapear(instrumentos,
+                          lambda inst, response: procesar_pagina(inst, response, BUCKET, fecha_scrap,
+                                                                 previos.get(inst.subyacente)),
+                          sesion=sesion, cabeceras=cabeceras)
+
+    # Un único manifiesto con todos los subyacentes que se han guardado completos
+    sin_cambios = [r.instrumento.subyacente for r in resultados
+                   if r.estado_http == 304 or (r.valor or {}).get('sin_cambios')]
+    # La hora de inicio permite a la lambda de volatilidad medir la latencia de extremo a extremo
+    correctos = {r.instrumento.subyacente: {**r.valor['entrada'], 'inicio_scrap': inicio.isoformat()}
+                 for r in resultados if r.error is None and r.valor and 'entrada' in r.valor}
+    if correctos and registrar_snapshots(BUCKET, fecha_scrap, correctos):
+        # Los JSON que disparan la lambda de volatilidad se suben con el manifiesto ya actualizado;
+        # si no se ha podido escribir, la lambda calcularía el snapshot anterior y no se suben
+        for r in resultados:
+            if r.error is None and r.valor and 'json_ultimo' in r.valor:
+                subir_json_ultimo(r.valor['json_ultimo'], BUCKET)
+
+    informe = {
+        'Fecha_scrap': fecha_scrap,
+        'segundos': (datetime.now() - inicio).total_seconds(),
+        # 'sin_cambios' cuando ningún subyacente tiene datos nuevos: las etapas siguientes no tienen nada que hacer
+        'estado': 'actualizado' if correctos else ('sin_cambios' if sin_cambios else 'error'),
+        'actualizados': list(correctos),
+        'sin_cambios': sin_cambios,
+        'instrumentos': [{'subyacente': r.instrumento.subyacente, 'error': r.error, 'estado_http': r.estado_http,
+                          't_descarga': round(r.t_descarga, 3), 't_proceso': round(r.t_proceso, 3),
+                          **({k: v for k, v in r.valor.items() if k not in ('entrada', 'json_ultimo')}
+                             if r.valor else {})}
+                         for r in resultados],
+    }
+    print(json.dumps(informe))
+    fallidos = len(instrumentos) - len(correctos) - len(sin_cambios)
+    if not fallidos:
+        estado = 200
+    elif correctos or sin_cambios:
+        estado = 207  # Algunos instrumentos han fallado
     else:
-        return {
-            'statusCode': response.status_code,
-            'body': json.dumps('Error al realizar el web scraping')
-        }
+        estado = 502
+    return {
+        'statusCode': estado,
+        'body': json.dumps(informe)
+    }
 
 
 if __name__ == "__main__":
     print(lambda_handler({}, {}))
-    
\ No newline at end of file
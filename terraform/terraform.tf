@@ -32,6 +32,32 @@ resource "aws_dynamodb_table" "volatiliy_table" {
     name = "ID"
     type = "S"
   }
+
+  attribute {
+    name = "Fecha_scrap"
+    type = "S"
+  }
+
+  attribute {
+    name = "Fecha"
+    type = "S"
+  }
+
+  # Índice para consultar las volatilidades de una fecha de scrap (y vencimiento) sin scan
+  global_secondary_index {
+    name            = "fecha_scrap-index"
+    hash_key        = "Fecha_scrap"
+    range_key       = "Fecha"
+    projection_type = "ALL"
+    read_capacity   = 5
+    write_capacity  = 5
+  }
+
+  # Cada día de scrap tiene sus propios elementos; se borran a los 30 días (escritura_dynamodb.RETENCION_DIAS)
+  ttl {
+    attribute_name = "expira"
+    enabled        = true
+  }
 }
 
 # IAM Role for Lambda
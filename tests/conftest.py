@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+# Cada componente se despliega como un directorio independiente (imagen Docker),
+# así que se añaden al path para poder importar sus módulos en los tests.
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for carpeta in ['volatility', 'scrap', 'aplicacion', 'interfaz', 'pipeline']:
+    sys.path.insert(0, os.path.join(RAIZ, carpeta))
+
+from almacenamiento import etag, respuesta_get  # noqa: E402
+
+
+class Cuerpo:
+    def __init__(self, datos):
+        self.datos = datos
+
+    def read(self):
+        return self.datos.encode() if isinstance(self.datos, str) else self.datos
+
+
+class S3Falso:
+    """Cliente de S3 en memoria: objetos {clave: cuerpo} y orden de las subidas."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objetos = {}
+        self.orden = []
+
+    def put_object(self, Body, Bucket, Key, **kwargs):
+        self.objetos[Key] = Body
+        self.orden.append(Key)
+        return {'ETag': etag(Cuerpo(Body).read())}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        if Key not in self.objetos:
+            raise self.exceptions.NoSuchKey(Key)
+        return respuesta_get(Cuerpo(self.objetos[Key]).read(), IfNoneMatch)
+
+
+class RespuestaHTTP:
+    """Respuesta de requests con el contenido, las cabeceras y, si se indican, los datos de json()."""
+
+    def __init__(self, status_code=200, content=b'', headers=None, datos=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.datos = datos
+
+    def json(self):
+        return self.datos
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code}')
+
+
+class SesionHTTP:
+    """
+    Sesión de requests falsa. Responde según la URL si respuestas es un diccionario o en orden
+    si es una lista (una excepción se lanza). Guarda las cabeceras de cada petición y cuenta
+    las peticiones simultáneas; con espera cada respuesta tarda esos segundos.
+    """
+
+    def __init__(self, respuestas, espera=0):
+        self.respuestas = respuestas if isinstance(respuestas, dict) else list(respuestas)
+        self.espera = espera
+        self.peticiones = []
+        self.cabeceras = {}
+        self.en_curso = self.max_en_curso = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self._lock:
+            self.peticiones.append(headers)
+            self.cabeceras[url] = headers
+            self.en_curso += 1
+            self.max_en_curso = max(self.max_en_curso, self.en_curso)
+        time.sleep(self.espera)
+        with self._lock:
+            self.en_curso -= 1
+            respuesta = self.respuestas[url] if isinstance(self.respuestas, dict) else self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+
+class TablaFalsa:
+    """Tabla de DynamoDB que acepta todas las escrituras por lotes y guarda los elementos."""
+    name = 'volatiliy_table'
+
+    def __init__(self):
+        self.items = []
+        self.meta = self
+        self.client = self
+
+    def batch_write_item(self, RequestItems):
+        self.items.extend(RequestItems[self.name])
+        return {'UnprocessedItems': {}}
+
+
+@pytest.fixture(autouse=True)
+def volatilidades_previas_locales(tmp_path, monkeypatch):
+    """La copia local de las volatilidades previas de cada test en su tmp_path, no en /tmp."""
+    import cache_volatilidades
+    monkeypatch.setattr(cache_volatilidades, 'RUTA_LOCAL', str(tmp_path / 'volatilidades_previas.json'))
+
+
+@pytest.fixture
+def s3():
+    return S3Falso()
+
+
+@pytest.fixture
+def tabla():
+    return TablaFalsa()
+
+
+@pytest.fixture
+def respuesta_http():
+    return RespuestaHTTP
+
+
+@pytest.fixture
+def sesion_http():
+    return SesionHTTP
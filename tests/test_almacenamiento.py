@@ -0,0 +1,79 @@
+import json
+import os
+import subprocess
+import sys
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import creacion_api
+import ejecutar_local
+from almacenamiento import S3Local, TablaSQLite, crear_almacenamiento
+from escritura_dynamodb import construir_items, escribir_items
+
+
+def test_s3_local(tmp_path):
+    s3 = S3Local(str(tmp_path))
+    s3.put_object(Body=json.dumps({'a': 1}), Bucket='bucket', Key='historico/latest.json')
+    assert json.loads(s3.get_object(Bucket='bucket', Key='historico/latest.json')['Body'].read()) == {'a': 1}
+    with pytest.raises(s3.exceptions.NoSuchKey):
+        s3.get_object(Bucket='bucket', Key='no_existe.json')
+    with pytest.raises(ValueError):
+        s3.put_object(Body=b'', Bucket='bucket', Key='../fuera.json')
+
+
+def test_tabla_sqlite_consulta_paginada(tmp_path):
+    df = pd.DataFrame({'Fecha': ['2024-06-21'] * 3 + ['2024-09-20'] * 2 + ['2024-06-21'],
+                       'Fecha_scrap': ['2024-05-09'] * 5 + ['2024-05-10'],
+                       'Strike': [10000, 10100, 10200, 10000, 10100, 10000],
+                       'Vol_call': [0.2, 0.21, None, 0.19, 0.2, 0.25]})
+    tabla = TablaSQLite(str(tmp_path / 'vol.sqlite'), tam_pagina=2)
+    escribir_items(tabla, construir_items(df), tam_lote=2)
+
+    # Cada día de scrap tiene sus propios elementos: el 2024-05-10 no sustituye al 2024-05-09
+    items, cursor = creacion_api.leer_volatilidades(tabla, '2024-05-09')
+    assert cursor is None
+    assert [(x['Fecha'], x['Strike']) for x in items] == [('2024-06-21', 10000), ('2024-06-21', 10100),
+                                                          ('2024-06-21', 10200), ('2024-09-20', 10000),
+                                                          ('2024-09-20', 10100)]
+    assert items[0]['Vol_call'] == 0.2 and items[2]['Vol_call'] is None and 'expira' not in items[0]
+    assert [x['Vol_call'] for x in creacion_api.leer_volatilidades(tabla, '2024-05-10')[0]] == [0.25]
+
+    # Con límite y cursor, como la API
+    pagina, cursor = creacion_api.leer_volatilidades(tabla, '2024-05-09', limit=3)
+    resto, _ = creacion_api.leer_volatilidades(tabla, '2024-05-09', cursor=cursor)
+    assert [x['id'] for x in pagina + resto] == [x['id'] for x in items]
+
+    assert len(creacion_api.leer_volatilidades(tabla, '2024-05-09', '2024-09-20')[0]) == 2
+    # Sin filtros se recorre la tabla completa
+    todos, _ = creacion_api.leer_volatilidades(tabla)
+    assert len(todos) == 6
+    assert tabla.scan()['Items'][0]['Strike'] == Decimal('10000')
+
+
+def test_crear_almacenamiento(tmp_path):
+    destino = f'local:{tmp_path}'
+    # Un mismo destino da los mismos objetos: el scraper, la lambda y la API los comparten
+    assert crear_almacenamiento(destino) is crear_almacenamiento(destino)
+    assert isinstance(crear_almacenamiento(destino).tabla, TablaSQLite)
+    with pytest.raises(ValueError):
+        crear_almacenamiento('s3:bucket')
+
+
+@pytest.mark.parametrize('modo', ejecutar_local.MODOS)
+def test_flujo_local_completo(tmp_path, modo):
+    # En otro proceso: los módulos eligen el backend con ALMACENAMIENTO al importarse
+    script = os.path.join(ejecutar_local.RAIZ, 'pipeline', 'ejecutar_local.py')
+    entorno = {k: v for k, v in os.environ.items() if k not in ('ALMACENAMIENTO', 'URL_FICHA_MEFF')}
+    salida = subprocess.run([sys.executable, script, '--directorio', str(tmp_path), '--modo', modo],
+                            capture_output=True, text=True, env=entorno, timeout=300)
+    assert salida.returncode == 0, salida.stderr
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+
+    assert resultado['modo'] == modo
+    assert resultado['volatilidades'] > 0 and resultado['puntos_atm'] > 0
+    assert resultado['malla'] == [100, 100]
+    assert os.path.exists(tmp_path / 's3' / 'miax-12-scrap-meff' / 'historico' / 'latest.json')
+    assert os.path.exists(tmp_path / 'volatilidades.sqlite')
+    assert {'api_volatilidades', 'api_superficie_call', 'superficie'} <= set(salida.stdout.split())
@@ -0,0 +1,250 @@
+import asyncio
+import io
+import json
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from decimal import Decimal
+from fastapi.testclient import TestClient
+
+import creacion_api
+import formatos
+from superficie import decodificar_array
+from cache_respuestas import CacheRespuestas
+
+
+class TablaPaginada:
+    """Tabla de DynamoDB en memoria que pagina de 3 en 3 elementos como haría con el límite de 1 MB."""
+
+    def __init__(self, items, tam_pagina=3):
+        self.items = items
+        self.tam_pagina = tam_pagina
+        self.llamadas = []
+
+    def _pagina(self, items, Limit=None, ExclusiveStartKey=None, **kwargs):
+        inicio = 0
+        if ExclusiveStartKey:
+            inicio = next(i for i, x in enumerate(items) if x['id'] == ExclusiveStartKey['id']) + 1
+        fin = inicio + min(self.tam_pagina, Limit or self.tam_pagina)
+        respuesta = {'Items': items[inicio:fin]}
+        if fin < len(items):
+            respuesta['LastEvaluatedKey'] = {'id': items[fin - 1]['id']}
+        return respuesta
+
+    def scan(self, **kwargs):
+        self.llamadas.append(('scan', kwargs))
+        return self._pagina(self.items, **kwargs)
+
+    def query(self, IndexName, KeyConditionExpression, **kwargs):
+        self.llamadas.append(('query', kwargs))
+        valores = {}
+        condiciones = [KeyConditionExpression]
+        while condiciones:
+            c = condiciones.pop()
+            if c.expression_operator == 'AND':
+                condiciones.extend(c._values)
+            else:
+                valores[c._values[0].name] = c._values[1]
+        items = [x for x in self.items if all(x[k] == v for k, v in valores.items())]
+        return self._pagina(items, **kwargs)
+
+
+def item(fecha_scrap, fecha, strike):
+    return {'id': f'{fecha}_{strike}', 'Fecha': fecha, 'Fecha_scrap': fecha_scrap,
+            'Strike': Decimal(strike), 'Vol_call': Decimal('0.2'), 'Vol_put': None}
+
+
+@pytest.fixture
+def tabla(monkeypatch):
+    items = ([item('2024-05-09', '2024-06-21', k) for k in range(10000, 10400, 100)]
+             + [item('2024-05-10', '2024-07-19', k) for k in range(10000, 10800, 100)])
+    tabla = TablaPaginada(items)
+    monkeypatch.setattr(creacion_api, 'get_dynamodb_table', lambda: tabla)
+    monkeypatch.setattr(creacion_api, 'cache', CacheRespuestas())
+    monkeypatch.setattr(creacion_api, 'obtener_version_datos',
+                        lambda: (version['Fecha_scrap'], version['volatilidades']))
+    monkeypatch.setattr(creacion_api, 'INTERVALO_VERSION', 0)
+    monkeypatch.setattr(creacion_api, 'leer_precio_subyacente', lambda fecha_scrap: 10400.0)
+    creacion_api.calcular_superficie_snapshot.cache_clear()
+    return tabla
+
+
+version = {'Fecha_scrap': '2024-05-10', 'volatilidades': None}
+
+
+def test_sin_filtros_sigue_todas_las_paginas(tabla):
+    respuesta = TestClient(creacion_api.app).get('/volatilities/')
+    assert respuesta.status_code == 200
+    assert len(respuesta.json()) == 12
+    assert 'X-Next-Cursor' not in respuesta.headers
+
+
+def test_consulta_por_fecha_scrap_con_cursor(tabla):
+    cliente = TestClient(creacion_api.app)
+    vistos = []
+    cursor = None
+    while True:
+        params = {'fecha_scrap': '2024-05-10', 'expiry': '2024-07-19', 'limit': 5}
+        if cursor:
+            params['cursor'] = cursor
+        respuesta = cliente.get('/volatilities/', params=params)
+        assert respuesta.status_code == 200
+        vistos.extend(x['id'] for x in respuesta.json())
+        cursor = respuesta.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert len(vistos) == len(set(vistos)) == 8
+    assert all(tipo == 'query' for tipo, _ in tabla.llamadas)
+
+
+def test_expiry_requiere_fecha_scrap(tabla):
+    respuesta = TestClient(creacion_api.app).get('/volatilities/', params={'expiry': '2024-07-19'})
+    assert respuesta.status_code == 400
+
+
+def test_cache_etag_y_304(tabla):
+    cliente = TestClient(creacion_api.app)
+    primera = cliente.get('/volatilities/', params={'fecha_scrap': '2024-05-09'})
+    etag = primera.headers['ETag']
+    assert 'max-age' in primera.headers['Cache-Control']
+
+    segunda = cliente.get('/volatilities/', params={'fecha_scrap': '2024-05-09'}, headers={'If-None-Match': etag})
+    assert segunda.status_code == 304 and segunda.content == b''
+    assert len(tabla.llamadas) == 2  # la segunda petición no va a DynamoDB
+
+    estadisticas = cliente.get('/cache/estadisticas/').json()
+    assert estadisticas['aciertos'] == 1 and estadisticas['fallos'] == 1 and estadisticas['respuestas_304'] == 1
+
+
+def test_cache_se_invalida_con_nueva_fecha_scrap(tabla, monkeypatch):
+    cliente = TestClient(creacion_api.app)
+    cliente.get('/volatilities/')
+    monkeypatch.setitem(version, 'Fecha_scrap', '2024-05-13')
+    cliente.get('/volatilities/')
+    estadisticas = cliente.get('/cache/estadisticas/').json()
+    assert estadisticas['invalidaciones'] == 1 and estadisticas['aciertos'] == 0
+    # La caché solo se invalida con el manifiesto: no hay ruta para vaciarla desde fuera
+    assert cliente.post('/cache/invalidar/').status_code == 404
+
+
+def test_cache_lru_y_ttl():
+    reloj = {'t': 0}
+    cache = CacheRespuestas(max_entradas=2, ttl=10, reloj=lambda: reloj['t'])
+    for clave in ['a', 'b', 'c']:
+        cache.guardar(clave, clave.encode())
+    assert cache.obtener('a') is None and cache.obtener('c').cuerpo == b'c'
+    reloj['t'] = 11
+    assert cache.obtener('c') is None
+    assert cache.estadisticas()['expulsiones'] == 1 and cache.estadisticas()['caducadas'] == 1
+
+
+def test_formatos_devuelven_los_mismos_datos(tabla):
+    cliente = TestClient(creacion_api.app)
+    params = {'fecha_scrap': '2024-05-10'}
+    esperado = pd.DataFrame(cliente.get('/volatilities/', params=params).json())
+
+    arrow = cliente.get('/volatilities/', params=params, headers={'Accept': formatos.ARROW})
+    assert arrow.headers['content-type'] == formatos.ARROW and 'ETag' in arrow.headers
+    df_arrow = pa.ipc.open_stream(arrow.content).read_pandas()
+
+    parquet = cliente.get('/volatilities/', params=params, headers={'Accept': formatos.PARQUET})
+    df_parquet = pd.read_parquet(io.BytesIO(parquet.content))
+
+    ndjson = cliente.get('/volatilities/', params=params, headers={'Accept': formatos.NDJSON})
+    assert ndjson.headers['content-type'].startswith(formatos.NDJSON)
+    df_ndjson = pd.DataFrame([json.loads(linea) for linea in ndjson.text.splitlines()])
+
+    for df in [df_arrow, df_parquet, df_ndjson]:
+        assert list(df['id']) == list(esperado['id'])
+        assert df['Strike'].astype(float).tolist() == esperado['Strike'].astype(float).tolist()
+        assert df['Vol_call'].tolist() == esperado['Vol_call'].tolist()
+        assert df['Vol_put'].isna().all()
+
+    # La respuesta NDJSON transmitida se guarda en la caché al terminar
+    repetida = cliente.get('/volatilities/', params=params, headers={'Accept': formatos.NDJSON})
+    assert repetida.content == ndjson.content and 'ETag' in repetida.headers
+
+
+def test_cursor_no_valido_antes_de_transmitir(tabla):
+    # El cursor se valida antes de empezar la respuesta: 400 y no un NDJSON cortado
+    respuesta = TestClient(creacion_api.app).get('/volatilities/', params={'cursor': 'no-es-un-cursor'},
+                                                 headers={'Accept': formatos.NDJSON})
+    assert respuesta.status_code == 400 and respuesta.json()['detail'] == 'Cursor no válido'
+    assert not tabla.llamadas
+
+
+def test_elegir_formato():
+    assert formatos.elegir_formato(None) == formatos.JSON
+    assert formatos.elegir_formato('text/html, */*') == formatos.JSON
+    assert formatos.elegir_formato(f'{formatos.ARROW}, application/json;q=0.5') == formatos.ARROW
+    assert formatos.elegir_formato(f'application/json, {formatos.PARQUET};q=0.9') == formatos.JSON
+    assert formatos.elegir_formato(f'{formatos.ARROW};q=0, {formatos.NDJSON}') == formatos.NDJSON
+
+
+def test_superficie_se_precalcula_y_se_cachea(tabla, monkeypatch):
+    tabla.items = [{'id': f'{fecha}_{k}', 'Fecha': fecha, 'Fecha_scrap': '2024-05-13', 'Strike': Decimal(k),
+                    'Vol_call': Decimal(str(0.2 + ((k - 10400) / 2000) ** 2)), 'Vol_put': None}
+                   for fecha in ['2024-06-21', '2024-07-19', '2024-09-20'] for k in range(9800, 11000, 100)]
+    lanzados = []
+    monkeypatch.setattr(creacion_api, 'lanzar_precalculo', lanzados.append)
+    cliente = TestClient(creacion_api.app)
+    cliente.get('/volatilities/', params={'fecha_scrap': '2024-05-13', 'limit': 1})
+    monkeypatch.setitem(version, 'volatilidades', '2024-05-13')
+    cliente.get('/volatilities/', params={'fecha_scrap': '2024-05-13', 'limit': 1})
+    assert lanzados == [None, '2024-05-13']
+
+    # El precálculo deja en memoria la superficie de calls (no hay volatilidades de puts)
+    asyncio.run(creacion_api.precalcular_superficies('2024-05-13'))
+    assert creacion_api.calcular_superficie_snapshot.cache_info().currsize == 1
+
+    llamadas = len(tabla.llamadas)
+    respuesta = cliente.get('/surface/', params={'fecha_scrap': '2024-05-13', 'tipo': 'call'})
+    assert respuesta.status_code == 200 and len(tabla.llamadas) == llamadas
+    datos = respuesta.json()
+    iv = decodificar_array(datos['iv'])
+    assert iv.dtype == np.float32 and iv.shape == (100, 100)
+    assert decodificar_array(datos['maturity']).shape == decodificar_array(datos['moneyness']).shape == (100,)
+    assert np.nanmin(iv) >= 0.19 and np.nanmax(iv) <= 0.35
+
+    assert cliente.get('/surface/', params={'fecha_scrap': '2024-05-13', 'tipo': 'put'}).status_code == 422
+    assert cliente.get('/surface/', params={'fecha_scrap': '2024-05-14'}).status_code == 404
+    assert cliente.get('/surface/', params={'fecha_scrap': '2024-05-13', 'resolucion': 5}).status_code == 422
+
+
+def test_precio_subyacente_solo_de_su_fecha(monkeypatch, s3):
+    monkeypatch.setattr(creacion_api, 'get_s3_client', lambda: s3)
+    s3.objetos['historico/futuros/subyacente=MiniIbex_35/Fecha_scrap=2024-05-10/datos.parquet'] = \
+        pd.DataFrame({'Ant': [10450.0]}).to_parquet()
+    s3.objetos['datos_futuros.json'] = json.dumps([{'Ant': 10600.0}])
+    s3.objetos[creacion_api.MANIFIESTO] = json.dumps(
+        {'Fecha_scrap': '2024-05-13', 'subyacentes': {'MiniIbex_35': {'Fecha_scrap': '2024-05-13'}}})
+
+    assert creacion_api.leer_precio_subyacente('2024-05-10') == 10450.0
+    # Sin partición el último JSON solo vale para el último snapshot
+    assert creacion_api.leer_precio_subyacente('2024-05-13') == 10600.0
+    with pytest.raises(creacion_api.HTTPException) as error:
+        creacion_api.leer_precio_subyacente('2024-05-09')
+    assert error.value.status_code == 404
+
+
+def test_puntos_atm_filtrados(tabla, monkeypatch, s3):
+    puntos = [{'Fecha_scrap': fs, 'Fecha': f, 'T': 0.1, 'Vol_call': 0.2, 'Vol_put': None}
+              for fs in ['2024-05-09', '2024-05-10', '2024-05-13'] for f in ['2024-06-21', '2024-07-19']]
+    s3.objetos[creacion_api.CLAVE_ATM] = json.dumps(puntos)
+    monkeypatch.setattr(creacion_api, 'get_s3_client', lambda: s3)
+    cliente = TestClient(creacion_api.app)
+    assert len(cliente.get('/atm/').json()) == 6
+    respuesta = cliente.get('/atm/', params={'fecha_scrap': ['2024-05-09', '2024-05-13'], 'expiry': '2024-07-19'})
+    assert [p['Fecha_scrap'] for p in respuesta.json()] == ['2024-05-09', '2024-05-13']
+
+    s3.objetos.clear()
+    creacion_api.cache.invalidar()
+    assert cliente.get('/atm/').json() == []
+
+
+def test_las_griegas_son_las_de_black_scholes():
+    from black_scholes import GRIEGAS
+    columnas = [f'{griega}_{tipo}' for tipo in ['call', 'put'] for griega in GRIEGAS]
+    assert formatos.ESQUEMA_VOLATILIDADES.names[-len(columnas):] == columnas
+    assert set(columnas) <= set(creacion_api.VolatilityItem.model_fields)
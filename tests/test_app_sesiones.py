@@ -0,0 +1,191 @@
+import base64
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from black_scholes import GRIEGAS
+from gestor_datos import DatosCargados, GestorDatos, preparar_volatilidades
+
+
+@pytest.fixture(scope='module')
+def cliente():
+    # Se importa la app sin arrancar el hilo que descarga los datos de la API
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(GestorDatos, 'iniciar', lambda self: None)
+        import app
+    app.gestor.datos = DatosCargados(pd.DataFrame({
+        'Fecha_scrap': ['2024-05-10'] * 2, 'Fecha': ['2024-06-21'] * 2, 'Strike': [10000.0, 10100.0],
+        'Vol_call': [0.2, 0.21], 'Vol_put': [0.25, 0.24], 'Delta_call': [0.6, 0.55]}), 1, '"v1"')
+    return app.app.server.test_client()
+
+
+def llamar(cliente, salidas, entradas, estados, disparador):
+    """Ejecuta un callback como lo haría el navegador y devuelve su respuesta."""
+    def props(valores):
+        return [{'id': id_, 'property': prop, 'value': valor} for (id_, prop), valor in valores.items()]
+    salidas = [{'id': id_, 'property': prop} for id_, prop in salidas]
+    output = '...'.join(f"{s['id']}.{s['property']}" for s in salidas)
+    if len(salidas) > 1:
+        output = '..' + output + '..'
+    cuerpo = {'output': output, 'outputs': salidas if len(salidas) > 1 else salidas[0],
+              'inputs': props(entradas), 'state': props(estados),
+              'changedPropIds': [disparador]}
+    respuesta = cliente.post('/_dash-update-component', json=cuerpo)
+    assert respuesta.status_code == 200
+    return respuesta.get_json()['response']
+
+
+def test_la_figura_del_skew_lleva_calls_y_puts(cliente):
+    respuesta = llamar(cliente, [('skew-figura', 'data')],
+                       {('date-picker', 'value'): '2024-06-21', ('scrap-date-picker', 'value'): '2024-05-10'},
+                       {}, 'date-picker.value')
+    figura = respuesta['skew-figura']['data']
+    assert [(t['name'], t['visible']) for t in figura['data']] == [('call', True), ('put', False)]
+    # Las griegas guardadas van en customdata, una columna por griega (NaN si no están)
+    griegas = figura['data'][0]['customdata']
+    griegas = np.frombuffer(base64.b64decode(griegas['bdata']), dtype=griegas['dtype']).reshape(2, -1)
+    assert griegas.shape == (2, len(GRIEGAS)) and np.allclose(griegas[:, 0], [0.6, 0.55])
+    assert np.isnan(griegas[:, 1:]).all() and 'Delta' in figura['data'][0]['hovertemplate']
+
+
+def callback_skew():
+    """Callback clientside que cambia entre calls y puts."""
+    import app
+    return next(c for c in app.app._callback_list
+                if c.get('clientside_function') and 'volatility-graph.figure' in c['output'])
+
+
+def ejecutar_clientside(callback, argumentos, disparador):
+    """Ejecuta con node la función JS de un callback clientside como lo haría el navegador."""
+    import app
+    programa = """
+    globalThis.window = globalThis;
+    %s
+    const entrada = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+    dash_clientside.no_update = {no_update: true};
+    dash_clientside.callback_context = {triggered: [{prop_id: entrada.disparador}]};
+    const funcion = dash_clientside[entrada.namespace][entrada.nombre];
+    console.log(JSON.stringify(funcion(...entrada.argumentos)));
+    """ % '\n'.join(app.app._inline_scripts)
+    entrada = {'namespace': callback['clientside_function']['namespace'],
+               'nombre': callback['clientside_function']['function_name'],
+               'argumentos': argumentos, 'disparador': disparador}
+    salida = subprocess.run(['node', '-e', programa], input=json.dumps(entrada), capture_output=True,
+                            text=True, check=True, timeout=30)
+    return json.loads(salida.stdout)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='Hace falta node para ejecutar el callback clientside')
+def test_el_menu_elegido_es_de_cada_sesion(cliente):
+    # El servidor envía la misma figura a todas las sesiones; el menú se aplica en el navegador
+    figura = llamar(cliente, [('skew-figura', 'data')],
+                    {('date-picker', 'value'): '2024-06-21', ('scrap-date-picker', 'value'): '2024-05-10'},
+                    {}, 'date-picker.value')['skew-figura']['data']
+    callback = callback_skew()
+
+    # Una sesión pulsa "Put"
+    grafico, _, _, menu = ejecutar_clientside(callback, [figura, 0, 1, 'btn-call'], 'btn-put.n_clicks')
+    assert menu == 'btn-put'
+    assert [t['visible'] for t in grafico['data']] == [False, True]
+    assert grafico['layout']['yaxis']['title']['text'] == 'Vol_put'
+    # Al cambiar de fecha sigue en puts con el menú guardado en su sesión
+    grafico, _, _, menu = ejecutar_clientside(callback, [figura, 0, 1, menu], 'skew-figura.data')
+    assert menu == 'btn-put' and [t['visible'] for t in grafico['data']] == [False, True]
+
+    # Otra sesión que solo cambia de fecha sigue viendo calls
+    otra = llamar(cliente, [('skew-figura', 'data')],
+                  {('date-picker', 'value'): '2024-06-21', ('scrap-date-picker', 'value'): '2024-05-10'},
+                  {}, 'date-picker.value')['skew-figura']['data']
+    assert otra == figura
+    grafico, estilo_call, estilo_put, menu = ejecutar_clientside(callback, [otra, 0, 0, 'btn-call'], 'skew-figura.data')
+    assert menu == 'btn-call'
+    assert [t['visible'] for t in grafico['data']] == [True, False]
+    assert grafico['layout']['yaxis']['title']['text'] == 'Vol_call'
+    assert estilo_call != estilo_put
+
+
+def test_el_cambio_call_put_coincide_con_las_trazas(cliente):
+    import app
+    figura = llamar(cliente, [('skew-figura', 'data')],
+                    {('date-picker', 'value'): '2024-06-21', ('scrap-date-picker', 'value'): '2024-05-10'},
+                    {}, 'date-picker.value')['skew-figura']['data']
+    trazas = [t['name'] for t in figura['data']]
+    assert trazas == ['call', 'put'] and sorted(app.TITULOS_SKEW) == sorted(trazas)
+
+    # El JS pasa de botón a traza con 'btn-<traza>': un botón y un estilo por cada traza
+    callback = callback_skew()
+    entradas = [f"{e['id']}.{e['property']}" for e in callback['inputs']]
+    assert entradas == ['skew-figura.data'] + [f'btn-{t}.n_clicks' for t in trazas]
+    assert callback['output'] == '..' + '...'.join(
+        ['volatility-graph.figure'] + [f'btn-{t}.style' for t in trazas] + ['menu-seleccionado.data']) + '..'
+    assert [f"{e['id']}.{e['property']}" for e in callback['state']] == ['menu-seleccionado.data']
+    # Ningún callback del servidor escucha los botones: cambiar de serie no va al servidor
+    assert all(f'btn-{t}' not in str(c['inputs']) for c in app.app._callback_list
+               if not c.get('clientside_function') for t in trazas)
+
+
+def test_los_mensajes_del_chat_son_de_cada_sesion(cliente):
+    salidas = [('chatbot-container', 'is_open'), ('messages-container', 'children'), ('options-container', 'style'),
+               ('more-info-options', 'style'), ('messages-container', 'data-last-update'), ('mensajes-chat', 'data')]
+    entradas = {(b, 'n_clicks'): 1 for b in ['chatbot-toggle-button', 'option-call', 'option-put',
+                                              'more-info-yes', 'more-info-no']}
+    abierto = llamar(cliente, salidas, entradas, {('chatbot-container', 'is_open'): False,
+                                                   ('mensajes-chat', 'data'): []}, 'chatbot-toggle-button.n_clicks')
+    mensajes = abierto['mensajes-chat']['data']
+    assert len(mensajes) == 2
+
+    respuesta = llamar(cliente, salidas, entradas, {('chatbot-container', 'is_open'): True,
+                                                     ('mensajes-chat', 'data'): mensajes}, 'option-call.n_clicks')
+    assert len(respuesta['mensajes-chat']['data']) == 5
+    # Otra sesión con el chat recién abierto no ve esos mensajes
+    otra = llamar(cliente, salidas, entradas, {('chatbot-container', 'is_open'): True,
+                                                ('mensajes-chat', 'data'): []}, 'more-info-no.n_clicks')
+    assert len(otra['mensajes-chat']['data']) == 2
+
+
+def test_comparativa_de_varios_dias(cliente, tmp_path, respuesta_http):
+    import app
+    import creacion_api
+    from almacenamiento import TablaSQLite
+    from escritura_dynamodb import construir_items
+    datos = app.gestor.datos
+    atm = pd.DataFrame({'Fecha_scrap': ['2024-05-09', '2024-05-10'], 'Fecha': ['2024-06-21'] * 2,
+                        'T': [0.12, 0.11], 'Vol_call': [0.2, 0.21], 'Vol_put': [0.22, float('nan')]})
+    # Los dos días se escriben y se leen como en producción: la tabla guarda los dos
+    tabla = TablaSQLite(str(tmp_path / 'vol.sqlite'))
+    for fecha_scrap in ['2024-05-09', '2024-05-10']:
+        tabla.batch_write_item({tabla.name: [{'PutRequest': {'Item': item}}
+                                             for item in construir_items(datos.df.assign(Fecha_scrap=fecha_scrap))]})
+    items, _ = creacion_api.leer_volatilidades(tabla)
+    df = preparar_volatilidades(respuesta_http(headers={'content-type': 'application/json'}, datos=items))
+    app.gestor.datos = DatosCargados(df, 2, '"v2"', atm, '"a1"')
+    assert app.gestor.datos.fechas_scrap == ['2024-05-10', '2024-05-09']
+    try:
+        opciones = llamar(cliente, [('comparar-scraps', 'options'), ('comparar-scraps', 'value')],
+                          {('comparar-vencimiento', 'value'): '2024-06-21'}, {}, 'comparar-vencimiento.value')
+        assert opciones['comparar-scraps']['value'] == ['2024-05-09', '2024-05-10']
+
+        graficos = llamar(cliente, [('comparar-skew-graph', 'figure'), ('atm-estructura-graph', 'figure')],
+                          {('comparar-vencimiento', 'value'): '2024-06-21',
+                           ('comparar-scraps', 'value'): ['2024-05-10', '2024-05-09'], ('comparar-tipo', 'value'): 'put'}, {}, 'comparar-scraps.value')
+        skew = graficos['comparar-skew-graph']['figure']['data']
+        assert [t['name'] for t in skew] == ['2024-05-09', '2024-05-10'] and skew[0]['y']['dtype'] == 'f4'
+        # Sin volatilidad ATM de puts el 2024-05-10 la serie queda vacía
+        estructura = graficos['atm-estructura-graph']['figure']['data']
+        assert [t['name'] for t in estructura] == ['2024-05-09', '2024-05-10']
+
+        historico = llamar(cliente, [('atm-historico-graph', 'figure')],
+                           {('comparar-vencimiento', 'value'): '2024-06-21'}, {}, 'comparar-vencimiento.value')
+        assert [t['name'] for t in historico['atm-historico-graph']['figure']['data']] == ['call', 'put']
+    finally:
+        app.gestor.datos = datos
+
+
+def test_no_hay_ruta_para_despertar_a_un_solo_worker(cliente):
+    # Cada worker de gunicorn refresca sus datos con el sondeo por ETag; un aviso por POST
+    # solo llegaría a uno y los demás servirían otra versión
+    assert cliente.post('/datos/refrescar').status_code in (404, 405)
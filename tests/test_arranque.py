@@ -0,0 +1,26 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+with open(os.path.join(RAIZ, 'benchmarks', 'presupuestos_arranque.json')) as f:
+    PROHIBIDOS = set(json.load(f)['prohibidos'])
+
+
+def modulos_importados(modulo):
+    """Módulos que se importan al cargar el handler, según -X importtime."""
+    env = dict(os.environ, AWS_DEFAULT_REGION='eu-west-3',
+               PYTHONPATH=os.pathsep.join(os.path.join(RAIZ, c) for c in ['scrap', 'volatility', 'pipeline']))
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                             env=env, capture_output=True, text=True, check=True)
+    return {linea.split('|')[-1].strip() for linea in proceso.stderr.splitlines() if linea.startswith('import time:')}
+
+
+@pytest.mark.parametrize('modulo', ['scrapping_s3_meff', 'lambda_vol_dynamo', 'lambda_pipeline'])
+def test_los_handlers_no_importan_modulos_pesados_al_arrancar(modulo):
+    importados = modulos_importados(modulo)
+    assert modulo in importados
+    assert not importados & PROHIBIDOS
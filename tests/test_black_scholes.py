@@ -0,0 +1,39 @@
+import numpy as np
+
+from black_scholes import precio_vega_volga, precio_y_griegas
+
+
+def test_griegas_coinciden_con_diferencias_finitas():
+    S, r = 11000.0, 0.03
+    K = np.array([9500.0, 11000.0, 12500.0])
+    T = np.array([0.1, 0.5, 1.2])
+    sigma = np.array([0.25, 0.18, 0.15])
+    h = 1e-4
+
+    for es_call in [True, False]:
+        g = precio_y_griegas(S, K, T, r, sigma, es_call)
+
+        def precio(S=S, T=T, sigma=sigma):
+            return precio_y_griegas(S, K, T, r, sigma, es_call)['Precio']
+
+        def delta(sigma=sigma):
+            return precio_y_griegas(S, K, T, r, sigma, es_call)['Delta']
+
+        np.testing.assert_allclose(g['Delta'], (precio(S=S * (1 + h)) - precio(S=S * (1 - h))) / (2 * S * h), rtol=1e-5)
+        np.testing.assert_allclose(
+            g['Gamma'], (precio(S=S * (1 + h)) - 2 * g['Precio'] + precio(S=S * (1 - h))) / (S * h) ** 2, rtol=1e-3)
+        np.testing.assert_allclose(g['Vega'], (precio(sigma=sigma + h) - precio(sigma=sigma - h)) / (2 * h), rtol=1e-5)
+        np.testing.assert_allclose(g['Theta'], -(precio(T=T + h) - precio(T=T - h)) / (2 * h), rtol=1e-4)
+        np.testing.assert_allclose(g['Vanna'], (delta(sigma + h) - delta(sigma - h)) / (2 * h), rtol=1e-4)
+
+        # El camino del solver comparte d1/d2 y da el mismo precio, vega y volga
+        p, vega, volga = precio_vega_volga(S, K, T, r, sigma, es_call)
+        np.testing.assert_allclose(p, g['Precio'])
+        np.testing.assert_allclose(vega, g['Vega'])
+        np.testing.assert_allclose(volga, g['Volga'])
+
+
+def test_griegas_nan_sin_volatilidad():
+    g = precio_y_griegas(11000.0, [10000.0, 10000.0, 10000.0], [0.5, 0.5, 0.0], 0, [np.nan, 0.0, 0.2], True)
+    for griega in ['Delta', 'Gamma', 'Vega', 'Theta', 'Vanna']:
+        assert np.isnan(g[griega]).all()
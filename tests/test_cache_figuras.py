@@ -0,0 +1,38 @@
+import numpy as np
+
+from cache_figuras import CacheLRU, CacheRedis
+
+
+def test_lru_y_cambio_de_version():
+    cache = CacheLRU(max_entradas=2)
+    cache.comprobar_version(1)
+    for clave in ['a', 'b', 'c']:
+        cache.guardar((clave, 1), clave)
+    assert cache.obtener(('a', 1)) is None and cache.obtener(('c', 1)) == 'c'
+
+    cache.comprobar_version(1)
+    assert cache.obtener(('c', 1)) == 'c'
+    cache.comprobar_version(2)
+    assert cache.obtener(('c', 1)) is None
+    estadisticas = cache.estadisticas()
+    assert estadisticas['expulsiones'] == 1 and estadisticas['invalidaciones'] == 1 and estadisticas['entradas'] == 0
+
+
+class RedisFalso:
+    def __init__(self):
+        self.datos = {}
+
+    def get(self, clave):
+        return self.datos.get(clave)
+
+    def set(self, clave, valor, ex=None):
+        self.datos[clave] = valor.encode()
+
+
+def test_cache_redis_compartida_entre_procesos():
+    cliente = RedisFalso()
+    # Dos workers con su propia instancia ven las mismas entradas
+    worker_1, worker_2 = CacheRedis('redis://', cliente=cliente), CacheRedis('redis://', cliente=cliente)
+    worker_1.guardar(('2024-05-10', 'call', 100, '"v1"'), {'figura': {'data': [{'z': np.zeros((2, 2))}]}})
+    assert worker_2.obtener(('2024-05-10', 'call', 100, '"v1"')) == {'figura': {'data': [{'z': [[0.0, 0.0], [0.0, 0.0]]}]}}
+    assert worker_2.obtener(('2024-05-10', 'call', 100, '"v2"')) is None
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+
+from cache_volatilidades import CLAVE_VOLATILIDADES, cargar_volatilidades_previas, guardar_volatilidades_previas
+
+
+class S3Contador:
+    """Cuenta las lecturas de S3 que devuelven el objeto (las que no acaban en 304)."""
+
+    def __init__(self, s3):
+        self.s3 = s3
+        self.exceptions = s3.exceptions
+        self.descargas = 0
+
+    def put_object(self, **kwargs):
+        return self.s3.put_object(**kwargs)
+
+    def get_object(self, **kwargs):
+        respuesta = self.s3.get_object(**kwargs)
+        self.descargas += 1
+        return respuesta
+
+
+def test_la_copia_local_solo_se_usa_si_coincide_con_s3(s3, tmp_path):
+    ruta = str(tmp_path / 'previas.json')
+    s3 = S3Contador(s3)
+    assert cargar_volatilidades_previas(s3, 'bucket', ruta) == {}
+
+    previas = guardar_volatilidades_previas(s3, 'bucket', ['a', 'b'], np.array([0.2, np.nan]),
+                                            np.array([0.3, 0.25]), {}, ruta)
+    # S3 contesta 304: se usa la copia local sin descargar el objeto
+    assert cargar_volatilidades_previas(s3, 'bucket', ruta) == previas and s3.descargas == 0
+
+    # Otra instancia actualiza el estado en S3: la copia local ya no vale
+    s3.put_object(Body=json.dumps({'a': [0.21, 0.31]}), Bucket='bucket', Key=CLAVE_VOLATILIDADES)
+    assert cargar_volatilidades_previas(s3, 'bucket', ruta) == {'a': [0.21, 0.31]} and s3.descargas == 1
+    # y se sustituye por la nueva
+    assert cargar_volatilidades_previas(s3, 'bucket', ruta) == {'a': [0.21, 0.31]} and s3.descargas == 1
+
+
+def test_copia_local_sin_etag(s3, tmp_path):
+    # Formato anterior (solo las volatilidades): se ignora y se lee S3
+    ruta = tmp_path / 'previas.json'
+    ruta.write_text(json.dumps({'a': [0.5, 0.5]}))
+    s3.put_object(Body=json.dumps({'a': [0.2, 0.3]}), Bucket='bucket', Key=CLAVE_VOLATILIDADES)
+    assert cargar_volatilidades_previas(s3, 'bucket', str(ruta)) == {'a': [0.2, 0.3]}
+    assert json.loads(ruta.read_text())['ETag']
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from escritura_dynamodb import ControlCaudal, construir_items, escribir_items
+
+
+class ClienteFalso:
+    """Devuelve la mitad de cada lote como UnprocessedItems y un throttle en la primera llamada."""
+
+    def __init__(self):
+        self.escritos = {}
+        self.llamadas = 0
+
+    def batch_write_item(self, RequestItems):
+        self.llamadas += 1
+        if self.llamadas == 1:
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+        (nombre, peticiones), = RequestItems.items()
+        assert len(peticiones) <= 25
+        corte = len(peticiones) // 2 if len(peticiones) > 1 else 1
+        for p in peticiones[:corte]:
+            item = p['PutRequest']['Item']
+            self.escritos[item['id']['S']] = item
+        return {'UnprocessedItems': {nombre: peticiones[corte:]} if peticiones[corte:] else {}}
+
+
+class TablaFalsa:
+    name = 'volatiliy_table'
+
+    def __init__(self):
+        self.meta = type('Meta', (), {'client': ClienteFalso()})()
+
+
+def df_volatilidades(n):
+    return pd.DataFrame({
+        'Fecha': ['2024-06-21'] * n,
+        'Fecha_scrap': ['2024-05-10'] * n,
+        'Strike': np.arange(n) * 25 + 10000,
+        'Vol_call': np.where(np.arange(n) % 3 == 0, np.nan, 0.2),
+        'Vol_put': 0.25,
+    })
+
+
+def test_construir_items():
+    items = construir_items(df_volatilidades(3))
+    assert items[0]['id'] == {'S': '2024-05-10_2024-06-21_10000'}
+    # TTL: 30 días después de la fecha de scrap (2024-06-09)
+    assert items[0]['expira'] == {'N': '1717891200'}
+    assert items[0]['Vol_call'] == {'NULL': True}
+    assert items[1]['Vol_call'] == {'N': '0.2'}
+    assert items[2]['Strike'] == {'N': '10050'}
+
+
+def test_id_igual_con_strike_float_o_entero():
+    df = df_volatilidades(2)
+    ids_enteros = [item['id']['S'] for item in construir_items(df)]
+    df['Strike'] = df['Strike'].astype(float)
+    assert [item['id']['S'] for item in construir_items(df)] == ids_enteros
+    df.loc[1, 'Strike'] = 10012.5
+    assert construir_items(df)[1]['id']['S'] == '2024-05-10_2024-06-21_10012.5'
+
+
+def test_cada_dia_de_scrap_tiene_sus_elementos():
+    df = df_volatilidades(2)
+    dos_dias = pd.concat([df, df.assign(Fecha_scrap='2024-05-13')])
+    assert len({item['id']['S'] for item in construir_items(dos_dias)}) == 4
+
+
+def test_reintenta_no_procesados_y_throttles():
+    tabla = TablaFalsa()
+    control = ControlCaudal(espera_base=0.001, espera_max=0.01)
+    informe = escribir_items(tabla, construir_items(df_volatilidades(120)), hilos=3, control=control)
+    assert len(tabla.meta.client.escritos) == 120
+    assert informe['items_escritos'] == 120
+    assert informe['items_fallidos'] == 0
+    assert informe['lotes'] == 5
+    assert informe['throttles'] > 0 and informe['reintentos'] > 0
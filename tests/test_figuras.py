@@ -0,0 +1,36 @@
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+
+from figuras import UMBRAL_WEBGL, aligerar, bytes_figura, trazo_lineas
+
+
+def decodificar(codificado):
+    array = np.frombuffer(base64.b64decode(codificado['bdata']), dtype=codificado['dtype'])
+    if 'shape' in codificado:
+        array = array.reshape([int(n) for n in codificado['shape'].split(',')])
+    return array
+
+
+def test_aligerar_codifica_float32_y_conserva_forma():
+    z = np.random.default_rng(0).uniform(0.1, 0.4, (30, 40))
+    z[0, 0] = np.nan
+    x, y = np.linspace(0, 2, 40), np.linspace(0.8, 1.2, 30)
+    original = go.Figure(go.Surface(x=x, y=y, z=z))
+    ligera = aligerar(go.Figure(go.Surface(x=x, y=y, z=z)))
+
+    traza = ligera['data'][0]
+    assert traza['z']['dtype'] == 'f4' and traza['z']['shape'] == '30, 40'
+    np.testing.assert_allclose(decodificar(traza['z']), z.astype(np.float32))
+    np.testing.assert_allclose(decodificar(traza['x']), x, rtol=1e-6)
+    assert bytes_figura(ligera) < bytes_figura(original) * 0.6
+
+    # Las listas de números también se codifican
+    lista = aligerar(go.Figure(go.Scatter(x=[1.0, 2.0], y=[0.2, 0.3], name='call')))
+    assert lista['data'][0]['y']['dtype'] == 'f4' and lista['data'][0]['name'] == 'call'
+
+
+def test_webgl_solo_con_muchos_puntos():
+    assert isinstance(trazo_lineas(np.arange(10), np.arange(10)), go.Scatter)
+    assert isinstance(trazo_lineas(np.arange(UMBRAL_WEBGL + 1), np.arange(UMBRAL_WEBGL + 1)), go.Scattergl)
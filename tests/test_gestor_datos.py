@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from gestor_datos import DatosCargados, GestorDatos
+
+
+@pytest.fixture
+def respuesta_arrow(respuesta_http):
+    def crear(vol_call, etag):
+        tabla = pa.table({'id': ['a', 'b'], 'Fecha': ['2024-06-21'] * 2, 'Fecha_scrap': ['2024-05-10'] * 2,
+                          'Strike': [10000.0, 10100.0], 'Vol_call': [vol_call, 0.0005], 'Vol_put': [0.2, 0.21]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+        return respuesta_http(200, sink.getvalue().to_pybytes(),
+                              {'content-type': 'application/vnd.apache.arrow.stream', 'ETag': etag})
+    return crear
+
+
+def test_carga_con_etag_y_sustitucion_atomica(respuesta_http, sesion_http, respuesta_arrow):
+    sesion = sesion_http([respuesta_http(503), respuesta_arrow(0.2, '"v1"'), respuesta_http(304),
+                          respuesta_arrow(0.3, '"v2"')])
+    gestor = GestorDatos('http://api/volatilities/', sesion=sesion)
+
+    # La API caída no rompe nada: se sigue sin datos y se guarda el error
+    assert not gestor.actualizar() and not gestor.listo and gestor.error
+
+    assert gestor.actualizar()
+    primeros = gestor.datos
+    assert primeros.version == 1 and primeros.fechas_scrap == ['2024-05-10']
+    assert primeros.df['Vol_call'].isna().tolist() == [False, True]
+
+    # Sin cambios (304) se conservan los mismos datos
+    assert not gestor.actualizar() and gestor.datos is primeros
+    assert sesion.peticiones[2]['If-None-Match'] == '"v1"'
+
+    assert gestor.actualizar()
+    assert gestor.datos.version == 2 and gestor.datos.df['Vol_call'][0] == 0.3
+    assert primeros.df['Vol_call'][0] == 0.2  # la foto anterior no se modifica
+
+
+def test_indice_de_cadenas():
+    df = pd.DataFrame({'Fecha_scrap': ['2024-05-10', '2024-05-09', '2024-05-10', '2024-05-10'],
+                       'Fecha': ['2024-07-19', '2024-06-21', '2024-06-21', '2024-06-21'],
+                       'Strike': [10000.0, 10000.0, 10100.0, 9900.0],
+                       'Vol_call': [0.1, 0.2, 0.3, 0.4], 'Vol_put': [0.5, 0.6, np.nan, 0.8]})
+    datos = DatosCargados(df, 1)
+
+    assert datos.vencimientos == {'2024-05-09': ['2024-06-21'], '2024-05-10': ['2024-06-21', '2024-07-19']}
+    cadena = datos.cadena('2024-05-10', '2024-06-21')
+    assert cadena.strike.tolist() == [9900.0, 10100.0]
+    assert cadena.vol_call.tolist() == [0.4, 0.3] and np.isnan(cadena.vol_put[1])
+    assert cadena.strike.base is not None  # vista, no copia
+    # Sin columnas de griegas en los datos quedan a NaN, una columna por griega
+    assert cadena.griegas_call.shape == (2, 5) and np.isnan(cadena.griegas_put).all()
+    assert datos.cadena('2024-05-11', '2024-06-21').strike.size == 0
+
+
+def test_vistas_de_varios_dias_y_puntos_atm(respuesta_http, sesion_http, respuesta_arrow):
+    df = pd.DataFrame({'Fecha_scrap': ['2024-05-09', '2024-05-10', '2024-05-13', '2024-05-10'],
+                       'Fecha': ['2024-06-21', '2024-06-21', '2024-06-21', '2024-07-19'],
+                       'Strike': [10000.0] * 4, 'Vol_call': [0.1, 0.2, 0.3, 0.4], 'Vol_put': [0.5] * 4})
+    puntos = [{'Fecha_scrap': fs, 'Fecha': f, 'T': t, 'Vol_call': 0.2, 'Vol_put': None}
+              for fs in ['2024-05-10', '2024-05-09'] for f, t in [('2024-07-19', 0.19), ('2024-06-21', 0.11)]]
+    def respuesta_json(datos, etag):
+        return respuesta_http(200, headers={'content-type': 'application/json', 'ETag': etag}, datos=datos)
+    sesion = sesion_http([respuesta_arrow(0.2, '"v1"'), respuesta_json(puntos, '"a1"'),
+                          respuesta_http(304), respuesta_http(304),
+                          respuesta_http(304), respuesta_json(puntos[:2], '"a2"')])
+    gestor = GestorDatos('http://api/volatilities/', sesion=sesion, url_atm='http://api/atm/')
+    assert gestor.actualizar() and gestor.datos.id_datos == '"v1"|"a1"'
+    assert not gestor.actualizar()
+    assert sesion.peticiones[3]['If-None-Match'] == '"a1"'
+    # Solo cambian los puntos ATM: se conservan las volatilidades ya cargadas
+    primeros = gestor.datos
+    assert gestor.actualizar() and gestor.datos.df is primeros.df and len(gestor.datos.atm) == 2
+
+    datos = DatosCargados(df, 1, atm=primeros.atm)
+    cadenas = datos.cadenas_vencimiento('2024-06-21', ['2024-05-13', '2024-05-09', '2024-05-14'])
+    assert list(cadenas) == ['2024-05-09', '2024-05-13'] and cadenas['2024-05-13'].vol_call.tolist() == [0.3]
+    assert list(datos.cadenas_vencimiento('2024-06-21')) == ['2024-05-09', '2024-05-10', '2024-05-13']
+
+    assert datos.atm_scrap('2024-05-10')['T'].tolist() == [0.11, 0.19]
+    historico = datos.atm_vencimiento('2024-06-21')
+    assert historico['Fecha_scrap'].tolist() == ['2024-05-09', '2024-05-10'] and historico['Vol_put'].isna().all()
+    assert datos.atm_vencimiento('2025-01-01').empty
@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Los clientes de boto3 se crean al importar la lambda de volatilidad; no se llega a conectar
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-3')
+
+import lambda_vol_dynamo  # noqa: E402
+from incremental import calcular_huellas, cargar_huellas, filas_cambiadas, guardar_huellas  # noqa: E402
+from iv_vectorizada import volatilidades_cadena  # noqa: E402
+
+
+def cadena():
+    return pd.DataFrame({
+        'Fecha': ['2024-06-21'] * 4,
+        'Fecha_scrap': ['2024-05-10'] * 4,
+        'Strike': [10000, 10500, 11000, 11500],
+        'T': [0.115] * 4,
+        'Precio_call': [1100.0, 700.0, 350.0, 140.0],
+        'Precio_put': [45.0, 120.0, 300.0, 600.0],
+    })
+
+
+def test_solo_cambian_las_filas_modificadas():
+    df = cadena()
+    previas = calcular_huellas(df, 11050.0, 'MiniIbex_35').to_dict()
+
+    df_nuevo = cadena()
+    df_nuevo['Strike'] = df_nuevo['Strike'].astype(float)  # como llega del Parquet
+    df_nuevo.loc[2, 'Precio_put'] = 305.0
+    cambiadas, informe = filas_cambiadas(calcular_huellas(df_nuevo, 11050.0, 'MiniIbex_35'), previas,
+                                         '2024-05-10', '2024-05-10')
+    assert cambiadas.tolist() == [False, False, True, False]
+    assert informe == {'sin_cambios': 3, 'reutilizadas': 3, 'recalculadas': 1, 'fecha_scrap_previa': '2024-05-10',
+                       'alcance': 'mismo_dia'}
+
+    # Si cambia el subyacente se recalcula toda la cadena
+    cambiadas, informe = filas_cambiadas(calcular_huellas(df_nuevo, 11100.0, 'MiniIbex_35'), previas)
+    assert cambiadas.all() and informe['sin_cambios'] == 0
+
+
+def test_un_dia_nuevo_recalcula_toda_la_cadena(s3):
+    df = cadena()
+    guardar_huellas(s3, 'bucket', calcular_huellas(df, 11050.0, 'MiniIbex_35'), '2024-05-10')
+    previas, fecha_previa = cargar_huellas(s3, 'bucket')
+
+    # Mismos precios al día siguiente: la cotización no cambia, pero T sí, y con él la volatilidad implícita
+    df_nuevo = df.assign(Fecha_scrap='2024-05-13', T=0.107)
+    cambiadas, informe = filas_cambiadas(calcular_huellas(df_nuevo, 11050.0, 'MiniIbex_35'), previas,
+                                         '2024-05-13', fecha_previa)
+    assert cambiadas.all() and informe['alcance'] == 'dia_nuevo' and informe['fecha_scrap_previa'] == '2024-05-10'
+    assert informe['sin_cambios'] == 4 and informe['reutilizadas'] == 0
+
+
+def volatilidades_escritas(peticiones, fecha_scrap):
+    items = [peticion['PutRequest']['Item'] for peticion in peticiones]
+    return {item['Strike']['N']: float(item['Vol_call']['N']) for item in items if item['Fecha_scrap']['S'] == fecha_scrap}
+
+
+def test_dos_dias_de_scrap_seguidos(s3, tabla, monkeypatch):
+    monkeypatch.setattr(lambda_vol_dynamo, 'table', tabla)
+    futuros = pd.DataFrame({'Ant': [11050.0]})
+    viernes = cadena()
+    lunes = viernes.assign(Fecha_scrap='2024-05-13', T=39 / 365.25)
+    lunes.loc[2, 'Precio_put'] = 305.0
+
+    lambda_vol_dynamo.calcular_volatilidades(viernes, futuros, s3, 'bucket')
+    resultado = lambda_vol_dynamo.calcular_volatilidades(lunes, futuros, s3, 'bucket')
+
+    # El lunes se escriben todas las filas y las cotizaciones sin cambios parten de la volatilidad del viernes
+    assert resultado['incremental'] == {'sin_cambios': 3, 'reutilizadas': 0, 'recalculadas': 4,
+                                        'fecha_scrap_previa': '2024-05-10', 'alcance': 'dia_nuevo'}
+    assert resultado['escritura']['items_escritos'] == 4
+    assert resultado['solver']['con_volatilidad_previa'] == 8
+
+    # Con el mismo precio y otra T la volatilidad es otra: la del lunes es la de resolver desde cero
+    vol_viernes = volatilidades_escritas(tabla.items, '2024-05-10')
+    vol_lunes = volatilidades_escritas(tabla.items, '2024-05-13')
+    esperadas, _ = volatilidades_cadena(lunes['Precio_call'], lunes['Precio_put'], 11050.0,
+                                        lunes['Strike'], lunes['T'], 0)
+    assert np.allclose([vol_lunes[str(k)] for k in lunes['Strike']], esperadas)
+    assert all(abs(vol_lunes[k] - vol_viernes[k]) > 1e-4 for k in vol_lunes)
+
+    # Repetir el lunes no resuelve ni escribe nada
+    resultado = lambda_vol_dynamo.calcular_volatilidades(lunes, futuros, s3, 'bucket')
+    assert resultado['incremental']['reutilizadas'] == 4 and resultado['escritura']['items_escritos'] == 0
+
+
+def test_sin_filas_que_recalcular():
+    vol_call, vol_put = volatilidades_cadena(np.array([]), np.array([]), 11050.0, np.array([]), np.array([]), 0)
+    assert vol_call.size == 0 and vol_put.size == 0
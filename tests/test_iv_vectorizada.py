@@ -0,0 +1,68 @@
+import numpy as np
+from scipy.optimize import brentq
+from scipy.stats import norm
+
+from iv_vectorizada import implied_volatility_vectorizada, volatilidades_cadena
+
+
+def bs(S, K, T, r, sigma, tipo):
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
+    d2 = d1 - sigma * np.sqrt(T)
+    if tipo == 'call':
+        return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
+    return K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+
+
+def iv_escalar(precio, S, K, T, r, tipo):
+    # Referencia escalar con brentq, el método que usaba antes la lambda
+    if precio <= 0 or T <= 0:
+        return 0
+    try:
+        return brentq(lambda s: bs(S, K, T, r, s, tipo) - precio, 1e-6, 4)
+    except ValueError:
+        return np.nan
+
+
+def test_coincide_con_brentq():
+    rng = np.random.default_rng(0)
+    S = 11000.0
+    K = rng.uniform(8000, 14000, 300)
+    T = rng.uniform(0.01, 2, 300)
+    sigma = rng.uniform(0.05, 0.8, 300)
+    precios_call = np.array([bs(S, k, t, 0, s, 'call') for k, t, s in zip(K, T, sigma)])
+    precios_put = np.array([bs(S, k, t, 0, s, 'put') for k, t, s in zip(K, T, sigma)])
+
+    vol_call, vol_put = volatilidades_cadena(precios_call, precios_put, S, K, T, 0)
+
+    esperado_call = np.array([iv_escalar(p, S, k, t, 0, 'call') for p, k, t in zip(precios_call, K, T)])
+    esperado_put = np.array([iv_escalar(p, S, k, t, 0, 'put') for p, k, t in zip(precios_put, K, T)])
+    np.testing.assert_allclose(vol_call, esperado_call, atol=1e-7, equal_nan=True)
+    np.testing.assert_allclose(vol_put, esperado_put, atol=1e-7, equal_nan=True)
+
+
+def test_convenciones_nan_y_cero():
+    precios = np.array([0.0, -1.0, 50.0, np.nan, 20000.0, 50.0])
+    T = np.array([0.5, 0.5, 0.0, 0.5, 0.5, np.nan])
+    vol = implied_volatility_vectorizada(precios, 11000.0, 11000.0, T, 0, True)
+    assert vol[0] == 0 and vol[1] == 0 and vol[2] == 0
+    # Sin solución en el intervalo o con datos faltantes se devuelve NaN
+    assert np.isnan(vol[3]) and np.isnan(vol[4]) and np.isnan(vol[5])
+
+
+def test_arranque_en_caliente_menos_iteraciones():
+    rng = np.random.default_rng(1)
+    S = 11000.0
+    K = rng.uniform(9000, 13000, 200)
+    T = rng.uniform(0.05, 1.5, 200)
+    sigma = rng.uniform(0.1, 0.5, 200)
+    precios = np.array([bs(S, k, t, 0, s, 'call') for k, t, s in zip(K, T, sigma)])
+
+    vol_frio, it_frio = implied_volatility_vectorizada(precios, S, K, T, 0, True, devolver_iteraciones=True)
+    previa = sigma + rng.normal(0, 0.02, 200)
+    previa[::10] = np.nan  # sin dato previo
+    previa[5] = 50.0  # fuera del intervalo: se resuelve desde cero
+    vol_caliente, it_caliente = implied_volatility_vectorizada(
+        precios, S, K, T, 0, True, sigma0=previa, devolver_iteraciones=True)
+
+    np.testing.assert_allclose(vol_caliente, vol_frio, atol=1e-9, equal_nan=True)
+    assert it_caliente.sum() < it_frio.sum()
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import requests
+
+import scrapping_s3_meff
+from motor_scraping import LimitadorHosts, instrumento, scrapear
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'meff_miniibex35.html')
+
+
+def test_las_paginas_se_descargan_en_paralelo_y_los_errores_no_se_propagan(respuesta_http, sesion_http):
+    instrumentos = [instrumento(s) for s in ['MiniIbex_35', 'Ibex_35', 'SAN', 'BBVA']]
+    sesion = sesion_http({instrumentos[0].url: respuesta_http(200, b'a'), instrumentos[1].url: respuesta_http(503),
+                          instrumentos[2].url: requests.ConnectionError('sin red'),
+                          instrumentos[3].url: respuesta_http(200, b'')}, espera=0.2)
+
+    def procesar(inst, response):
+        if not response.content:
+            raise ValueError('página vacía')
+        return len(response.content)
+
+    inicio = time.perf_counter()
+    resultados = scrapear(instrumentos, procesar, sesion=sesion, limitador=LimitadorHosts(por_host=4, intervalo=0))
+    # El tiempo total es el de una página, no el de las cuatro
+    assert time.perf_counter() - inicio < 0.6 and sesion.max_en_curso == 4
+
+    assert [r.instrumento.subyacente for r in resultados] == ['MiniIbex_35', 'Ibex_35', 'SAN', 'BBVA']
+    assert resultados[0].valor == 1 and resultados[0].error is None
+    assert resultados[1].error == 'HTTP 503' and resultados[1].estado_http == 503
+    assert 'sin red' in resultados[2].error
+    assert resultados[3].error.startswith('ValueError')
+
+
+def test_limite_por_host(respuesta_http, sesion_http):
+    instrumentos = [instrumento(f'I{i}') for i in range(4)]
+    sesion = sesion_http({i.url: respuesta_http(200, b'x') for i in instrumentos}, espera=0.05)
+    inicio = time.perf_counter()
+    scrapear(instrumentos, lambda inst, response: None, sesion=sesion,
+             limitador=LimitadorHosts(por_host=2, intervalo=0.05))
+    assert sesion.max_en_curso <= 2 and time.perf_counter() - inicio >= 0.15
+
+
+def test_lambda_un_snapshot_por_subyacente(monkeypatch, s3, respuesta_http, sesion_http):
+    with open(FIXTURE, 'rb') as f:
+        html = f.read()
+    instrumentos = scrapping_s3_meff.leer_instrumentos('MiniIbex_35, Ibex_35, SAN:FIEM_Santander')
+    assert instrumentos[2].url.endswith('/FIEM_Santander')
+    monkeypatch.setattr(scrapping_s3_meff, 's3_client', s3)
+    monkeypatch.setattr(scrapping_s3_meff, 'sesion', sesion_http(
+        {instrumentos[0].url: respuesta_http(200, html), instrumentos[1].url: respuesta_http(200, html),
+         instrumentos[2].url: respuesta_http(404)}))
+
+    respuesta = scrapping_s3_meff.lambda_handler({'instrumentos': 'MiniIbex_35,Ibex_35,SAN:FIEM_Santander'}, None)
+    assert respuesta['statusCode'] == 207
+    informe = json.loads(respuesta['body'])
+    assert [i['error'] for i in informe['instrumentos']] == [None, None, 'HTTP 404']
+
+    manifiesto = json.loads(s3.objetos[scrapping_s3_meff.MANIFIESTO])
+    assert sorted(manifiesto['subyacentes']) == ['Ibex_35', 'MiniIbex_35']
+    # Formato de los JSON que leen la lambda de volatilidad y /futures/
+    opciones = json.loads(s3.objetos['datos_opciones.json'])
+    assert opciones[0]['Fecha'] == '2024-06-21' and len(opciones[0]['Fecha_scrap']) == 10
+    assert json.loads(s3.objetos['datos_futuros.json'])[0]['Vencimiento'] == 1718928000000
+    assert sum(k.endswith('.parquet') for k in s3.objetos) == 4
+    # datos_opciones.json dispara la lambda de volatilidad, que lee el snapshot del manifiesto
+    assert s3.orden[-1] == 'datos_opciones.json'
+    assert s3.orden.index(scrapping_s3_meff.MANIFIESTO) < s3.orden.index('datos_futuros.json')
+
+
+def test_paginas_sin_cambios_no_se_vuelven_a_subir(monkeypatch, s3, respuesta_http, sesion_http):
+    with open(FIXTURE, 'rb') as f:
+        html = f.read()
+    mini, ibex = scrapping_s3_meff.leer_instrumentos('MiniIbex_35,Ibex_35')
+    monkeypatch.setattr(scrapping_s3_meff, 's3_client', s3)
+    con_etag = respuesta_http(200, html, {'ETag': '"p1"'})
+    sesion = sesion_http({mini.url: con_etag, ibex.url: respuesta_http(200, html)})
+    monkeypatch.setattr(scrapping_s3_meff, 'sesion', sesion)
+    assert json.loads(scrapping_s3_meff.lambda_handler({}, None)['body'])['estado'] == 'actualizado'
+    manifiesto = s3.objetos[scrapping_s3_meff.MANIFIESTO]
+
+    # Segunda ejecución: MEFF contesta 304 a la página con ETag y la otra trae las mismas tablas
+    sesion.respuestas[mini.url] = respuesta_http(304)
+    subidas = dict(s3.objetos)
+    s3.objetos.clear()
+    s3.objetos[scrapping_s3_meff.MANIFIESTO] = manifiesto
+    respuesta = scrapping_s3_meff.lambda_handler({}, None)
+    informe = json.loads(respuesta['body'])
+    assert respuesta['statusCode'] == 200 and informe['estado'] == 'sin_cambios'
+    assert informe['sin_cambios'] == ['MiniIbex_35', 'Ibex_35']
+    assert sesion.cabeceras[mini.url] == {'If-None-Match': '"p1"'} and sesion.cabeceras[ibex.url] == {}
+    assert list(s3.objetos) == [scrapping_s3_meff.MANIFIESTO]
+
+    # Con 'forzar' no se envían cabeceras condicionales y se vuelve a guardar todo
+    s3.objetos.update(subidas)
+    sesion.respuestas[mini.url] = con_etag
+    informe = json.loads(scrapping_s3_meff.lambda_handler({'forzar': True}, None)['body'])
+    assert informe['actualizados'] == ['MiniIbex_35', 'Ibex_35'] and sesion.cabeceras[mini.url] == {}
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+# Los clientes de boto3 se crean al importar la lambda de volatilidad; no se llega a conectar
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-3')
+
+import lambda_pipeline  # noqa: E402
+import lambda_vol_dynamo  # noqa: E402
+import scrapping_s3_meff  # noqa: E402
+from motor_scraping import instrumento  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'meff_miniibex35.html')
+
+
+@pytest.fixture
+def entorno(monkeypatch, s3, tabla, respuesta_http, sesion_http):
+    with open(FIXTURE, 'rb') as f:
+        html = f.read()
+    monkeypatch.setattr(scrapping_s3_meff, 's3_client', s3)
+    monkeypatch.setattr(scrapping_s3_meff, 'sesion', sesion_http({instrumento('MiniIbex_35').url: respuesta_http(200, html)}))
+    monkeypatch.setattr(lambda_vol_dynamo, 's3_client', s3)
+    monkeypatch.setattr(lambda_vol_dynamo, 'table', tabla)
+    monkeypatch.setattr(lambda_vol_dynamo, 'enviar_correo', lambda mensaje: None)
+    return s3, tabla
+
+
+def test_pipeline_unificado_sin_pasar_por_los_json(entorno):
+    s3, tabla = entorno
+    respuesta = lambda_pipeline.lambda_handler({'instrumentos': 'MiniIbex_35'}, None)
+    informe = json.loads(respuesta['body'])
+    assert respuesta['statusCode'] == 200 and informe['estado'] == 'actualizado'
+    assert set(informe['latencia']) == {'modo', 'scraping', 'volatilidades', 'espera_archivo', 'extremo_a_extremo'}
+    assert tabla.items and informe['volatilidades']['escritura']['items_escritos'] == len(tabla.items)
+
+    # Se archiva el snapshot Parquet pero no los JSON que disparan la lambda de volatilidad
+    assert 'datos_opciones.json' not in s3.objetos
+    manifiesto = json.loads(s3.objetos[scrapping_s3_meff.MANIFIESTO])
+    entrada = manifiesto['subyacentes']['MiniIbex_35']
+    assert entrada['opciones'] in s3.objetos and manifiesto['volatilidades']['huella'] == entrada['huella']
+    assert 'estado/puntos_atm.json' in s3.objetos
+
+    # Sin cambios en la página no se escribe nada en DynamoDB
+    escritos = len(tabla.items)
+    informe = json.loads(lambda_pipeline.lambda_handler({'instrumentos': 'MiniIbex_35'}, None)['body'])
+    assert informe['estado'] == 'sin_cambios' and len(tabla.items) == escritos
+
+
+def test_dos_lambdas_la_volatilidad_ve_el_snapshot_nuevo(entorno, monkeypatch):
+    s3, tabla = entorno
+    # Estado de ayer: el manifiesto apunta a un snapshot cuyas volatilidades ya están calculadas
+    s3.objetos[scrapping_s3_meff.MANIFIESTO] = json.dumps({
+        'Fecha_scrap': '2024-05-09', 'subyacentes': {'MiniIbex_35': {'Fecha_scrap': '2024-05-09', 'huella': 'ayer'}},
+        'volatilidades': {'Fecha_scrap': '2024-05-09', 'huella': 'ayer'}})
+
+    # Como la notificación de S3: subir datos_opciones.json ejecuta la lambda de volatilidad
+    respuestas = []
+    put_object = s3.put_object
+
+    def put_con_disparador(Body, Bucket, Key, **kwargs):
+        respuesta = put_object(Body, Bucket, Key, **kwargs)
+        if Key == 'datos_opciones.json':
+            respuestas.append(lambda_vol_dynamo.lambda_handler({}, None))
+        return respuesta
+    monkeypatch.setattr(s3, 'put_object', put_con_disparador)
+
+    assert scrapping_s3_meff.lambda_handler({'instrumentos': 'MiniIbex_35'}, None)['statusCode'] == 200
+    assert len(respuestas) == 1 and respuestas[0]['statusCode'] == 200
+    assert json.loads(respuestas[0]['body']).get('estado') != 'sin_cambios' and tabla.items
+    manifiesto = json.loads(s3.objetos[scrapping_s3_meff.MANIFIESTO])
+    assert manifiesto['volatilidades']['huella'] == manifiesto['subyacentes']['MiniIbex_35']['huella'] != 'ayer'
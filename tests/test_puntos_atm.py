@@ -0,0 +1,25 @@
+import numpy as np
+
+from puntos_atm import calcular_puntos_atm, guardar_puntos_atm
+
+
+def test_volatilidad_atm_interpolada_por_vencimiento():
+    fechas = ['2024-07-19', '2024-06-21', '2024-06-21', '2024-06-21', '2024-07-19']
+    strikes = [10500.0, 10500.0, 10000.0, 10200.0, 10000.0]
+    T = [0.19, 0.11, 0.11, 0.11, 0.19]
+    vol_call = [0.18, 0.16, 0.20, np.nan, 0.22]
+    vol_put = [np.nan, 0.17, 0.21, 0.19, np.nan]
+    puntos = calcular_puntos_atm(fechas, strikes, T, vol_call, vol_put, 10100.0, '2024-05-10')
+
+    assert [p['Fecha'] for p in puntos] == ['2024-06-21', '2024-07-19']
+    junio, julio = puntos
+    # Se ignoran los strikes sin volatilidad: la call de junio se interpola entre 10000 y 10500
+    assert np.isclose(junio['Vol_call'], 0.20 - 0.04 * 100 / 500)
+    assert np.isclose(junio['Vol_put'], 0.20) and junio['T'] == 0.11
+    assert np.isclose(julio['Vol_call'], 0.22 - 0.04 * 100 / 500) and julio['Vol_put'] is None
+
+
+def test_guardar_sustituye_la_fecha_de_scrap(s3):
+    previos = [{'Fecha_scrap': '2024-05-09', 'Fecha': '2024-06-21'}, {'Fecha_scrap': '2024-05-10', 'Fecha': 'viejo'}]
+    todos = guardar_puntos_atm(s3, 'bucket', [{'Fecha_scrap': '2024-05-10', 'Fecha': '2024-06-21'}], previos)
+    assert [(p['Fecha_scrap'], p['Fecha']) for p in todos] == [('2024-05-09', '2024-06-21'), ('2024-05-10', '2024-06-21')]
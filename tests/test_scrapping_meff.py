@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scrapping_s3_meff import (calcular_precio_opcion, calcular_precios_opciones, datos_opciones,
+                               decodificar_numeros, obtener_dataframe, obtener_tablas)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'meff_miniibex35.html')
+
+
+@pytest.fixture
+def response(respuesta_http):
+    with open(FIXTURE, 'rb') as f:
+        return respuesta_http(200, f.read())
+
+
+def test_obtener_tablas_coincide_con_obtener_dataframe(response):
+    tablas = obtener_tablas(response)
+    for tipo in ['opciones', 'futuros']:
+        assert tablas[tipo].equals(obtener_dataframe(response, tipo))
+    assert tablas['opciones'][0].str.startswith(('OCE', 'OPE')).all()
+
+
+def test_obtener_tablas_error_http(respuesta_http):
+    tablas = obtener_tablas(respuesta_http(503))
+    assert tablas['opciones'].empty and tablas['futuros'].empty
+
+
+def test_precios_vectorizados_identicos_a_calcular_precio_opcion(response):
+    df = datos_opciones('opciones', response)
+    for tipo in ['call', 'put']:
+        esperado = df.apply(lambda row: calcular_precio_opcion(row, tipo), axis=1).to_numpy(dtype=float)
+        obtenido = calcular_precios_opciones(df, tipo).to_numpy()
+        assert np.array_equal(esperado, obtenido, equal_nan=True)
+
+
+def test_decodificar_numeros():
+    serie = pd.Series(['10.250,50', '0,35', '-', '', '1.234'])
+    resultado = decodificar_numeros(serie)
+    assert resultado.iloc[0] == 10250.5 and resultado.iloc[1] == 0.35 and resultado.iloc[4] == 1234
+    assert resultado.iloc[2:4].isna().all()
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+from pyarrow import fs
+
+from lectura_snapshots import leer_historico
+from scrapping_s3_meff import a_parquet, clave_snapshot
+
+
+def guardar(raiz, df, tipo, subyacente, fecha):
+    ruta = os.path.join(raiz, clave_snapshot(tipo, subyacente, fecha))
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as f:
+        f.write(a_parquet(df))
+
+
+def test_historico_lee_solo_columnas_y_particiones(tmp_path):
+    for i, fecha in enumerate(['2024-05-08', '2024-05-09', '2024-05-10']):
+        for subyacente in ['MiniIbex_35', 'Ibex_35']:
+            df = pd.DataFrame({'Fecha': ['2024-06-21'] * 2, 'Strike': [10000.0, 10100.0],
+                               'T': [0.1, 0.1], 'Precio_call': [100.0 + i, 50.0], 'Precio_put': [20.0, 40.0],
+                               'Fecha_scrap': fecha})
+            guardar(str(tmp_path), df, 'opciones', subyacente, fecha)
+
+    df = leer_historico(str(tmp_path), 'opciones', columnas=['Strike', 'Precio_call', 'Fecha_scrap'],
+                        fechas_scrap=['2024-05-09', '2024-05-10'], subyacentes='MiniIbex_35',
+                        filesystem=fs.LocalFileSystem())
+
+    assert list(df.columns) == ['Strike', 'Precio_call', 'Fecha_scrap']
+    assert len(df) == 4
+    assert sorted(df['Fecha_scrap'].unique()) == ['2024-05-09', '2024-05-10']
+    assert sorted(df['Precio_call']) == [50.0, 50.0, 101.0, 102.0]
+
+
+def test_snapshot_sin_cambios():
+    from lectura_snapshots import snapshot_sin_cambios
+    manifiesto = {'subyacentes': {'MiniIbex_35': {'Fecha_scrap': '2024-05-10', 'huella': 'abc'}},
+                  'volatilidades': {'Fecha_scrap': '2024-05-10', 'huella': 'abc'}}
+    assert snapshot_sin_cambios(manifiesto, 'MiniIbex_35') == (True, 'abc')
+    manifiesto['subyacentes']['MiniIbex_35']['huella'] = 'def'
+    assert snapshot_sin_cambios(manifiesto, 'MiniIbex_35') == (False, 'def')
+    # Sin huella (manifiestos antiguos) siempre se recalcula
+    assert snapshot_sin_cambios({'subyacentes': {}, 'volatilidades': {'huella': None}}, 'MiniIbex_35') == (False, None)
+    assert snapshot_sin_cambios(None, 'MiniIbex_35') == (False, None)
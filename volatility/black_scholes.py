@@ -0,0 +1,81 @@
+import numpy as np
+
+
+### Black-Scholes vectorizado
+# Precio y griegas de toda una cadena a partir de los mismos d1/d2. Las lambdas
+# (volatilidad y pipeline unificado) guardan las griegas en DynamoDB junto a
+# Vol_call/Vol_put. La API (formatos.py) y la aplicación Dash (gestor_datos.py)
+# importan este módulo para las columnas de GRIEGAS, y las leen de DynamoDB sin
+# volver a calcularlas. Solo depende de numpy al importarse: scipy.special se
+# importa en la primera llamada, para no alargar el arranque de las lambdas
+# cuando no hay nada que calcular (snapshot sin cambios) ni cargar scipy en Dash.
+
+GRIEGAS = ['Delta', 'Gamma', 'Vega', 'Theta', 'Vanna']
+
+
+def _terminos(S, K, T, r, sigma):
+    """Términos comunes a precio y griegas: d1, d2, √T, densidad en d1 y strike descontado."""
+    raiz_t = np.sqrt(T)
+    sigma_raiz_t = sigma * raiz_t
+    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / sigma_raiz_t
+    d2 = d1 - sigma_raiz_t
+    densidad_d1 = np.exp(-0.5 * d1**2) / np.sqrt(2 * np.pi)
+    k_desc = K * np.exp(-r * T)
+    return d1, d2, raiz_t, densidad_d1, k_desc
+
+
+def precio_vega_volga(S, K, T, r, sigma, es_call):
+    """
+    Precio, vega y volga (derivada segunda respecto a sigma) para el solver de volatilidad.
+    Args:
+    - S, K, T, r, sigma: Arrays (o escalares) de subyacente, strike, vencimiento, tipo y volatilidad.
+    - es_call: True para calls y False para puts.
+    Returns:
+    - Tupla (precio, vega, volga) de arrays.
+    """
+    from scipy.special import ndtr
+
+    d1, d2, raiz_t, densidad_d1, k_desc = _terminos(S, K, T, r, sigma)
+    precio_call = S * ndtr(d1) - k_desc * ndtr(d2)
+    # Paridad put-call: P = C - S + K·e^(-rT)
+    precio = np.where(es_call, precio_call, precio_call - S + k_desc)
+    vega = S * densidad_d1 * raiz_t
+    volga = vega * d1 * d2 / sigma
+    return precio, vega, volga
+
+
+def precio_y_griegas(S, K, T, r, sigma, es_call):
+    """
+    Calcula en una sola pasada el precio y las griegas de primer y segundo orden.
+    Las opciones con sigma o T no positivos o sin volatilidad (NaN) devuelven NaN.
+    Args:
+    - S, K, T, r, sigma: Arrays (o escalares) de subyacente, strike, vencimiento, tipo y volatilidad.
+    - es_call: True para calls y False para puts.
+    Returns:
+    - Diccionario con los arrays 'Precio', 'Delta', 'Gamma', 'Vega', 'Theta', 'Vanna' y 'Volga'.
+      Theta es anual y Vega y Vanna son por unidad de volatilidad.
+    """
+    from scipy.special import ndtr
+
+    S, K, T, r, sigma, es_call = np.broadcast_arrays(
+        np.asarray(S, dtype=float), np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(sigma, dtype=float), np.asarray(es_call, dtype=bool))
+
+    with np.errstate(all='ignore'):
+        validos = (sigma > 0) & (T > 0)
+        sigma = np.where(validos, sigma, np.nan)
+        d1, d2, raiz_t, densidad_d1, k_desc = _terminos(S, K, T, r, sigma)
+        n_d1, n_d2 = ndtr(d1), ndtr(d2)
+
+        precio_call = S * n_d1 - k_desc * n_d2
+        vega = S * densidad_d1 * raiz_t
+        theta_comun = -S * densidad_d1 * sigma / (2 * raiz_t)
+        return {
+            'Precio': np.where(es_call, precio_call, precio_call - S + k_desc),
+            'Delta': np.where(es_call, n_d1, n_d1 - 1),
+            'Gamma': densidad_d1 / (S * sigma * raiz_t),
+            'Vega': vega,
+            'Theta': np.where(es_call, theta_comun - r * k_desc * n_d2, theta_comun + r * k_desc * (1 - n_d2)),
+            'Vanna': -densidad_d1 * d2 / sigma,
+            'Volga': vega * d1 * d2 / sigma,
+        }
@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+
+### Volatilidades previas para el arranque en caliente del solver
+# Se guarda la última volatilidad de cada (Fecha, Strike) para calls y puts en
+# S3 y en /tmp, que se conserva entre invocaciones de una misma instancia de
+# Lambda. Las filas que no se recalculan toman de aquí su volatilidad para los
+# puntos ATM, así que la copia local tiene que coincidir con la de S3: se guarda
+# con el ETag del objeto y se lee de S3 con IfNoneMatch. Si S3 contesta 304 se usa
+# la copia local; si otra instancia (o el pipeline unificado) ha actualizado el
+# estado, S3 devuelve la versión nueva y se sustituye la local.
+
+CLAVE_VOLATILIDADES = 'estado/volatilidades_previas.json'
+# Se puede cambiar con RUTA_VOLATILIDADES_PREVIAS (p. ej. ejecutar_local.py la deja en su directorio)
+RUTA_LOCAL = os.environ.get('RUTA_VOLATILIDADES_PREVIAS', os.path.join('/tmp', 'volatilidades_previas.json'))
+
+
+def _leer_local(ruta_local):
+    """Copia local {'ETag', 'volatilidades'}, o None si no existe o no tiene ETag (formato anterior)."""
+    try:
+        with open(ruta_local) as f:
+            local = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return local if isinstance(local, dict) and local.get('ETag') and 'volatilidades' in local else None
+
+
+def _guardar_local(ruta_local, etag, previas):
+    if not etag:
+        return
+    temporal = f'{ruta_local}.tmp'
+    with open(temporal, 'w') as f:
+        json.dump({'ETag': etag, 'volatilidades': previas}, f)
+    os.replace(temporal, ruta_local)
+
+
+def cargar_volatilidades_previas(s3_client, bucket, ruta_local=None):
+    """
+    Devuelve un diccionario {id: [vol_call, vol_put]} con las últimas volatilidades.
+    Se usa la copia local solo si S3 confirma (304) que sigue siendo la última; si no, la de S3
+    ({} si no hay ninguna).
+    """
+    ruta_local = ruta_local or RUTA_LOCAL
+    local = _leer_local(ruta_local)
+    condicion = {'IfNoneMatch': local['ETag']} if local else {}
+    try:
+        respuesta = s3_client.get_object(Bucket=bucket, Key=CLAVE_VOLATILIDADES, **condicion)
+    except s3_client.exceptions.NoSuchKey:
+        return {}
+    except ClientError as e:
+        if local and e.response.get('Error', {}).get('Code') in ('304', 'NotModified'):
+            return local['volatilidades']
+        raise
+    previas = json.loads(respuesta['Body'].read())
+    _guardar_local(ruta_local, respuesta.get('ETag'), previas)
+    return previas
+
+
+def buscar_volatilidades_previas(ids, previas):
+    """
+    Busca las volatilidades previas de cada id.
+    Returns:
+    - Tupla (vol_call, vol_put) de arrays con NaN donde no hay dato previo.
+    """
+    vacio = [np.nan, np.nan]
+    valores = np.array([previas.get(i, vacio) for i in ids], dtype=float).reshape(-1, 2)
+    return valores[:, 0], valores[:, 1]
+
+
+def guardar_volatilidades_previas(s3_client, bucket, ids, vol_call, vol_put, previas, ruta_local=None):
+    """Actualiza las volatilidades previas con las nuevas y las guarda en S3 y en la caché local."""
+    # json no admite NaN: se guardan como null y se leen de vuelta como NaN
+    nuevas = {i: [None if np.isnan(c) else float(c), None if np.isnan(p) else float(p)]
+              for i, c, p in zip(ids, vol_call, vol_put)}
+    previas = {**previas, **nuevas}
+    respuesta = s3_client.put_object(Body=json.dumps(previas), Bucket=bucket, Key=CLAVE_VOLATILIDADES)
+    _guardar_local(ruta_local or RUTA_LOCAL, (respuesta or {}).get('ETag'), previas)
+    return previas
@@ -13,11 +13,27 @@ def create_dynamodb_table():
                 {'AttributeName': 'id', 'KeyType': 'HASH'}  # Clave primaria
             ],
             AttributeDefinitions=[
-                {'AttributeName': 'id', 'AttributeType': 'S'}  # S significa String
+                {'AttributeName': 'id', 'AttributeType': 'S'},  # S significa String
+                {'AttributeName': 'Fecha_scrap', 'AttributeType': 'S'},
+                {'AttributeName': 'Fecha', 'AttributeType': 'S'}
             ],
+            # Índice para consultar por fecha de scrap y vencimiento sin recorrer la tabla
+            GlobalSecondaryIndexes=[{
+                'IndexName': 'fecha_scrap-index',
+                'KeySchema': [
+                    {'AttributeName': 'Fecha_scrap', 'KeyType': 'HASH'},
+                    {'AttributeName': 'Fecha', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'},
+                'ProvisionedThroughput': {'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+            }],
             ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
         )
         table.wait_until_exists()
+        # Los elementos de cada día de scrap se borran por TTL (escritura_dynamodb.RETENCION_DIAS)
+        dynamodb.meta.client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expira'})
         print("Tabla creada exitosamente.")
     except ClientError as e:
         if e.response['Error']['Code'] == 'ResourceInUseException':
@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+
+### Escritura por lotes en DynamoDB
+# BatchWriteItem admite como máximo 25 elementos por petición. Se escriben
+# varios lotes en paralelo y se reenvían los UnprocessedItems con espera
+# exponencial. El ritmo se adapta a la capacidad de la tabla: cada throttle
+# aumenta la pausa entre peticiones y cada lote sin incidencias la reduce.
+
+TAM_LOTE = 25
+HILOS = 4
+MAX_REINTENTOS = 8
+ESPERA_BASE = 0.05
+ESPERA_MAX = 5.0
+ERRORES_THROTTLE = ('ProvisionedThroughputExceededException', 'ThrottlingException',
+                    'RequestLimitExceeded')
+
+# La clave de cada elemento incluye la fecha de scrap, así que la tabla guarda un histórico
+# de cadenas; DynamoDB borra por TTL los elementos con más de RETENCION_DIAS días.
+RETENCION_DIAS = 30
+ATRIBUTO_TTL = 'expira'
+
+
+def _numero(serie):
+    """Convierte una serie numérica al formato {'N': str} de DynamoDB, o NULL si es NaN."""
+    texto = serie.astype(float).astype(str)
+    return [{'NULL': True} if nulo else {'N': valor}
+            for nulo, valor in zip(serie.isna().to_numpy(), texto.to_numpy())]
+
+
+def construir_ids(df):
+    """
+    Construye el id de cada fila ('<Fecha>_<Strike>') de forma vectorizada.
+    El strike entero se escribe sin decimales ('10250' y no '10250.0') para que el id
+    no dependa de si los datos llegan del JSON (enteros) o del Parquet (float).
+    """
+    strike = df['Strike'].astype(float)
+    strike_texto = strike.astype(str).where(strike % 1 != 0, strike.astype('int64').astype(str))
+    return df['Fecha'].astype(str) + '_' + strike_texto
+
+
+def construir_claves(df):
+    """
+    Construye la clave de DynamoDB de cada fila ('<Fecha_scrap>_<Fecha>_<Strike>').
+    A diferencia de construir_ids (que identifica la opción entre días para el arranque en
+    caliente y el modo incremental), cada día de scrap tiene sus propios elementos.
+    """
+    return df['Fecha_scrap'].astype(str) + '_' + construir_ids(df)
+
+
+def construir_expiracion(df, retencion_dias=RETENCION_DIAS):
+    """Instante (segundos Unix) en que DynamoDB puede borrar cada fila por TTL."""
+    expira = pd.to_datetime(df['Fecha_scrap'].astype(str)) + pd.Timedelta(days=retencion_dias)
+    return (expira - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)
+
+
+def construir_items(df, retencion_dias=RETENCION_DIAS):
+    """
+    Construye los elementos de DynamoDB (formato del cliente de bajo nivel) de
+    forma vectorizada a partir del DataFrame de volatilidades.
+    Args:
+    - df (DataFrame): Con las columnas 'Fecha', 'Fecha_scrap' y 'Strike' y las columnas
+      numéricas a guardar ('Vol_call', 'Vol_put', griegas...).
+    - retencion_dias (int): Días desde la fecha de scrap que se conserva cada elemento.
+    Returns:
+    - Lista de diccionarios listos para un PutRequest.
+    """
+    if df.empty:
+        return []
+    claves = construir_claves(df)
+    columnas = {
+        'id': [{'S': x} for x in claves.to_numpy()],
+        'Fecha': [{'S': x} for x in df['Fecha'].astype(str).to_numpy()],
+        'Strike': [{'N': str(x)} for x in df['Strike'].astype('int64').to_numpy()],
+        'Fecha_scrap': [{'S': x} for x in df['Fecha_scrap'].astype(str).to_numpy()],
+        ATRIBUTO_TTL: [{'N': str(x)} for x in construir_expiracion(df, retencion_dias).to_numpy()],
+    }
+    # El resto de columnas (volatilidades y griegas) son numéricas
+    for columna in df.columns.difference(list(columnas), sort=False):
+        columnas[columna] = _numero(df[columna])
+    items = [dict(zip(columnas, fila)) for fila in zip(*columnas.values())]
+
+    # BatchWriteItem rechaza claves repetidas en un lote; como con put_item, gana la última
+    return list({item['id']['S']: item for item in items}.values())
+
+
+class ControlCaudal:
+    """Pausa compartida entre hilos que crece con los throttles y decrece con los éxitos."""
+
+    def __init__(self, espera_base=ESPERA_BASE, espera_max=ESPERA_MAX):
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.pausa = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        with self._lock:
+            pausa = self.pausa
+        if pausa > 0:
+            time.sleep(pausa)
+
+    def throttle(self):
+        with self._lock:
+            self.pausa = min(self.espera_max, max(self.espera_base, self.pausa * 2))
+
+    def exito(self):
+        with self._lock:
+            self.pausa = self.pausa / 2 if self.pausa > self.espera_base else 0.0
+
+
+class _Informe:
+    """Contadores de la escritura, protegidos para poder sumarlos desde varios hilos."""
+
+    def __init__(self):
+        self.datos = {'items_escritos': 0, 'lotes': 0, 'reintentos': 0, 'throttles': 0,
+                      'items_fallidos': 0, 'errores': []}
+        self._lock = threading.Lock()
+
+    def sumar(self, clave, valor=1):
+        with self._lock:
+            if clave == 'errores':
+                self.datos[clave].append(valor)
+            else:
+                self.datos[clave] += valor
+
+
+def _escribir_lote(client, nombre_tabla, lote, control, informe, max_reintentos):
+    pendientes = [{'PutRequest': {'Item': item}} for item in lote]
+    for intento in range(max_reintentos + 1):
+        control.esperar()
+        try:
+            respuesta = client.batch_write_item(RequestItems={nombre_tabla: pendientes})
+        except ClientError as e:
+            codigo = e.response.get('Error', {}).get('Code')
+            if codigo not in ERRORES_THROTTLE:
+                informe.sumar('items_fallidos', len(pendientes))
+                informe.sumar('errores', str(e))
+                return
+            informe.sumar('throttles')
+            control.throttle()
+        else:
+            no_procesados = respuesta.get('UnprocessedItems', {}).get(nombre_tabla, [])
+            informe.sumar('items_escritos', len(pendientes) - len(no_procesados))
+            if not no_procesados:
+                control.exito()
+                return
+            # Los UnprocessedItems indican que la tabla no tiene capacidad suficiente
+            informe.sumar('throttles')
+            control.throttle()
+            pendientes = no_procesados
+
+        if intento < max_reintentos:
+            informe.sumar('reintentos')
+            espera = min(ESPERA_MAX, control.espera_base * 2 ** intento)
+            time.sleep(espera * random.uniform(0.5, 1))
+
+    informe.sumar('items_fallidos', len(pendientes))
+    informe.sumar('errores', f'{len(pendientes)} elementos sin procesar tras {max_reintentos} reintentos')
+
+
+def escribir_items(table, items, tam_lote=TAM_LOTE, hilos=HILOS, max_reintentos=MAX_REINTENTOS,
+                   control=None):
+    """
+    Escribe los elementos en la tabla mediante BatchWriteItem en paralelo.
+    Args:
+    - table: Recurso Table de boto3 (se usa su cliente de bajo nivel).
+    - items (list): Elementos en el formato de construir_items.
+    - tam_lote (int): Elementos por petición (máximo 25).
+    - hilos (int): Número de lotes que se escriben a la vez.
+    - max_reintentos (int): Reintentos por lote ante throttles o UnprocessedItems.
+    Returns:
+    - Diccionario con el informe de escritura.
+    """
+    inicio = time.perf_counter()
+    control = control or ControlCaudal()
+    informe = _Informe()
+    client = table.meta.client
+    tam_lote = min(tam_lote, TAM_LOTE)
+    lotes = [items[i:i + tam_lote] for i in range(0, len(items), tam_lote)]
+    informe.sumar('lotes', len(lotes))
+
+    with ThreadPoolExecutor(max_workers=max(1, hilos)) as executor:
+        futuros = [executor.submit(_escribir_lote, client, table.name, lote, control, informe, max_reintentos)
+                   for lote in lotes]
+        for futuro in futuros:
+            futuro.result()
+
+    datos = informe.datos
+    datos['segundos'] = round(time.perf_counter() - inicio, 3)
+    return datos
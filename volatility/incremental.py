@@ -0,0 +1,90 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from escritura_dynamodb import construir_ids
+
+
+### Recalculo incremental de volatilidades
+# Cada fila de la cadena se resume en una huella (hash de 64 bits) de su cotización:
+# Fecha, Strike, precios, subyacente y su precio. T y la fecha de scrap no entran,
+# así que la huella de una cotización que no se mueve es la misma de un día a otro.
+# Qué se aprovecha de las filas con la misma huella:
+# - Mismo día de scrap (reintentos, ejecuciones con 'forzar' o un snapshot corregido):
+#   T es la misma, así que no se resuelven ni se escriben en DynamoDB.
+# - Día nuevo: hay que resolverlas igualmente, porque T cambia y con él la volatilidad
+#   implícita de un mismo precio, y escribirlas, porque cada día de scrap tiene sus
+#   propios elementos en DynamoDB (escritura_dynamodb.construir_claves). Lo único que
+#   se ahorra es trabajo del solver: parten de la volatilidad de ayer
+#   (cache_volatilidades), que con el mismo precio y un día menos está muy cerca.
+# El informe separa las cotizaciones sin cambios ('sin_cambios') de las filas que
+# realmente no se recalculan ('reutilizadas'), que en un día nuevo son siempre 0.
+
+CLAVE_HUELLAS = 'estado/huellas_volatilidad.json'
+COLUMNAS_HUELLA = ['Fecha', 'Strike', 'Precio_call', 'Precio_put']
+
+
+def calcular_huellas(df, precio_subyacente, subyacente):
+    """
+    Calcula la huella de cada fila de opciones.
+    Args:
+    - df (DataFrame): Opciones con las columnas de COLUMNAS_HUELLA.
+    - precio_subyacente (float): Precio del subyacente usado en el cálculo.
+    - subyacente (str): Nombre del subyacente.
+    Returns:
+    - Serie de huellas (str) indexada por el id de DynamoDB de cada fila.
+    """
+    datos = df[COLUMNAS_HUELLA].copy()
+    # Tipos normalizados para que la huella no dependa de si los datos vienen del JSON o del Parquet
+    datos['Fecha'] = datos['Fecha'].astype(str)
+    for columna in ['Strike', 'Precio_call', 'Precio_put']:
+        datos[columna] = datos[columna].astype(float)
+    datos['precio_subyacente'] = float(precio_subyacente)
+    datos['subyacente'] = subyacente
+    huellas = pd.util.hash_pandas_object(datos, index=False).astype(str)
+    return pd.Series(huellas.to_numpy(), index=construir_ids(df).to_numpy())
+
+
+def cargar_huellas(s3_client, bucket):
+    """
+    Devuelve las huellas guardadas en la última ejecución correcta.
+    Returns:
+    - Tupla (huellas {id: huella}, Fecha_scrap con la que se calcularon o None); ({}, None) si no hay.
+    """
+    try:
+        respuesta = s3_client.get_object(Bucket=bucket, Key=CLAVE_HUELLAS)
+    except s3_client.exceptions.NoSuchKey:
+        return {}, None
+    estado = json.loads(respuesta['Body'].read())
+    if 'huellas' not in estado:
+        return estado, None  # Formato anterior: solo las huellas
+    return estado['huellas'], estado.get('Fecha_scrap')
+
+
+def guardar_huellas(s3_client, bucket, huellas, fecha_scrap=None):
+    """Guarda las huellas de la ejecución actual junto con su fecha de scrap."""
+    estado = {'Fecha_scrap': fecha_scrap, 'huellas': huellas.to_dict()}
+    s3_client.put_object(Body=json.dumps(estado), Bucket=bucket, Key=CLAVE_HUELLAS)
+
+
+def filas_cambiadas(huellas, huellas_previas, fecha_scrap=None, fecha_scrap_previa=None):
+    """
+    Decide qué filas hay que recalcular comparando las huellas actuales con las previas.
+    Args:
+    - huellas (Serie): Huellas actuales indexadas por id.
+    - huellas_previas (dict): Huellas de la ejecución anterior.
+    - fecha_scrap, fecha_scrap_previa (str): Fechas de scrap de las dos ejecuciones.
+    Returns:
+    - Tupla (máscara numpy de filas a recalcular, informe con cotizaciones sin cambios,
+      filas reutilizadas, filas recalculadas y alcance).
+    """
+    previas = pd.Series(huellas_previas, dtype=object).reindex(huellas.index)
+    sin_cambios = (previas == huellas).to_numpy()
+    mismo_dia = fecha_scrap is not None and fecha_scrap == fecha_scrap_previa
+    # En un día nuevo se recalculan todas (ver el comentario del módulo)
+    recalcular = ~sin_cambios if mismo_dia else np.ones(len(huellas), dtype=bool)
+    informe = {'sin_cambios': int(sin_cambios.sum()), 'reutilizadas': int((~recalcular).sum()),
+               'recalculadas': int(recalcular.sum()), 'fecha_scrap_previa': fecha_scrap_previa,
+               'alcance': 'mismo_dia' if mismo_dia else 'dia_nuevo'}
+    return recalcular, informe
@@ -0,0 +1,167 @@
+import numpy as np
+
+from black_scholes import precio_vega_volga
+
+
+### Volatilidad implícita vectorizada
+# Resuelve toda la cadena de opciones a la vez con arrays de NumPy en lugar de
+# llamar a brentq fila a fila. Se usa una iteración de Halley protegida por un
+# intervalo [sigma_min, sigma_max] que se va estrechando en cada paso, de modo
+# que si el paso se sale del intervalo se hace bisección.
+
+SIGMA_MIN = 1e-6
+SIGMA_MAX = 4
+XTOL = 1e-12
+MAX_ITER = 100
+MAX_ITER_ARRANQUE = 8
+
+
+def _estimacion_inicial(precio, S, K, T, r):
+    """
+    Punto de partida de Manaster-Koehler (máximo de la vega), que garantiza la
+    convergencia monótona de Newton. Cerca del dinero, donde vale ~0, se usa la
+    aproximación de Brenner-Subrahmanyam.
+    """
+    mk = np.sqrt(np.abs(2 * (np.log(S / K) + r * T) / T))
+    bs = np.sqrt(2 * np.pi / T) * precio / S
+    return np.where(mk < 0.05, bs, mk)
+
+
+def _paso_halley(precio, S, K, T, r, sigma, es_call):
+    """Devuelve el error de precio, el paso de Halley (Newton si el denominador se degenera) y la vega."""
+    p, vega, volga = precio_vega_volga(S, K, T, r, sigma, es_call)
+    f = p - precio
+    newton = -f / vega
+    denominador = 1 + 0.5 * newton * volga / vega
+    return f, np.where(denominador > 0.5, newton / denominador, newton), vega
+
+
+def implied_volatility_vectorizada(option_price, S, K, T, r, es_call, sigma0=None,
+                                   sigma_min=SIGMA_MIN, sigma_max=SIGMA_MAX,
+                                   xtol=XTOL, max_iter=MAX_ITER, max_iter_arranque=MAX_ITER_ARRANQUE,
+                                   devolver_iteraciones=False):
+    """
+    Calcula la volatilidad implícita de un vector de opciones.
+    Mantiene las convenciones de implied_volatility: 0 si el precio o T son
+    menores o iguales que 0 y NaN si no hay solución en [sigma_min, sigma_max].
+    Args:
+    - option_price: Precios de mercado de las opciones.
+    - S: Precio del activo subyacente (escalar o array).
+    - K: Precios de ejercicio.
+    - T: Tiempos hasta el vencimiento.
+    - r: Tasa de interés libre de riesgo (escalar o array).
+    - es_call: True para las calls y False para las puts (escalar o array).
+    - sigma0: Volatilidades previas usadas como punto de partida (NaN si no hay).
+      Las opciones que no convergen desde ahí se resuelven con el intervalo completo.
+    - devolver_iteraciones: Si es True se devuelven también las iteraciones de cada opción.
+    Returns:
+    - Array con las volatilidades implícitas, o tupla (volatilidades, iteraciones).
+    """
+    precio, S, K, T, r, es_call, sigma0 = np.broadcast_arrays(
+        np.asarray(option_price, dtype=float), np.asarray(S, dtype=float),
+        np.asarray(K, dtype=float), np.asarray(T, dtype=float),
+        np.asarray(r, dtype=float), np.asarray(es_call, dtype=bool),
+        np.asarray(np.nan if sigma0 is None else sigma0, dtype=float))
+    precio, S, K, T, r, es_call, sigma0 = (np.ravel(x) for x in (precio, S, K, T, r, es_call, sigma0))
+    vol = np.full(precio.shape, np.nan)
+    iteraciones = np.zeros(precio.shape, dtype=int)
+
+    with np.errstate(all='ignore'):
+        ceros = (precio <= 0) | (T <= 0)
+        vol[ceros] = 0
+        validos = ~ceros & np.isfinite(precio) & np.isfinite(T)
+
+        # Arranque en caliente: Halley sin intervalo desde la volatilidad previa
+        idx = np.flatnonzero(validos & (sigma0 > sigma_min) & (sigma0 < sigma_max))
+        sigma = sigma0[idx]
+        for _ in range(max_iter_arranque):
+            if idx.size == 0:
+                break
+            iteraciones[idx] += 1
+            f, paso, vega = _paso_halley(precio[idx], S[idx], K[idx], T[idx], r[idx], sigma, es_call[idx])
+            nuevo = sigma + paso
+            # Si el precio apenas depende de sigma (vega casi nula) la raíz no está bien
+            # determinada en coma flotante y se deja al método con intervalo, como brentq
+            sensible = vega * xtol > 4 * np.finfo(float).eps * S[idx]
+            convergido = sensible & ((f == 0) | (np.abs(paso) < xtol))
+            convergido &= (nuevo >= sigma_min) & (nuevo <= sigma_max)
+            vol[idx[convergido]] = np.where(f == 0, sigma, nuevo)[convergido]
+
+            # Se abandona el arranque si el paso no es finito o sale de [sigma_min, sigma_max]
+            sigue = ~convergido & sensible & np.isfinite(nuevo) & (nuevo > sigma_min) & (nuevo < sigma_max)
+            idx, sigma = idx[sigue], nuevo[sigue]
+
+        # Comprobación del intervalo inicial, igual que hace brentq
+        idx = np.flatnonzero(validos & np.isnan(vol))
+        lo = np.full(idx.size, float(sigma_min))
+        hi = np.full(idx.size, float(sigma_max))
+        args = (S[idx], K[idx], T[idx], r[idx])
+        f_lo = precio_vega_volga(*args, lo, es_call[idx])[0] - precio[idx]
+        f_hi = precio_vega_volga(*args, hi, es_call[idx])[0] - precio[idx]
+        vol[idx[f_lo == 0]] = sigma_min
+        vol[idx[(f_hi == 0) & (f_lo != 0)]] = sigma_max
+        activos = (f_lo * f_hi) < 0  # False también si hay NaN
+
+        idx, lo, hi = idx[activos], lo[activos], hi[activos]
+        sigma = np.clip(_estimacion_inicial(precio[idx], S[idx], K[idx], T[idx], r[idx]), lo, hi)
+        sigma = np.where(np.isfinite(sigma), sigma, 0.5 * (lo + hi))
+
+        for _ in range(max_iter):
+            if idx.size == 0:
+                break
+            iteraciones[idx] += 1
+            f, paso, _ = _paso_halley(precio[idx], S[idx], K[idx], T[idx], r[idx], sigma, es_call[idx])
+
+            # El precio es creciente en sigma: se estrecha el intervalo
+            lo = np.where(f < 0, sigma, lo)
+            hi = np.where(f > 0, sigma, hi)
+            nuevo = sigma + paso
+
+            # Bisección si el paso no es finito o sale del intervalo
+            biseccion = ~np.isfinite(nuevo) | (nuevo <= lo) | (nuevo >= hi)
+            nuevo = np.where(biseccion, 0.5 * (lo + hi), nuevo)
+
+            convergido = (f == 0) | (np.abs(nuevo - sigma) < xtol) | ((hi - lo) < xtol)
+            vol[idx[convergido]] = np.where(f == 0, sigma, nuevo)[convergido]
+
+            pendientes = ~convergido
+            idx, lo, hi, sigma = idx[pendientes], lo[pendientes], hi[pendientes], nuevo[pendientes]
+
+    if devolver_iteraciones:
+        return vol, iteraciones
+    return vol
+
+
+def volatilidades_cadena(precio_call, precio_put, S, K, T, r, vol_previa_call=None, vol_previa_put=None,
+                         devolver_iteraciones=False, **kwargs):
+    """
+    Calcula en una sola resolución las volatilidades de calls y puts de una cadena.
+    Args:
+    - precio_call, precio_put: Precios de mercado de calls y puts (mismo tamaño que K).
+    - S: Precio del activo subyacente.
+    - K: Precios de ejercicio.
+    - T: Tiempos hasta el vencimiento.
+    - r: Tasa de interés libre de riesgo.
+    - vol_previa_call, vol_previa_put: Volatilidades previas para el arranque en caliente (opcional).
+    - devolver_iteraciones: Si es True se devuelven también las iteraciones de calls y puts.
+    Returns:
+    - Tupla (vol_call, vol_put) de arrays, o (vol_call, vol_put, iter_call, iter_put).
+    """
+    precio_call = np.asarray(precio_call, dtype=float)
+    precio_put = np.asarray(precio_put, dtype=float)
+    n = precio_call.size
+
+    def _vector(x):
+        return np.broadcast_to(np.asarray(np.nan if x is None else x, dtype=float), (n,))
+
+    S, K, T, r = _vector(S), _vector(K), _vector(T), _vector(r)
+    vol, iteraciones = implied_volatility_vectorizada(
+        np.concatenate([precio_call, precio_put]),
+        np.concatenate([S, S]), np.concatenate([K, K]),
+        np.concatenate([T, T]), np.concatenate([r, r]),
+        np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)]),
+        sigma0=np.concatenate([_vector(vol_previa_call), _vector(vol_previa_put)]),
+        devolver_iteraciones=True, **kwargs)
+    if devolver_iteraciones:
+        return vol[:n], vol[n:], iteraciones[:n], iteraciones[n:]
+    return vol[:n], vol[n:]
@@ -1,84 +1,56 @@
 import json
+import os
+import time
 import boto3
 import pandas as pd
-from scipy.stats import norm
-from scipy.optimize import brentq
 from datetime import datetime
 import numpy as np
 from io import StringIO
-from decimal import Decimal
 
-
-# Inicializar el cliente de S3
-s3_client = boto3.client('s3')
+from iv_vectorizada import volatilidades_cadena
+from black_scholes import GRIEGAS, precio_y_griegas
+from escritura_dynamodb import construir_ids, construir_items, escribir_items
+from lectura_snapshots import leer_manifiesto, leer_ultimo_snapshot, registrar_volatilidades, snapshot_sin_cambios
+from incremental import calcular_huellas, cargar_huellas, guardar_huellas, filas_cambiadas
+from cache_volatilidades import (cargar_volatilidades_previas, buscar_volatilidades_previas,
+                                 guardar_volatilidades_previas)
+from puntos_atm import calcular_puntos_atm, cargar_puntos_atm, guardar_puntos_atm
+
+
+### Arranque
+# Los clientes de AWS se crean una vez al cargar el módulo (en la fase de
+# inicialización de la Lambda) y se reutilizan en las invocaciones en caliente.
+# Con ALMACENAMIENTO=local:<directorio> se usa el almacenamiento local de
+# pipeline/almacenamiento.py, que solo existe en el repositorio (no va en la imagen).
+ALMACENAMIENTO = os.environ.get('ALMACENAMIENTO', 'aws')
+if ALMACENAMIENTO == 'aws':
+    s3_client = boto3.client('s3')
+    sns_client = boto3.client('sns')
+else:
+    from almacenamiento import crear_almacenamiento
+    s3_client, table, sns_client = crear_almacenamiento(ALMACENAMIENTO)
+
+# Columnas del snapshot de opciones que necesita el cálculo de volatilidades
+COLUMNAS_OPCIONES = ['Fecha', 'Fecha_scrap', 'Strike', 'T', 'Precio_call', 'Precio_put']
+
+# Subyacente del que se calculan las volatilidades
+SUBYACENTE = 'MiniIbex_35'
 
 ### Calculamos volatilidades
 
-# Función para calcular el precio de una opción call europea usando Black-Scholes
-def black_scholes_call(S, K, T, r, sigma):
-    if T <= 0:  # No se puede calcular precio de una opción con tiempo hasta vencimiento negativo o cero
-        return 0
-    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-
-def black_scholes_put(S, K, T, r, sigma):
-    if T <= 0:  # No se puede calcular precio de una opción con tiempo hasta vencimiento negativo o cero
-        return 0
-    d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
-    d2 = d1 - sigma * np.sqrt(T)
-    return K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
-
-# Función para extraer la volatilidad implícita
-def implied_volatility(option_price, S, K, T, r, option_type):
-    """Calcula la volatilidad implícita de una opción dada su precio de mercado.
-    option_price : Precio de mercado de la opción
-    S : Precio del activo subyacente
-    K : Precio de ejercicio
-    T : Tiempo hasta el vencimiento
-    r : Tasa de interés libre de riesgo
-    option_type : Tipo de opción ('call' o 'put')
-    """
-    if option_price <= 0 or T <= 0:
-        return 0
-    # Función objetivo para encontrar la volatilidad implícita
-    def objective(sigma):
-        if option_type == 'call':
-            return black_scholes_call(S, K, T, r, sigma) - option_price
-        else:
-            return black_scholes_put(S, K, T, r, sigma) - option_price
-    # Resolver usando Brent's method
-    try:
-        result = brentq(objective, 1e-6, 4)
-        return result
-    except ValueError:
-        return np.nan  
-
 def subir_a_dynamodb(df):
     """  
-    Sube los datos al DynamoDB especificado.
+    Sube los datos al DynamoDB especificado mediante escrituras por lotes en paralelo.
     Args:
     - df (DataFrame): DataFrame de Pandas que contiene los datos a subir.
+    Returns:
+    - Diccionario con el informe de escritura (elementos escritos, reintentos, throttles, tiempo).
     """
-    try:
-        for index, row in df.iterrows():
-            item = {
-                'id': row['Fecha'] + '_' + str(row['Strike']),  # Asegúrate de que este campo es único
-                'Fecha': row['Fecha'],
-                'Strike': int(row['Strike']),
-                'Vol_call': None if pd.isna(row['Vol_call']) else Decimal(str(row['Vol_call'])),
-                'Vol_put': None if pd.isna(row['Vol_put']) else Decimal(str(row['Vol_put'])),
-                'Fecha_scrap': row['Fecha_scrap']
-            }
-            table.put_item(Item=item)
-        print('Datos almacenados correctamente a Volatility_table.')
-    except Exception as e:
-        print(f'Se ha producido un error: {e}')
+    items = construir_items(df)
+    return escribir_items(table, items)
 
 
 def enviar_correo(resultado):
-    client = boto3.client('sns')
-
     # Asegúrate de que este ARN es correcto y corresponde a un tema existente en SNS
     topic_arn = 'arn:aws:sns:eu-west-3:975050217121:correo_update_volatilidad'
 
@@ -86,7 +58,7 @@ def enviar_correo(resultado):
     message = resultado
 
     # Publica el mensaje en el tema de SNS
-    response = client.publish(
+    response = sns_client.publish(
         TopicArn=topic_arn,
         Message=message,
         Subject='Actualización AWS'
@@ -95,16 +67,22 @@ def enviar_correo(resultado):
 
 
 # Inicializar el cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('volatiliy_table')  # Nombre de tu tabla de DynamoDB
+if ALMACENAMIENTO == 'aws':
+    dynamodb = boto3.resource('dynamodb')
+    table = dynamodb.Table('volatiliy_table')  # Nombre de tu tabla de DynamoDB
 
-def lambda_handler(event, context):
-    try:
-        bucket = 'miax-12-scrap-meff'
-        opciones_key = 'datos_opciones.json'
-        futuros_key = 'datos_futuros.json'
-        s3_client = boto3.client('s3')
-        
+def leer_snapshot(s3_client, bucket):
+    """
+    Lee el último snapshot de opciones y futuros del subyacente.
+    Se leen del histórico Parquet solo las columnas necesarias; si todavía
+    no existe el manifiesto se usan los JSON con el último dato.
+    """
+    opciones_key = 'datos_opciones.json'
+    futuros_key = 'datos_futuros.json'
+    df_opciones = leer_ultimo_snapshot(s3_client, bucket, 'opciones', COLUMNAS_OPCIONES, SUBYACENTE)
+    df_futuros = leer_ultimo_snapshot(s3_client, bucket, 'futuros', ['Ant'], SUBYACENTE)
+
+    if df_opciones is None or df_futuros is None:
         response_opciones = s3_client.get_object(Bucket=bucket, Key=opciones_key)
         opciones_str = response_opciones['Body'].read().decode('utf-8')
         opciones_io = StringIO(opciones_str)
@@ -114,25 +92,139 @@ def lambda_handler(event, context):
         futuros_str = response_futuros['Body'].read().decode('utf-8')
         futuros_io = StringIO(futuros_str)
         df_futuros = pd.read_json(futuros_io)
+    return df_opciones, df_futuros
 
-        price_sub = df_futuros['Ant'].iloc[0] if not df_futuros.empty else 0
-        rfr = 0  # Tasa de interés libre de riesgo
 
-        df_opciones['Vol_call'] = df_opciones.apply(
-            lambda row: implied_volatility(row['Precio_call'], price_sub, row['Strike'], row['T'], rfr, 'call'), axis=1)
-        df_opciones['Vol_put'] = df_opciones.apply(
-            lambda row: implied_volatility(row['Precio_put'], price_sub, row['Strike'], row['T'], rfr, 'put'), axis=1)
+def calcular_volatilidades(df_opciones, df_futuros, s3_client, bucket, incremental=True):
+    """
+    Calcula las volatilidades y griegas de un snapshot, las escribe en DynamoDB y guarda
+    el estado para la siguiente ejecución (huellas, volatilidades previas y puntos ATM).
+    No modifica el manifiesto: eso lo hace quien llama con registrar_volatilidades.
+    Args:
+    - df_opciones (DataFrame): Opciones con las columnas de COLUMNAS_OPCIONES.
+    - df_futuros (DataFrame): Futuros con la columna 'Ant'.
+    - s3_client: Cliente de S3 de boto3.
+    - bucket (str): Nombre del bucket.
+    - incremental (bool): Recalcular solo las filas cuyos datos han cambiado.
+    Returns:
+    - Diccionario con la Fecha_scrap del snapshot y los informes de escritura, incremental y solver.
+    """
+    price_sub = df_futuros['Ant'].iloc[0] if not df_futuros.empty else 0
+    fecha_scrap = pd.to_datetime(df_opciones['Fecha_scrap']).max().date().isoformat()
+    rfr = 0  # Tasa de interés libre de riesgo
+
+    # Modo incremental: al repetir un mismo día de scrap solo se recalculan las filas
+    # cuya cotización ha cambiado; en un día nuevo se recalculan todas (ver incremental.py).
+    huellas = calcular_huellas(df_opciones, price_sub, SUBYACENTE)
+    huellas_previas, fecha_previa = cargar_huellas(s3_client, bucket) if incremental else ({}, None)
+    recalcular, informe_incremental = filas_cambiadas(huellas, huellas_previas, fecha_scrap, fecha_previa)
+    df_completo = df_opciones
+    df_opciones = df_opciones.loc[recalcular].copy()
+
+    # Volatilidades de calls y puts de toda la cadena en una sola resolución vectorizada,
+    # partiendo de las volatilidades previas de cada (Fecha, Strike) cuando existen
+    ids = construir_ids(df_opciones).to_numpy()
+    vol_previas = cargar_volatilidades_previas(s3_client, bucket)
+    previa_call, previa_put = buscar_volatilidades_previas(ids, vol_previas)
+    vol_call, vol_put, iter_call, iter_put = volatilidades_cadena(
+        df_opciones['Precio_call'].to_numpy(dtype=float),
+        df_opciones['Precio_put'].to_numpy(dtype=float),
+        price_sub,
+        df_opciones['Strike'].to_numpy(dtype=float),
+        df_opciones['T'].to_numpy(dtype=float),
+        rfr,
+        vol_previa_call=previa_call,
+        vol_previa_put=previa_put,
+        devolver_iteraciones=True)
+    df_opciones['Vol_call'], df_opciones['Vol_put'] = vol_call, vol_put
+    iteraciones = np.concatenate([iter_call, iter_put])
+    informe_solver = {
+        'opciones': int(iteraciones.size),
+        'con_volatilidad_previa': int(np.isfinite(previa_call).sum() + np.isfinite(previa_put).sum()),
+        'iteraciones_total': int(iteraciones.sum()),
+        'iteraciones_media': float(iteraciones.mean()) if iteraciones.size else 0.0,
+    }
+
+    # Griegas de calls y puts, cada una con su volatilidad implícita
+    columnas_griegas = []
+    for tipo, vol in [('call', vol_call), ('put', vol_put)]:
+        griegas = precio_y_griegas(price_sub, df_opciones['Strike'].to_numpy(dtype=float),
+                                   df_opciones['T'].to_numpy(dtype=float), rfr, vol, tipo == 'call')
+        for griega in GRIEGAS:
+            df_opciones[f'{griega}_{tipo}'] = griegas[griega]
+            columnas_griegas.append(f'{griega}_{tipo}')
+
+    df_volatilidades = df_opciones.loc[:, ['Fecha', 'Fecha_scrap', 'Strike', 'Vol_call', 'Vol_put'] + columnas_griegas]
+
+    # Subimos a dynamo las nuevas volatilidades
+    informe = subir_a_dynamodb(df_volatilidades)
+    if informe['items_fallidos']:
+        raise RuntimeError(f"No se pudieron escribir {informe['items_fallidos']} elementos: {informe['errores'][:3]}")
+
+    # Las huellas solo se guardan cuando todas las filas se han escrito correctamente
+    guardar_huellas(s3_client, bucket, huellas, fecha_scrap)
+    vol_actuales = guardar_volatilidades_previas(s3_client, bucket, ids, vol_call, vol_put, vol_previas)
+
+    # Volatilidad ATM de cada vencimiento del snapshot completo (también de las filas no recalculadas)
+    atm_call, atm_put = buscar_volatilidades_previas(construir_ids(df_completo).to_numpy(), vol_actuales)
+    puntos_atm = calcular_puntos_atm(pd.to_datetime(df_completo['Fecha']).dt.strftime('%Y-%m-%d'),
+                                     df_completo['Strike'], df_completo['T'], atm_call, atm_put,
+                                     price_sub, fecha_scrap)
+    guardar_puntos_atm(s3_client, bucket, puntos_atm, cargar_puntos_atm(s3_client, bucket))
+
+    return {'Fecha_scrap': fecha_scrap, 'escritura': informe, 'incremental': informe_incremental,
+            'solver': informe_solver}
+
+
+def latencia_desde(inicio):
+    """Segundos transcurridos desde una marca ISO (p. ej. el inicio del scraping), o None si no la hay."""
+    if not inicio:
+        return None
+    return round((datetime.now() - datetime.fromisoformat(inicio)).total_seconds(), 3)
 
-        df_volatilidades = df_opciones.loc[:, ['Fecha', 'Fecha_scrap', 'Strike', 'Vol_call', 'Vol_put']]
-        
-        # Subimos a dynamo las nuevas volatilidades
-        subir_a_dynamodb(df_volatilidades)
+
+def lambda_handler(event, context):
+    inicio = time.perf_counter()
+    try:
+        bucket = 'miax-12-scrap-meff'
+
+        # Si el scraper no ha guardado datos nuevos (festivos, repeticiones) no hay nada que
+        # recalcular ni escribir. Con {'forzar': True} se recalcula igualmente.
+        manifiesto = leer_manifiesto(s3_client, bucket)
+        sin_cambios, huella_snapshot = snapshot_sin_cambios(manifiesto, SUBYACENTE)
+        if sin_cambios and not (event or {}).get('forzar'):
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'mensaje': 'El snapshot no ha cambiado: no se recalculan las volatilidades.',
+                                    'estado': 'sin_cambios'})
+            }
+
+        df_opciones, df_futuros = leer_snapshot(s3_client, bucket)
+        t_lectura = time.perf_counter() - inicio
+
+        # Con {'incremental': False} se recalcula todo
+        resultado = calcular_volatilidades(df_opciones, df_futuros, s3_client, bucket,
+                                           (event or {}).get('incremental', True))
+
+        # Avisa a la API de que hay volatilidades nuevas para que precalcule las superficies
+        registrar_volatilidades(s3_client, bucket, resultado['Fecha_scrap'], huella_snapshot)
+
+        # Latencia de esta lambda y desde que empezó el scraping del snapshot (modo de dos lambdas)
+        entrada = ((manifiesto or {}).get('subyacentes') or {}).get(SUBYACENTE) or {}
+        latencia = {'modo': 'dos_lambdas', 'lectura': round(t_lectura, 3),
+                    'lambda': round(time.perf_counter() - inicio, 3),
+                    'extremo_a_extremo': latencia_desde(entrada.get('inicio_scrap'))}
+        print(json.dumps({'latencia': latencia}))
         
         # Enviamos correo para confirmar que se subieron las volatilidades
         enviar_correo('Web scrapping y volatilidades actualizadas correctamente.')
         return {
             'statusCode': 200,
-            'body': json.dumps('Volatilidades subidas correctamente a DynamoDB y lambda actualizada.')
+            'body': json.dumps({'mensaje': 'Volatilidades subidas correctamente a DynamoDB y lambda actualizada.',
+                                'escritura': resultado['escritura'],
+                                'incremental': resultado['incremental'],
+                                'solver': resultado['solver'],
+                                'latencia': latencia})
         }
     except Exception as e:
         enviar_correo(f'Se ha producido un error en la lambda: {str(e)}')
@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+
+
+### Lectura del histórico de snapshots Parquet
+# El scraper guarda cada snapshot en
+#   historico/<tipo>/subyacente=<subyacente>/Fecha_scrap=<fecha>/datos.parquet
+# y un manifiesto historico/latest.json con el último snapshot de cada subyacente.
+# Solo se leen las columnas y particiones pedidas: las particiones se descartan por
+# la ruta y las columnas se leen por rangos dentro de cada fichero Parquet.
+# pyarrow.dataset solo se importa al leer el histórico: la lambda de volatilidad
+# lee únicamente el último snapshot y así no paga su importación en el arranque.
+
+PREFIJO_HISTORICO = 'historico'
+MANIFIESTO = f'{PREFIJO_HISTORICO}/latest.json'
+REGION = 'eu-west-3'
+
+COLUMNAS_PARTICION = ['subyacente', 'Fecha_scrap']
+
+
+def _como_lista(valor):
+    if valor is None or isinstance(valor, (list, tuple, set)):
+        return valor
+    return [valor]
+
+
+def leer_historico(bucket, tipo='opciones', columnas=None, fechas_scrap=None, subyacentes=None,
+                   filesystem=None):
+    """
+    Lee del histórico las columnas y particiones pedidas.
+    Args:
+    - bucket (str): Bucket de S3 (o directorio raíz si se pasa un filesystem local).
+    - tipo (str): 'opciones' o 'futuros'.
+    - columnas (list): Columnas a leer; None para todas. Las columnas de partición
+      ('subyacente', 'Fecha_scrap') se pueden pedir como cualquier otra.
+    - fechas_scrap (str o list): Fechas de scrap a leer; None para todas.
+    - subyacentes (str o list): Subyacentes a leer; None para todos.
+    - filesystem: Filesystem de pyarrow; por defecto S3 en la región de la aplicación.
+    Returns:
+    - DataFrame con los datos leídos.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    filesystem = filesystem or fs.S3FileSystem(region=REGION)
+    particiones = ds.partitioning(pa.schema([(c, pa.string()) for c in COLUMNAS_PARTICION]), flavor='hive')
+    dataset = ds.dataset(f'{bucket}/{PREFIJO_HISTORICO}/{tipo}', filesystem=filesystem,
+                         format='parquet', partitioning=particiones)
+
+    filtro = None
+    for campo, valores in [('Fecha_scrap', _como_lista(fechas_scrap)), ('subyacente', _como_lista(subyacentes))]:
+        if valores is not None:
+            condicion = ds.field(campo).isin(list(valores))
+            filtro = condicion if filtro is None else filtro & condicion
+
+    return dataset.to_table(columns=columnas, filter=filtro).to_pandas()
+
+
+def leer_manifiesto(s3_client, bucket):
+    """Devuelve el manifiesto con el último snapshot de cada subyacente, o None si no existe."""
+    try:
+        respuesta = s3_client.get_object(Bucket=bucket, Key=MANIFIESTO)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(respuesta['Body'].read())
+
+
+def registrar_volatilidades(s3_client, bucket, fecha_scrap, huella=None):
+    """
+    Marca en el manifiesto que las volatilidades del snapshot ya están escritas en DynamoDB.
+    La API usa esta marca para vaciar su caché y precalcular las superficies, y la lambda
+    de volatilidad la huella para no repetir el cálculo de un snapshot sin cambios.
+    """
+    manifiesto = leer_manifiesto(s3_client, bucket) or {'subyacentes': {}}
+    manifiesto['volatilidades'] = {'Fecha_scrap': fecha_scrap, 'huella': huella,
+                                   'actualizado': datetime.now().isoformat()}
+    s3_client.put_object(Bucket=bucket, Key=MANIFIESTO, Body=json.dumps(manifiesto))
+
+
+def snapshot_sin_cambios(manifiesto, subyacente):
+    """
+    Indica si las volatilidades ya se calcularon con el último snapshot del subyacente.
+    Compara la huella del manifiesto, así que depende de que el scraper registre el snapshot
+    antes de subir datos_opciones.json (el objeto que dispara la lambda de volatilidad).
+    Returns:
+    - Tupla (sin_cambios, huella del último snapshot o None si el scraper no la ha guardado).
+    """
+    entrada = ((manifiesto or {}).get('subyacentes') or {}).get(subyacente) or {}
+    huella = entrada.get('huella')
+    calculado = ((manifiesto or {}).get('volatilidades') or {}).get('huella')
+    return huella is not None and huella == calculado, huella
+
+
+def leer_ultimo_snapshot(s3_client, bucket, tipo='opciones', columnas=None, subyacente=None):
+    """
+    Lee el último snapshot de un subyacente según el manifiesto.
+    Args:
+    - s3_client: Cliente de S3 de boto3.
+    - bucket (str): Nombre del bucket.
+    - tipo (str): 'opciones' o 'futuros'.
+    - columnas (list): Columnas a leer; None para todas.
+    - subyacente (str): Subyacente; por defecto el primero del manifiesto.
+    Returns:
+    - DataFrame con las columnas pedidas, o None si no hay manifiesto o no incluye el subyacente.
+    """
+    manifiesto = leer_manifiesto(s3_client, bucket)
+    if not manifiesto or not manifiesto.get('subyacentes'):
+        return None
+    subyacente = subyacente or next(iter(manifiesto['subyacentes']))
+    entrada = manifiesto['subyacentes'].get(subyacente)
+    if entrada is None:
+        return None
+
+    columnas_fichero = None
+    if columnas is not None:
+        columnas_fichero = [c for c in columnas if c not in ('subyacente', 'Fecha_scrap')]
+    cuerpo = s3_client.get_object(Bucket=bucket, Key=entrada[tipo])['Body'].read()
+    df = pd.read_parquet(BytesIO(cuerpo), columns=columnas_fichero)
+
+    # Las columnas de partición se reconstruyen a partir del manifiesto
+    if columnas is None or 'Fecha_scrap' in columnas:
+        df['Fecha_scrap'] = entrada['Fecha_scrap']
+    if columnas is None or 'subyacente' in columnas:
+        df['subyacente'] = subyacente
+    return df if columnas is None else df[list(columnas)]
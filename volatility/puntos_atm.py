@@ -0,0 +1,67 @@
+import json
+
+import numpy as np
+
+
+### Volatilidad ATM de cada vencimiento
+# Tras calcular las volatilidades se guarda, para cada vencimiento, la volatilidad
+# at-the-money (interpolada en strike en K = S) junto con su madurez. Es un punto
+# por (Fecha_scrap, Fecha), así que la interfaz puede dibujar la estructura
+# temporal y el histórico ATM sin leer las cadenas completas.
+
+CLAVE_ATM = 'estado/puntos_atm.json'
+
+
+def _interpolar_atm(strikes, vol, precio_subyacente):
+    """Volatilidad en K = S interpolando linealmente entre los strikes con volatilidad (sin extrapolar)."""
+    validos = np.isfinite(vol) & (vol > 0)
+    if validos.sum() < 2:
+        return np.nan
+    strikes, vol = strikes[validos], vol[validos]
+    if not strikes[0] <= precio_subyacente <= strikes[-1]:
+        return np.nan
+    return float(np.interp(precio_subyacente, strikes, vol))
+
+
+def calcular_puntos_atm(fechas, strikes, T, vol_call, vol_put, precio_subyacente, fecha_scrap):
+    """
+    Calcula la volatilidad ATM de calls y puts de cada vencimiento de un snapshot.
+    Args:
+    - fechas, strikes, T, vol_call, vol_put: Arrays con una posición por opción.
+    - precio_subyacente (float): Precio del subyacente.
+    - fecha_scrap (str): Fecha del snapshot (YYYY-MM-DD).
+    Returns:
+    - Lista de diccionarios con Fecha_scrap, Fecha, T, Vol_call y Vol_put (None si no hay dato).
+    """
+    fechas = np.asarray(fechas).astype(str)
+    strikes, T = np.asarray(strikes, dtype=float), np.asarray(T, dtype=float)
+    vol_call, vol_put = np.asarray(vol_call, dtype=float), np.asarray(vol_put, dtype=float)
+
+    puntos = []
+    for fecha in np.unique(fechas):
+        posiciones = np.flatnonzero(fechas == fecha)
+        posiciones = posiciones[np.argsort(strikes[posiciones], kind='stable')]
+        punto = {'Fecha_scrap': fecha_scrap, 'Fecha': fecha, 'T': float(T[posiciones[0]])}
+        for nombre, vol in [('Vol_call', vol_call), ('Vol_put', vol_put)]:
+            valor = _interpolar_atm(strikes[posiciones], vol[posiciones], precio_subyacente)
+            punto[nombre] = None if np.isnan(valor) else valor
+        puntos.append(punto)
+    return puntos
+
+
+def cargar_puntos_atm(s3_client, bucket):
+    """Devuelve la lista de puntos ATM guardados ([] si no hay ninguno)."""
+    try:
+        respuesta = s3_client.get_object(Bucket=bucket, Key=CLAVE_ATM)
+    except s3_client.exceptions.NoSuchKey:
+        return []
+    return json.loads(respuesta['Body'].read())
+
+
+def guardar_puntos_atm(s3_client, bucket, puntos, previos):
+    """Sustituye los puntos de las fechas de scrap recalculadas y guarda la lista ordenada en S3."""
+    fechas_scrap = {p['Fecha_scrap'] for p in puntos}
+    todos = [p for p in previos if p['Fecha_scrap'] not in fechas_scrap] + puntos
+    todos.sort(key=lambda p: (p['Fecha_scrap'], p['Fecha']))
+    s3_client.put_object(Body=json.dumps(todos), Bucket=bucket, Key=CLAVE_ATM)
+    return todos